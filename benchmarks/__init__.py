@@ -0,0 +1 @@
+"""Benchmarks of the static analyzer orchestrator."""
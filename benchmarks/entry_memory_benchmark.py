@@ -0,0 +1,97 @@
+"""Peak memory of compile database entries held in memory.
+
+Compares the former Entry, holding a dictionary and a list of arguments per
+entry, with the compact interned Entry. Each variant runs in a fresh
+interpreter. Run with `python -m benchmarks.entry_memory_benchmark`.
+"""
+import argparse
+import itertools
+import pathlib as plib
+import resource
+import subprocess
+import sys
+
+import cpp_static_analyzer.compile_db as cdb
+
+# Entries loaded per batch by the compact variant.
+_CHUNK_SIZE = 1000
+
+
+class LegacyEntry:
+    """A command entry (former implementation)."""
+
+    def __init__(self, dictionary):
+        self._directory = plib.Path(dictionary['directory']).as_posix()
+        self._arguments = cdb.filter_warnings(
+            cdb.get_command(dictionary))
+        self._input_path = plib.Path(dictionary['file']).as_posix()
+        self._output_path = plib.Path(dictionary['output']).as_posix()
+
+
+def generate_commands(count: int):
+    """Generate commands of a few targets with long shared flag lists."""
+    for index in range(count):
+        target = index % 20
+        flags = ' '.join([f'-I/work/target{target}/module{ii}/include'
+                          for ii in range(40)] +
+                         [f'-DTARGET{target}_DEFINE_{ii}=1'
+                          for ii in range(30)])
+        name = f'/work/target{target}/src/file{index}'
+        yield {'directory': f'/work/build/target{target}',
+               'command': f'/usr/bin/c++ {flags} -O2 -std=c++17 '
+                          f'-o {name}.o -c {name}.cpp',
+               'file': f'{name}.cpp',
+               'output': f'{name}.o'}
+
+
+def _get_peak_rss():
+    """Peak resident set size of this process in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def _load(variant: str, count: int):
+    """Load count entries with variant, print peak RSS."""
+    commands = generate_commands(count)
+    if variant == 'legacy':
+        entries = [LegacyEntry(command) for command in commands]
+    else:
+        entries = []
+        chunk = list(itertools.islice(commands, _CHUNK_SIZE))
+        while chunk:
+            entries.extend(cdb.get_entries(chunk))
+            chunk = list(itertools.islice(commands, _CHUNK_SIZE))
+    print(f'{_get_peak_rss():.1f} {len(entries)}')
+
+
+def measure(variant: str, count: int):
+    """Return peak RSS in megabytes of loading count entries."""
+    proc = subprocess.run([sys.executable, '-m', __spec__.name,
+                           '--variant', variant, '-n', str(count)],
+                          stdout=subprocess.PIPE, encoding='utf-8',
+                          check=True)
+    return float(proc.stdout.split()[0])
+
+
+def main():
+    """Print peak RSS before and after."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--count', type=int, default=100000,
+                        help='Number of generated entries.')
+    parser.add_argument('--variant', choices=('legacy', 'compact'),
+                        help='Load a single variant in this process.')
+    args = parser.parse_args()
+
+    if args.variant is not None:
+        _load(args.variant, args.count)
+        return
+
+    legacy = measure('legacy', args.count)
+    compact = measure('compact', args.count)
+    print(f'{args.count} entries')
+    print(f'legacy:  {legacy:.1f} MB peak RSS')
+    print(f'compact: {compact:.1f} MB peak RSS ({legacy / compact:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Stand-in for clang-tidy measuring the orchestrator alone.
+
+Sources are the arguments before `--` that are not options, so single
+entries, batches and -p invocations are understood. Behavior is set by
+environment variables:
+
+FAKE_TIDY_LATENCY       seconds spent per source (default 0)
+FAKE_TIDY_LINES         diagnostics reported per source (default 1)
+FAKE_TIDY_FAILURE_RATE  fraction of sources failing with exit code 1
+FAKE_TIDY_SEED          seed choosing the failing sources
+
+Failing sources depend only on the source path and the seed, so every
+engine sees the same failures. The stub imports the standard library only
+and is installed with write_stub.
+"""
+import os
+import stat
+import sys
+import time
+import zlib
+
+_VERSION = 'fake clang-tidy version 18.1.0'
+
+
+def _get_sources(arguments):
+    sources = []
+    for argument in arguments:
+        if argument == '--':
+            break
+        if not argument.startswith('-'):
+            sources.append(argument)
+    return sources
+
+
+def _is_failing(source: str, rate: float, seed: str):
+    if rate <= 0.0:
+        return False
+    digest = zlib.crc32(f'{seed}:{source}'.encode('utf-8'))
+    return digest / 0xffffffff < rate
+
+
+def main():
+    """Analyze sources named on the command line."""
+    arguments = sys.argv[1:]
+    if '--version' in arguments:
+        print(_VERSION)
+        return 0
+
+    latency = float(os.environ.get('FAKE_TIDY_LATENCY', '0'))
+    lines = int(os.environ.get('FAKE_TIDY_LINES', '1'))
+    rate = float(os.environ.get('FAKE_TIDY_FAILURE_RATE', '0'))
+    seed = os.environ.get('FAKE_TIDY_SEED', '0')
+
+    failed = False
+    output = []
+    for source in _get_sources(arguments):
+        if latency > 0.0:
+            time.sleep(latency)
+        if _is_failing(source, rate, seed):
+            print(f'{source}:1:1: error: synthetic failure '
+                  f'[clang-diagnostic-error]', file=sys.stderr)
+            failed = True
+            continue
+        for line in range(1, lines + 1):
+            output.append(f'{source}:{line}:1: warning: synthetic '
+                          f'diagnostic {line} [fake-check-{line % 5}]\n'
+                          f'    int unused_{line};\n'
+                          f'    ^\n')
+        if lines > 0:
+            print(f'{lines} warnings generated.', file=sys.stderr)
+
+    sys.stdout.write(''.join(output))
+    return 1 if failed else 0
+
+
+def write_stub(directory: str):
+    """Write executable stub running with this interpreter, return path.
+
+    The stub skips site initialization to keep its startup short.
+    """
+    with open(__file__, 'r', encoding='utf-8') as file:
+        source = file.read()
+    path = os.path.join(directory, 'clang-tidy')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(f'#!{sys.executable} -S\n{source}')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""Reproducible benchmark suite of the orchestrator overhead.
+
+Measures, on synthetic compile databases and a stub clang-tidy:
+
+- database load time, tokenization and path conversion rates and peak
+  RSS, each size in a fresh interpreter,
+- scheduler dispatch overhead of the command manager without processes,
+- end-to-end throughput of the command line at several job counts, with
+  the peak RSS of the orchestrator or of its largest child.
+
+Results are written as JSON and can be compared with a previous run.
+Everything runs offline. Run with
+`python -m benchmarks.orchestrator_benchmark`.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import yaml
+
+import benchmarks.fake_clang_tidy as fct
+import benchmarks.synthetic_db as sdb
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.compile_db as cdb
+import cpp_static_analyzer.config as cfg
+import cpp_static_analyzer.failures as fl
+import cpp_static_analyzer.process as pr
+
+_RESULTS_VERSION = 1
+
+# Fields identifying a record when comparing results.
+_RECORD_FIELDS = ('benchmark', 'size', 'style', 'windows', 'jobs',
+                  'engine')
+
+
+def _run_measured(command, env=None):
+    """Run command, return (stdout, seconds, peak RSS in bytes)."""
+    start_time = time.perf_counter()
+    with subprocess.Popen(command, stdout=subprocess.PIPE, env=env,
+                          encoding='utf-8') as proc:
+        output = proc.stdout.read()
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    return output, time.perf_counter() - start_time, pr.get_max_rss(rusage)
+
+
+def _measure_load(path: str, windows: bool):
+    """Load a database in this interpreter, print timings as JSON."""
+    start_time = time.perf_counter()
+    commands = cdb.load_compile_commands(path)
+    load_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    tokenized = 0
+    for command in commands:
+        if 'command' in command:
+            cdb.get_command(command)
+            tokenized += 1
+    tokenize_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    entries = cdb.get_entries(commands)
+    entries_time = time.perf_counter() - start_time
+
+    converter = cdb.PathConverter(sdb.get_path_converter(windows))
+    start_time = time.perf_counter()
+    for entry in entries:
+        for argument in entry.get_arguments():
+            converter.convert(argument)
+    convert_time = time.perf_counter() - start_time
+
+    print(json.dumps({'load_time': load_time,
+                      'tokenize_time': tokenize_time if tokenized else None,
+                      'entries_time': entries_time,
+                      'convert_time': convert_time}))
+
+
+def _rate(count: int, seconds):
+    if seconds is None or seconds <= 0.0:
+        return None
+    return count / seconds
+
+
+def run_load(directory: str, size: int, style: str, windows: bool):
+    """Measure loading a generated database in a fresh interpreter."""
+    path = os.path.join(directory, f'load-{style}-{windows}-{size}.json')
+    sdb.write_database(path, size, style, windows)
+    output, _, max_rss = _run_measured(
+        [sys.executable, '-m', __spec__.name, '--measure-load', path] +
+        (['--windows'] if windows else []))
+    os.remove(path)
+
+    timings = json.loads(output)
+    return {'benchmark': 'load', 'size': size, 'style': style,
+            'windows': windows,
+            'load_time': timings['load_time'],
+            'load_rate': _rate(size, timings['load_time']),
+            'tokenize_rate': _rate(size, timings['tokenize_time']),
+            'entries_rate': _rate(size, timings['entries_time']),
+            'convert_rate': _rate(size, timings['convert_time']),
+            'max_rss': max_rss}
+
+
+def _dispatch(cmd_mgr, config, out_dir, err_dir):
+    """Dispatch and complete entries without running clang-tidy."""
+    index = cmd_mgr.next_index()
+    while index >= 0:
+        job = cmd_mgr.prepare_job(index, config)
+        job.set_result('', '')
+        cmd_mgr.complete_job(job, out_dir, err_dir)
+        index = cmd_mgr.next_index()
+
+
+def run_dispatch(directory: str, path: str, size: int, windows: bool,
+                 jobs: int):
+    """Measure per entry scheduling cost of the command manager."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        config = cfg.Config({'ClangTidy': 'clang-tidy',
+                             'PathConverter': sdb.get_path_converter(
+                                 windows, directory)})
+    cmd_mgr = cm.CommandManager(path)
+    err_dir = os.path.join(directory, 'errors')
+    os.makedirs(err_dir, exist_ok=True)
+
+    threads = [threading.Thread(target=_dispatch,
+                                args=(cmd_mgr, config, directory, err_dir))
+               for _ in range(jobs)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    return {'benchmark': 'dispatch', 'size': size, 'windows': windows,
+            'jobs': jobs, 'dispatch_rate': _rate(size, elapsed),
+            'dispatch_overhead': elapsed / size}
+
+
+def _write_config(directory: str, windows: bool):
+    """Write configuration running the stub clang-tidy."""
+    path = os.path.join(directory, 'config.yml')
+    with open(path, 'w', encoding='utf-8') as file:
+        yaml.safe_dump({'ClangTidy': fct.write_stub(directory),
+                        'Checks': ['-*', 'fake-*'],
+                        'PathConverter': sdb.get_path_converter(
+                            windows, directory)}, file)
+    return path
+
+
+def run_end_to_end(directory: str, path: str, size: int, windows: bool,
+                   jobs: int, engine: str, stub: dict):
+    """Measure throughput of the command line against the stub."""
+    run_dir = tempfile.mkdtemp(prefix=f'e2e-{engine}-{jobs}-', dir=directory)
+    metrics_path = os.path.join(run_dir, 'metrics.json')
+    env = dict(os.environ,
+               FAKE_TIDY_LATENCY=str(stub['latency']),
+               FAKE_TIDY_LINES=str(stub['lines']),
+               FAKE_TIDY_FAILURE_RATE=str(stub['failure_rate']),
+               FAKE_TIDY_SEED=str(stub['seed']))
+    command = [sys.executable, '-c',
+               'import sys; import cpp_static_analyzer; '
+               'sys.argv[0] = "cpp-static-analyzer"; cpp_static_analyzer.run()',
+               '-v', '0', '-cfg', _write_config(directory, windows),
+               '-o', os.path.join(run_dir, 'out'), '-j', str(jobs),
+               '--engine', engine, '--retries', '0',
+               '--metrics', metrics_path, path]
+    _, elapsed, max_rss = _run_measured(command, env)
+
+    with open(metrics_path, 'r', encoding='utf-8') as file:
+        metrics = json.load(file)
+    with open(os.path.join(run_dir, 'out', fl.MANIFEST_FILE), 'r',
+              encoding='utf-8') as file:
+        failed = len(json.load(file))
+    ideal = size * stub['latency'] / jobs
+    return {'benchmark': 'end_to_end', 'size': size, 'windows': windows,
+            'jobs': jobs, 'engine': engine, 'elapsed': elapsed,
+            'throughput': _rate(size, elapsed),
+            'overhead_per_unit': (elapsed - ideal) * jobs / size,
+            'utilization': metrics['utilization'],
+            'failed': failed,
+            'max_rss': max_rss}
+
+
+def _get_environment():
+    """Describe the machine and the measured tree."""
+    commit = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'],
+                                cwd=os.path.dirname(__file__),
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'commit': commit}
+
+
+def _print_record(record):
+    values = ' '.join(f'{key}={value:.4g}' if isinstance(value, float)
+                      else f'{key}={value}'
+                      for key, value in record.items())
+    print(values, flush=True)
+
+
+def run_suite(args, directory: str):
+    """Run the selected benchmarks, return result records."""
+    records = []
+    for size in args.sizes:
+        for style in args.styles:
+            for windows in args.platforms:
+                records.append(run_load(directory, size, style, windows))
+                _print_record(records[-1])
+
+    stub = {'latency': args.latency, 'lines': args.lines,
+            'failure_rate': args.failure_rate, 'seed': args.seed}
+    for windows in args.platforms:
+        path = os.path.join(directory, f'dispatch-{windows}.json')
+        sdb.write_database(path, args.dispatch_size, 'command', windows)
+        for jobs in args.jobs:
+            records.append(run_dispatch(directory, path, args.dispatch_size,
+                                        windows, jobs))
+            _print_record(records[-1])
+
+        path = os.path.join(directory, f'e2e-{windows}.json')
+        sdb.write_database(path, args.e2e_size, 'command', windows)
+        for engine in args.engines:
+            for jobs in args.jobs:
+                records.append(run_end_to_end(directory, path, args.e2e_size,
+                                              windows, jobs, engine, stub))
+                _print_record(records[-1])
+    return records
+
+
+def _get_record_id(record):
+    return tuple(record.get(field) for field in _RECORD_FIELDS)
+
+
+def compare(baseline_path: str, records):
+    """Print change of each measure from a baseline results file."""
+    with open(baseline_path, 'r', encoding='utf-8') as file:
+        baseline = {_get_record_id(record): record
+                    for record in json.load(file)['results']}
+    for record in records:
+        previous = baseline.get(_get_record_id(record))
+        if previous is None:
+            continue
+        name = '/'.join(str(value) for value in _get_record_id(record)
+                        if value is not None)
+        for key, value in record.items():
+            before = previous.get(key)
+            if key in _RECORD_FIELDS or not isinstance(value, float) or \
+                    not isinstance(before, (int, float)) or before == 0:
+                continue
+            print(f'{name:40} {key:18} {before:12.4g} {value:12.4g} '
+                  f'{(value - before) / before:+8.1%}')
+
+
+def _parse_list(text: str, item_type=int):
+    return [item_type(item) for item in text.split(',') if item != '']
+
+
+def main():
+    """Run benchmark suite."""
+    parser = argparse.ArgumentParser(
+        description='Orchestrator benchmark suite.')
+    parser.add_argument('--sizes', type=_parse_list, default='1000,10000',
+                        help='Database sizes of the load benchmark, up to '
+                        '1000000 (about 9 GB of peak RSS).')
+    parser.add_argument('--styles', type=lambda text: _parse_list(text, str),
+                        default='command,arguments',
+                        help='Entry styles: command, arguments.')
+    parser.add_argument('--platforms',
+                        type=lambda text: [item == 'windows' for item in
+                                           _parse_list(text, str)],
+                        default='posix,windows',
+                        help='Path styles: posix, windows. Windows paths '
+                        'are mapped by a path converter.')
+    parser.add_argument('--jobs', type=_parse_list, default='1,4,16',
+                        help='Job counts of dispatch and end-to-end runs.')
+    parser.add_argument('--engines',
+                        type=lambda text: _parse_list(text, str),
+                        default='thread,async',
+                        help='Engines of end-to-end runs.')
+    parser.add_argument('--dispatch-size', type=int, default=20000,
+                        help='Entries dispatched without processes.')
+    parser.add_argument('--e2e-size', type=int, default=1000,
+                        help='Entries analyzed by end-to-end runs.')
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='Stub clang-tidy seconds per source.')
+    parser.add_argument('--lines', type=int, default=5,
+                        help='Stub clang-tidy diagnostics per source.')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='Fraction of sources failed by the stub.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed choosing failing sources.')
+    parser.add_argument('-o', '--output', type=str,
+                        default='benchmark-results.json',
+                        help='Results file.')
+    parser.add_argument('--baseline', type=str, default='',
+                        help='Results file of a previous version to '
+                        'compare with.')
+    parser.add_argument('--measure-load', type=str, default='',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--windows', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure_load != '':
+        _measure_load(args.measure_load, args.windows)
+        return
+
+    with tempfile.TemporaryDirectory(prefix='cpp-sa-bench-') as directory:
+        records = run_suite(args, directory)
+
+    parameters = {key: value for key, value in vars(args).items()
+                  if key not in ('measure_load', 'windows', 'output',
+                                 'baseline')}
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump({'version': _RESULTS_VERSION,
+                   'environment': _get_environment(),
+                   'parameters': parameters,
+                   'results': records}, file, indent=2)
+    print(f'Results written to {args.output}.')
+
+    if args.baseline != '':
+        compare(args.baseline, records)
+
+
+if __name__ == '__main__':
+    main()
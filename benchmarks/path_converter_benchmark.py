@@ -0,0 +1,81 @@
+"""Path conversion cost of a generated compile database.
+
+Compares the former linear scan of the converter mapping with the
+compiled, memoized converter. Run with
+`python -m benchmarks.path_converter_benchmark`.
+"""
+import argparse
+import random
+import time
+
+import cpp_static_analyzer.compile_db as cdb
+
+
+def linear_convert_path(path: str, converter: dict):
+    """Convert path by scanning every key (former implementation)."""
+    result = path
+    for key, value in converter.items():
+        index = path.find(key)
+        if index >= 0:
+            result = path[0:index] + value + path[len(key) + index:]
+            break
+    return result
+
+
+def generate_converter(roots: int):
+    """Generate mapping of Windows roots to POSIX mount points."""
+    return {f'D:/work/root{ii:02}': f'/mnt/root{ii:02}'
+            for ii in range(roots)}
+
+
+def generate_arguments(index: int, rng: random.Random, roots: int):
+    """Generate arguments of an entry with repeating include paths."""
+    arguments = ['clang-cl.exe']
+    arguments += [f'/ID:/work/root{rng.randrange(roots):02}/module'
+                  f'{rng.randrange(50)}/include' for _ in range(30)]
+    arguments += [f'/DDEFINE_{ii}=1' for ii in range(20)]
+    arguments += ['/O2', '/std:c++17',
+                  f'/FoD:/work/root{index % roots:02}/obj/f{index}.obj',
+                  '/c', f'D:/work/root{index % roots:02}/src/f{index}.cpp']
+    return arguments
+
+
+def _measure(entries, convert):
+    start_time = time.perf_counter()
+    for arguments in entries:
+        for argument in arguments:
+            convert(argument)
+    return time.perf_counter() - start_time
+
+
+def run(count: int, roots: int):
+    """Return seconds spent by (linear, compiled) conversion."""
+    rng = random.Random(0)
+    mapping = generate_converter(roots)
+    entries = [generate_arguments(ii, rng, roots) for ii in range(count)]
+
+    linear = _measure(entries,
+                      lambda path: linear_convert_path(path, mapping))
+    converter = cdb.PathConverter(mapping)
+    compiled = _measure(entries, converter.convert)
+    return linear, compiled, converter.get_cache_info()
+
+
+def main():
+    """Print conversion cost before and after."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--count', type=int, default=100000,
+                        help='Number of generated entries.')
+    parser.add_argument('-r', '--roots', type=int, default=40,
+                        help='Number of converted roots.')
+    args = parser.parse_args()
+
+    linear, compiled, cache_info = run(args.count, args.roots)
+    print(f'{args.count} entries, {args.roots} roots')
+    print(f'linear scan: {linear:.2f}s')
+    print(f'compiled:    {compiled:.2f}s ({linear / compiled:.1f}x, '
+          f'{cache_info.hits} hits, {cache_info.misses} misses)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Synthetic compile databases of configurable size and style.
+
+Entries belong to targets sharing include directories and defines, as in
+databases generated by CMake. Windows databases use drive letter paths
+mapped to a POSIX root by a path converter.
+"""
+import random
+
+import cpp_static_analyzer.compile_db as cdb
+
+# Root of the sources of a Windows database.
+WINDOWS_ROOT = 'C:/work/project'
+
+# Root of the sources of a POSIX database.
+POSIX_ROOT = '/work/project'
+
+# Fraction of entries with an include directory containing spaces.
+_QUOTED_RATIO = 0.1
+
+
+def get_path_converter(windows: bool, root: str = POSIX_ROOT):
+    """Get path converter mapping a Windows database to root."""
+    return {WINDOWS_ROOT: root} if windows else {}
+
+
+def _get_target_flags(target: int, windows: bool, root: str):
+    """Get include and define flags shared by the entries of a target."""
+    option = '/' if windows else '-'
+    flags = [f'{option}I{root}/src/target{target}/module{ii}/include'
+             for ii in range(20)]
+    flags += [f'{option}I{root}/third_party/lib{ii}/include'
+              for ii in range(10)]
+    flags += [f'{option}DTARGET{target}_DEFINE_{ii}=1' for ii in range(20)]
+    return flags
+
+
+def _make_arguments(index: int, target: int, windows: bool,
+                    flags, quoted: bool):
+    root = WINDOWS_ROOT if windows else POSIX_ROOT
+    name = f'{root}/src/target{target}/f{index}'
+    if windows:
+        arguments = ['C:\\Program Files\\LLVM\\bin\\clang-cl.exe', *flags]
+        if quoted:
+            arguments.append(f'/I{root}/third party/include')
+        arguments += ['/O2', '/std:c++17', f'/Fo{name}.obj', '/c',
+                      f'{name}.cpp']
+        return arguments, f'{name}.cpp', f'{name}.obj'
+
+    arguments = ['/usr/bin/c++', *flags]
+    if quoted:
+        arguments.append(f'-I{root}/third party/include')
+    arguments += ['-O2', '-std=c++17', '-o', f'{name}.o', '-c',
+                  f'{name}.cpp']
+    return arguments, f'{name}.cpp', f'{name}.o'
+
+
+def _quote(argument: str):
+    return f'"{argument}"' if ' ' in argument else argument
+
+
+def generate_entries(count: int, style: str = 'command',
+                     windows: bool = False, targets: int = 50,
+                     seed: int = 0):
+    """Generate count entries with 'command' or 'arguments' fields."""
+    rng = random.Random(seed)
+    root = WINDOWS_ROOT if windows else POSIX_ROOT
+    target_flags = [_get_target_flags(target, windows, root)
+                    for target in range(targets)]
+    for index in range(count):
+        target = index % targets
+        arguments, input_path, output_path = _make_arguments(
+            index, target, windows, target_flags[target],
+            rng.random() < _QUOTED_RATIO)
+        entry = {'directory': f'{root}/build/target{target}'}
+        if style == 'arguments':
+            entry['arguments'] = arguments
+        else:
+            entry['command'] = ' '.join(_quote(argument)
+                                        for argument in arguments)
+        entry['file'] = input_path
+        entry['output'] = output_path
+        yield entry
+
+
+def write_database(path: str, count: int, style: str = 'command',
+                   windows: bool = False, seed: int = 0):
+    """Write a generated database without holding it in memory."""
+    with open(path, 'w', encoding='utf-8') as file:
+        cdb.write_compile_commands(
+            generate_entries(count, style, windows, seed=seed), file)
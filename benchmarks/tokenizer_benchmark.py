@@ -0,0 +1,83 @@
+"""Throughput benchmark of the compile command tokenizer.
+
+Run with `python -m benchmarks.tokenizer_benchmark`.
+"""
+import argparse
+import random
+import time
+
+import cpp_static_analyzer.compile_db as cdb
+
+
+def generate_command(index: int, rng: random.Random, windows: bool,
+                     quoted_ratio: float = 0.2):
+    """Generate a realistic compile command line.
+
+    Only a fraction of the entries contains quoted paths and escaped
+    defines, as in databases generated by CMake.
+    """
+    quoted = rng.random() < quoted_ratio
+    if windows:
+        root = 'C:\\Users\\build\\project'
+        parts = ['"C:\\Program Files\\LLVM\\bin\\clang-cl.exe"']
+        parts += [f'/I{root}\\src\\module{rng.randrange(100)}\\include'
+                  for _ in range(30)]
+        if quoted:
+            parts += [f'/I"{root}\\third party\\lib{ii}\\include"'
+                      for ii in range(5)]
+            parts += ['/DSTR=\\"value\\"']
+        parts += [f'/DDEFINE_{ii}=1' for ii in range(20)]
+        parts += ['/O2', '/std:c++17',
+                  f'/Fo{root}\\obj\\f{index}.obj',
+                  '/c', f'{root}\\src\\f{index}.cpp']
+    else:
+        root = '/home/build/project'
+        parts = ['/usr/bin/c++']
+        parts += [f'-I{root}/src/module{rng.randrange(100)}/include'
+                  for _ in range(30)]
+        if quoted:
+            parts += [f'-I"{root}/third party/lib{ii}/include"'
+                      for ii in range(5)]
+            parts += ['-DSTR=\\"value\\"']
+        parts += [f'-DDEFINE_{ii}=1' for ii in range(20)]
+        parts += ['-O2', '-std=c++17',
+                  '-o', f'{root}/obj/f{index}.o',
+                  '-c', f'{root}/src/f{index}.cpp']
+    return {'command': ' '.join(parts)}
+
+
+def run(count: int, windows: bool, batch: bool, quoted_ratio: float):
+    """Tokenize generated entries and return entries per second."""
+    rng = random.Random(0)
+    entries = [generate_command(ii, rng, windows, quoted_ratio)
+               for ii in range(count)]
+
+    start_time = time.perf_counter()
+    if batch:
+        cdb.get_commands(entries)
+    else:
+        for entry in entries:
+            cdb.get_command(entry)
+    elapsed = time.perf_counter() - start_time
+    return count / elapsed
+
+
+def main():
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description='Tokenizer benchmark.')
+    parser.add_argument('-n', '--count', type=int, default=20000,
+                        help='Number of generated entries.')
+    parser.add_argument('-q', '--quoted-ratio', type=float, default=0.2,
+                        help='Fraction of entries with quoted arguments.')
+    args = parser.parse_args()
+
+    for windows in (False, True):
+        for batch in (False, True):
+            rate = run(args.count, windows, batch, args.quoted_ratio)
+            style = 'windows' if windows else 'posix'
+            mode = 'batch' if batch else 'single'
+            print(f'{style:8} {mode:7} {rate:12.0f} entries/s')
+
+
+if __name__ == '__main__':
+    main()
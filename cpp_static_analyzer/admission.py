@@ -0,0 +1,77 @@
+"""Memory-aware admission of concurrent clang-tidy processes."""
+import threading
+import time
+
+import cpp_static_analyzer.history as hist
+
+
+class MemoryBudget:
+    """Admit processes while their predicted peak RSS fits in a budget.
+
+    Peak RSS of an entry is predicted from previous runs. Entries without
+    history are predicted at the median of the history, or an even share
+    of the budget if there is no history yet. A process is always admitted
+    when nothing runs, so an entry larger than the budget runs alone.
+    """
+
+    def __init__(self,
+                 budget: int,
+                 history: hist.MemoryHistory,
+                 num_of_jobs: int = 1,
+                 job_limit: int = 0):
+        self._budget = budget
+        self._history = history
+        self._job_limit = job_limit
+        if len(history) > 0:
+            self._default = history.get_default_estimate()
+        else:
+            self._default = budget / max(1, num_of_jobs)
+        self._in_use = 0.0
+        self._running = 0
+        self._peak = 0.0
+        self._wait_time = 0.0
+        self._condition = threading.Condition()
+
+    def estimate(self, keys):
+        """Predict peak RSS of one process analyzing entries of keys."""
+        return max((self._history.get(key) or self._default
+                    for key in keys), default=0.0)
+
+    def acquire(self, keys):
+        """Wait until a process of keys fits, return reserved bytes."""
+        reserved = self.estimate(keys)
+        if self._budget <= 0:
+            return 0.0
+        start_time = time.perf_counter()
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._running == 0 or
+                self._in_use + reserved <= self._budget)
+            self._in_use += reserved
+            self._running += 1
+            self._peak = max(self._peak, self._in_use)
+            self._wait_time += time.perf_counter() - start_time
+        return reserved
+
+    def release(self, reserved: float):
+        """Release bytes reserved by a finished process."""
+        if self._budget <= 0:
+            return
+        with self._condition:
+            self._running -= 1
+            # Reset rounding remainders of float reservations.
+            self._in_use = self._in_use - reserved if self._running > 0 \
+                else 0.0
+            self._condition.notify_all()
+
+    def get_job_limit(self):
+        """Get address space limit of a process in bytes, 0 if unlimited."""
+        return self._job_limit
+
+    def get_peak(self):
+        """Get highest predicted total of concurrent processes."""
+        return self._peak
+
+    def get_wait_time(self):
+        """Get seconds processes waited for admission, summed."""
+        return self._wait_time
@@ -0,0 +1,111 @@
+"""Asynchronous clang-tidy executor based on an asyncio event loop."""
+import asyncio
+import concurrent.futures
+
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.config as cfg
+import cpp_static_analyzer.console as con
+
+
+class AsyncExecutor:
+    """Run jobs of a command manager with bounded concurrency.
+
+    A single event loop dispatches every job and each job completes as soon
+    as its process exits, so there is no polling. Processes run and are
+    reaped with wait4 in a thread pool of one thread per job, which
+    records their CPU time and peak RSS. Cache lookups and result writes
+    run there too, to keep file I/O off the event loop.
+    """
+
+    def __init__(self,
+                 cmd_mgr: cm.CommandManager,
+                 config: cfg.Config,
+                 num_of_jobs: int,
+                 output_directory: str,
+                 error_directory: str,
+                 on_complete=None):
+        self._cmd_mgr = cmd_mgr
+        self._config = config
+        self._num_of_jobs = max(1, num_of_jobs)
+        self._output_directory = output_directory
+        self._error_directory = error_directory
+        self._on_complete = on_complete
+        self._completed = 0
+        self._failed = 0
+
+    async def _run_process(self, job):
+        """Run clang-tidy of a job within the memory budget.
+
+        Transient failures are retried as configured in the command
+        manager.
+        """
+        budget = self._cmd_mgr.get_memory_budget()
+        reserved = 0.0
+        memory_limit = 0
+        if budget is not None:
+            reserved = await asyncio.to_thread(
+                budget.acquire, [job.get_entry().get_key()])
+            memory_limit = budget.get_job_limit()
+        try:
+            stdout, stderr, usage, failure = await asyncio.to_thread(
+                cm.run_clang_tidy, job.get_command(), memory_limit,
+                self._cmd_mgr.get_timeout(), self._cmd_mgr.get_retries())
+        finally:
+            if budget is not None:
+                budget.release(reserved)
+        job.set_result(stdout, stderr)
+        job.set_usage(usage)
+        if failure is not None:
+            job.set_failure(failure)
+            self._failed += 1
+
+    async def _run_job(self, index: int, semaphore: asyncio.Semaphore):
+        try:
+            job = await asyncio.to_thread(self._cmd_mgr.prepare_job,
+                                          index, self._config)
+            if not job.is_done():
+                await self._run_process(job)
+
+            await asyncio.to_thread(self._cmd_mgr.complete_job, job,
+                                    self._output_directory,
+                                    self._error_directory)
+        except OSError as e:
+            self._failed += 1
+            con.error(f'Cannot execute job {index}: {e}.')
+        finally:
+            semaphore.release()
+
+        self._completed += 1
+        if self._on_complete is not None:
+            self._on_complete(self._completed)
+
+    async def run(self):
+        """Run all jobs, return number of failed jobs."""
+        # A job uses one pool thread at a time, so every job gets one.
+        asyncio.get_running_loop().set_default_executor(
+            concurrent.futures.ThreadPoolExecutor(self._num_of_jobs))
+        semaphore = asyncio.Semaphore(self._num_of_jobs)
+        tasks = set()
+
+        await semaphore.acquire()
+        index = self._cmd_mgr.next_index()
+        while index >= 0:
+            task = asyncio.create_task(self._run_job(index, semaphore))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+            await semaphore.acquire()
+            index = self._cmd_mgr.next_index()
+
+        semaphore.release()
+        if tasks:
+            await asyncio.gather(*tasks)
+        return self._failed
+
+    def get_completed_count(self):
+        """Get number of completed jobs."""
+        return self._completed
+
+    def get_failed_count(self):
+        """Get number of failed jobs."""
+        return self._failed
@@ -0,0 +1,267 @@
+"""Run several translation units per clang-tidy process."""
+import json
+import math
+import os
+import os.path
+import tempfile
+import threading
+
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.config as cfg
+import cpp_static_analyzer.console as con
+import cpp_static_analyzer.converted_db as cvdb
+import cpp_static_analyzer.dependency as dep
+import cpp_static_analyzer.diagnostics as diag
+import cpp_static_analyzer.history as hist
+
+
+def compose_batch_command(config: cfg.Config, build_dir: str, sources):
+    """Compose clang-tidy command line analyzing sources of a database."""
+    exec_cmd = [config.get_clang_tidy(), '--quiet']
+    if config.get_header_filter() != '':
+        exec_cmd.append(f'--header-filter={config.get_header_filter()}')
+    exec_cmd.append(f'--checks={config.get_checks()}')
+    exec_cmd.extend(config.get_additional_options())
+    exec_cmd.append(f'-p={build_dir}')
+    exec_cmd.extend(sources)
+    return exec_cmd
+
+
+def _normalize(path: str, directory: str):
+    if directory != '' and not os.path.isabs(path):
+        path = os.path.join(directory, path)
+    return os.path.normpath(path)
+
+
+def split_output(output: str, units, get_dependencies):
+    """Split output of a batch into outputs of its units.
+
+    units are (source, directory) pairs. A relative path in a diagnostic
+    is resolved against the directory of each unit, as clang-tidy runs
+    every unit in its own directory. A diagnostic in a source belongs
+    to its unit. A diagnostic in a header belongs to every unit including
+    it, as clang-tidy reports it only once per process, or to the first
+    unit if no unit is known to include it.
+    """
+    sources = [_normalize(source, directory) for source, directory in units]
+    texts = [[] for _ in units]
+    for diagnostic in diag.parse_diagnostics(output):
+        paths = [_normalize(diagnostic.get_file(), directory)
+                 for _, directory in units]
+        owner = next((idx for idx, path in enumerate(paths)
+                      if path == sources[idx]), None)
+        if owner is not None:
+            texts[owner].append(diagnostic.get_text())
+            continue
+
+        including = [idx for idx, path in enumerate(paths)
+                     if path in get_dependencies(idx)]
+        for idx in including or [0]:
+            texts[idx].append(diagnostic.get_text())
+
+    return ['\n'.join(text) + '\n' if text else '' for text in texts]
+
+
+def split_error(error: str, sources):
+    """Split stderr of a batch, lines naming no source go to the first."""
+    lines = [[] for _ in sources]
+    for line in error.splitlines():
+        idx = next((idx for idx, source in enumerate(sources)
+                    if source in line), 0)
+        lines[idx].append(line)
+    return ['\n'.join(text) + '\n' if text else '' for text in lines]
+
+
+class BatchSizer:
+    """Choose batch size from observed per-file cost.
+
+    Batches aim at a target wall time, so cheap files are grouped to
+    amortize process startup while expensive files run alone.
+    """
+
+    def __init__(self, max_size: int, target: float,
+                 estimate: float = None):
+        self._max_size = max(1, max_size)
+        self._target = target
+        self._estimate = estimate
+        self._lock = threading.Lock()
+
+    def record(self, duration: float, size: int):
+        """Record wall time of a batch of size files."""
+        per_file = duration / max(1, size)
+        with self._lock:
+            if self._estimate is not None:
+                per_file = hist.SMOOTHING * per_file + \
+                    (1.0 - hist.SMOOTHING) * self._estimate
+            self._estimate = per_file
+
+    def get_size(self, remaining: int = None, num_of_jobs: int = 1):
+        """Get size of next batch."""
+        if self._estimate is None:
+            # Measure a single file first.
+            size = 1
+        elif self._estimate <= 0.0:
+            size = self._max_size
+        else:
+            size = int(self._target / self._estimate)
+        if remaining is not None:
+            # Keep every worker busy until the end.
+            size = min(size, math.ceil(remaining / max(1, num_of_jobs)))
+        return min(max(1, size), self._max_size)
+
+    def get_estimate(self):
+        """Get smoothed per-file cost in seconds, or None."""
+        return self._estimate
+
+
+class BatchExecutor:
+    """Run jobs of a command manager in batches on worker threads.
+
+    Each batch is analyzed by one clang-tidy process reading the converted
+    database of the command manager, or a temporary database of the batch
+    if there is none. Cached entries are completed without
+    joining a batch, and entries with an input already in the batch wait
+    for the next one.
+    """
+
+    def __init__(self,
+                 cmd_mgr: cm.CommandManager,
+                 config: cfg.Config,
+                 num_of_jobs: int,
+                 sizer: BatchSizer):
+        self._cmd_mgr = cmd_mgr
+        self._config = config
+        self._num_of_jobs = max(1, num_of_jobs)
+        self._sizer = sizer
+        self._scanner = dep.DependencyScanner()
+        self._lock = threading.Lock()
+        self._failed = 0
+
+    def _get_remaining(self):
+        if not self._cmd_mgr.is_loaded():
+            return None
+        return len(self._cmd_mgr) - self._cmd_mgr.get_current_index()
+
+    def _collect(self, pending: list, out: str, err: str):
+        """Collect next batch of jobs, completing cached ones."""
+        size = self._sizer.get_size(self._get_remaining(),
+                                    self._num_of_jobs)
+        batch = []
+        sources = set()
+        deferred = []
+        while len(batch) < size:
+            job = pending.pop(0) if pending else None
+            if job is None:
+                index = self._cmd_mgr.next_index()
+                if index < 0:
+                    break
+                job = self._cmd_mgr.prepare_job(index, self._config)
+
+            if job.is_done():
+                self._cmd_mgr.complete_job(job, out, err)
+                continue
+            source = dep.get_source_path(job.get_entry(),
+                                         self._config.get_path_converter())
+            if source in sources:
+                deferred.append(job)
+                continue
+            sources.add(source)
+            batch.append(job)
+
+        pending.extend(deferred)
+        return batch
+
+    def _get_dependencies(self, batch):
+        cache = {}
+        path_converter = self._config.get_path_converter()
+
+        def get_dependencies(idx):
+            if idx not in cache:
+                source, _, quote_dirs, angle_dirs = \
+                    dep.get_translation_unit(batch[idx].get_entry(),
+                                             path_converter)
+                cache[idx] = set(self._scanner.get_dependencies(
+                    source, quote_dirs, angle_dirs))
+            return cache[idx]
+        return get_dependencies
+
+    def _execute(self, database, sources, memory_limit: int = 0):
+        """Run clang-tidy on sources, return (stdout, stderr, usage, failure).
+
+        The per translation unit timeout is scaled by the batch size.
+        """
+        timeout = self._cmd_mgr.get_timeout()
+        if timeout is not None:
+            timeout *= len(sources)
+        retries = self._cmd_mgr.get_retries()
+
+        build_dir = self._cmd_mgr.get_build_directory()
+        if build_dir != '' and \
+                self._cmd_mgr.get_shared_sources().isdisjoint(sources):
+            return cm.run_clang_tidy(
+                compose_batch_command(self._config, build_dir, sources),
+                memory_limit, timeout, retries)
+
+        with tempfile.TemporaryDirectory(prefix='cpp-sa-batch-') as build_dir:
+            with open(os.path.join(build_dir, cvdb.DATABASE_FILE), 'w',
+                      encoding='utf-8') as file:
+                json.dump(database, file)
+            return cm.run_clang_tidy(
+                compose_batch_command(self._config, build_dir, sources),
+                memory_limit, timeout, retries)
+
+    def _execute_within_budget(self, batch, database, sources):
+        """Run a batch once its predicted peak RSS fits the budget."""
+        budget = self._cmd_mgr.get_memory_budget()
+        if budget is None:
+            return self._execute(database, sources)
+        reserved = budget.acquire([job.get_entry().get_key()
+                                   for job in batch])
+        try:
+            return self._execute(database, sources, budget.get_job_limit())
+        finally:
+            budget.release(reserved)
+
+    def _run_batch(self, batch, out: str, err: str):
+        database = [cvdb.get_database_entry(job.get_entry(), self._config)
+                    for job in batch]
+        sources = [item['file'] for item in database]
+        output, error, usage, failure = \
+            self._execute_within_budget(batch, database, sources)
+
+        if failure is not None and len(batch) > 1:
+            # Isolate the failing units by analyzing them one at a time.
+            con.trace(f'Batch of {len(batch)} files failed, analyzing its '
+                      f'files separately.')
+            for job in batch:
+                self._run_batch([job], out, err)
+            return
+
+        if failure is None:
+            self._sizer.record(usage.get_wall_time(), len(batch))
+        else:
+            with self._lock:
+                self._failed += 1
+
+        units = [(item['file'], item['directory']) for item in database]
+        results = split_output(output, units,
+                               self._get_dependencies(batch))
+        errors = split_error(error, sources)
+        for job, result, error in zip(batch, results, errors):
+            job.set_result(result, error)
+            job.set_usage(usage.split(len(batch)))
+            job.set_failure(failure)
+            self._cmd_mgr.complete_job(job, out, err)
+
+    def job(self, output_directory: str, error_directory: str):
+        """Batch executor job."""
+        pending = []
+        batch = self._collect(pending, output_directory, error_directory)
+        while batch:
+            self._run_batch(batch, output_directory, error_directory)
+            batch = self._collect(pending, output_directory,
+                                  error_directory)
+
+    def get_failed_count(self):
+        """Get number of failed processes."""
+        return self._failed
@@ -0,0 +1,42 @@
+"""Queue handing items to a writer thread in batches."""
+import queue
+
+
+class BatchQueue:
+    """Queue of items taken by one consumer in batches.
+
+    Producers put items without waiting. The consumer gets every item
+    queued so far, up to a batch size, so that it can write them in one
+    transaction or make them durable with one flush.
+    """
+
+    def __init__(self, batch_size: int):
+        self._batch_size = batch_size
+        self._queue = queue.Queue()
+
+    def put(self, item):
+        """Queue an item."""
+        self._queue.put(item)
+
+    def close(self):
+        """Let the consumer stop once queued items are taken."""
+        self._queue.put(None)
+
+    def get_batch(self):
+        """Wait for queued items, return them or None when closed."""
+        item = self._queue.get()
+        if item is None:
+            return None
+
+        batch = [item]
+        while len(batch) < self._batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Keep the sentinel for the next call.
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
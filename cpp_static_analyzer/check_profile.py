@@ -0,0 +1,131 @@
+"""Per-check cost profiling across translation units."""
+import glob
+import json
+import os
+import os.path
+import threading
+
+import cpp_static_analyzer.console as con
+
+# Directory in the output directory clang-tidy stores profiles to.
+PROFILE_DIR = '.check-profile'
+
+_KEY_PREFIX = 'time.clang-tidy.'
+
+
+def get_profile_options(directory: str):
+    """Get clang-tidy options storing per-check profiles in directory."""
+    return ['--enable-check-profile', f'--store-check-profile={directory}']
+
+
+def clear_profiles(directory: str):
+    """Create directory, removing profiles of a previous run."""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+
+def parse_profile(data: dict):
+    """Parse a stored profile, return (file, {check: seconds}).
+
+    Wall time is used, or user plus system time if wall time is missing.
+    """
+    wall = {}
+    cpu = {}
+    for key, value in data.get('profile', {}).items():
+        if not key.startswith(_KEY_PREFIX):
+            continue
+        check, _, kind = key[len(_KEY_PREFIX):].rpartition('.')
+        if kind == 'wall':
+            wall[check] = wall.get(check, 0.0) + value
+        elif kind in ('user', 'sys'):
+            cpu[check] = cpu.get(check, 0.0) + value
+    for check, seconds in cpu.items():
+        wall.setdefault(check, seconds)
+    return data.get('file', ''), wall
+
+
+class CheckProfile:
+    """Time spent by each check, aggregated over translation units."""
+
+    def __init__(self):
+        self._totals = {}
+        self._maxima = {}
+        self._units = 0
+        self._analysis_time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, timings: dict):
+        """Add check timings of one translation unit."""
+        self._units += 1
+        for check, seconds in timings.items():
+            self._totals[check] = self._totals.get(check, 0.0) + seconds
+            self._maxima[check] = max(self._maxima.get(check, 0.0), seconds)
+
+    def add_job(self, job):
+        """Account analysis time of a completed job."""
+        if job.is_cached() or job.is_duplicate():
+            return
+        with self._lock:
+            self._analysis_time += job.get_duration()
+
+    def load_directory(self, directory: str):
+        """Add profiles stored in directory, return number of profiles."""
+        count = 0
+        for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    _, timings = parse_profile(json.load(file))
+            except (OSError, ValueError):
+                con.trace(f'Cannot read check profile {path}.')
+                continue
+            self.add(timings)
+            count += 1
+        return count
+
+    def get_unit_count(self):
+        """Get number of profiled translation units."""
+        return self._units
+
+    def get_check_time(self):
+        """Get seconds spent in checks."""
+        return sum(self._totals.values())
+
+    def get_analysis_time(self):
+        """Get seconds spent by analyzed jobs."""
+        return self._analysis_time
+
+    def get_rows(self):
+        """Get (check, total, mean, max, saving) rows, costliest first.
+
+        saving is the share of analysis time projected to be saved by
+        disabling the check, relative to the check time if no job time was
+        accounted.
+        """
+        base = self._analysis_time or self.get_check_time()
+        units = max(1, self._units)
+        rows = [(check, total, total / units, self._maxima[check],
+                 total / base if base > 0.0 else 0.0)
+                for check, total in self._totals.items()]
+        rows.sort(key=lambda row: (-row[1], row[0]))
+        return rows
+
+    def write_report(self, path: str, elapsed: float = None):
+        """Write ranked report to path."""
+        rows = self.get_rows()
+        width = max([len('Check')] + [len(row[0]) for row in rows])
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(f'{self._units} translation units, '
+                       f'{self.get_check_time():.2f}s in checks, '
+                       f'{self._analysis_time:.2f}s analysis time.\n\n')
+            file.write(f'{"Rank":>4}  {"Check":<{width}}  {"Total s":>9}  '
+                       f'{"Mean ms":>9}  {"Max ms":>9}  {"Saving":>7}'
+                       f'{"  Wall s" if elapsed is not None else ""}\n')
+            for rank, (check, total, mean, maximum, saving) in \
+                    enumerate(rows, 1):
+                file.write(f'{rank:>4}  {check:<{width}}  {total:>9.3f}  '
+                           f'{mean * 1000:>9.1f}  {maximum * 1000:>9.1f}  '
+                           f'{saving:>7.1%}')
+                if elapsed is not None:
+                    file.write(f'  {saving * elapsed:>6.1f}')
+                file.write('\n')
@@ -1,33 +1,49 @@
 """Static analyzer command manager."""
 import subprocess as sproc
 import threading
+import time
+import os
 import os.path
 import hashlib
 
+import cpp_static_analyzer.admission as adm
 import cpp_static_analyzer.compile_db as cdb
 import cpp_static_analyzer.config as cfg
+import cpp_static_analyzer.console as con
+import cpp_static_analyzer.dependency as dep
+import cpp_static_analyzer.failures as fl
+import cpp_static_analyzer.process as pr
+import cpp_static_analyzer.result_cache as rc
 
 
-def _execute_clang_tidy(command, config: cfg.Config) -> tuple:
-    """Execute clang-tidy."""
-    entry = cdb.Entry(command)
+def _compose_command(entry: cdb.Entry,
+                     config: cfg.Config,
+                     build_dir: str = '') -> list:
+    """Compose command line for clang-tidy.
 
-    # Compose command line for clang-tidy.
+    With a build directory, compile arguments are read by clang-tidy from
+    its converted compile database instead of the command line.
+    """
     exec_cmd = []
 
-    exec_cmd.append(config.clang_tidy)
+    exec_cmd.append(config.get_clang_tidy())
     exec_cmd.append('--quiet')
 
-    if config.header_filter != '':
-        exec_cmd.append(f'--header-filter={config.header_filter}')
+    if config.get_header_filter() != '':
+        exec_cmd.append(f'--header-filter={config.get_header_filter()}')
 
-    exec_cmd.append(f'--checks={config.checks}')
+    exec_cmd.append(f'--checks={config.get_checks()}')
 
-    for additional_option in config.additional_options:
+    for additional_option in config.get_additional_options():
         exec_cmd.append(additional_option)
 
-    input_path = entry.get_input_path()
     path_converter = config.get_path_converter()
+    if build_dir != '':
+        exec_cmd.append(f'-p={build_dir}')
+        exec_cmd.append(dep.get_source_path(entry, path_converter))
+        return exec_cmd
+
+    input_path = entry.get_input_path()
     conv_input_path = cdb.convert_path(input_path,
                                        path_converter)
     exec_cmd.append(f'{conv_input_path}')
@@ -43,16 +59,218 @@ def _execute_clang_tidy(command, config: cfg.Config) -> tuple:
     for warning in warnings:
         exec_cmd.append(warning)
 
-    proc = sproc.run(exec_cmd,
-                     encoding='utf-8',
-                     shell=False,
-                     stdout=sproc.PIPE,
-                     stderr=sproc.PIPE,
-                     universal_newlines=True,
-                     text=True,
-                     check=True)
+    return exec_cmd
+
+
+def _run_once(exec_cmd: list, memory_limit: int, timeout: float):
+    """Run clang-tidy once, return (stdout, stderr, usage, failure)."""
+    start_time = time.perf_counter()
+    try:
+        returncode, result, error, usage = pr.run_process(
+            exec_cmd, memory_limit, timeout)
+    except sproc.TimeoutExpired as e:
+        duration = time.perf_counter() - start_time
+        return e.output or '', e.stderr or '', pr.ResourceUsage(duration), \
+            fl.make_failure(None, duration, e.stderr, timed_out=True)
+    except OSError as e:
+        duration = time.perf_counter() - start_time
+        return '', f'{e}\n', pr.ResourceUsage(duration), \
+            fl.make_failure(None, duration, str(e))
+
+    failure = None
+    if returncode != 0:
+        failure = fl.make_failure(returncode, usage.get_wall_time(), error)
+    return result, error, usage, failure
+
+
+def run_clang_tidy(exec_cmd: list,
+                   memory_limit: int = 0,
+                   timeout: float = None,
+                   retries: int = 0) -> tuple:
+    """Run clang-tidy command line, retrying transient failures.
+
+    Return (stdout, stderr, usage, failure), failure is a failure record
+    of the last attempt or None.
+    """
+    attempts = 0
+    while True:
+        attempts += 1
+        result, error, usage, failure = _run_once(exec_cmd, memory_limit,
+                                                  timeout)
+        if failure is None or not fl.is_transient(failure) or \
+                attempts > retries:
+            break
+    if failure is not None:
+        failure['attempts'] = attempts
+    return result, error, usage, failure
+
+
+def execute_clang_tidy(command, config: cfg.Config,
+                       timeout: float = None, retries: int = 0) -> tuple:
+    """Execute clang-tidy on a command entry.
+
+    Return (entry, stdout, stderr, usage, failure).
+    """
+    entry = cdb.Entry(command)
+    result, error, usage, failure = run_clang_tidy(
+        _compose_command(entry, config), 0, timeout, retries)
+    return entry, result, error, usage, failure
+
+
+def get_invocation_fingerprint(entry: cdb.Entry, config: cfg.Config):
+    """Get digest of the effective clang-tidy invocation of an entry.
+
+    The invocation runs in the directory of the entry, which resolves its
+    relative paths, so the directory is part of the digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    directory = cdb.convert_path(entry.get_directory(),
+                                 config.get_path_converter())
+    digest.update(directory.encode('utf-8'))
+    digest.update(b'\0')
+    for argument in _compose_command(entry, config):
+        digest.update(argument.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.digest()
+
+
+def _get_raw_key(command: dict):
+    """Get hashable key of the fields used to compose the invocation."""
+    arguments = command.get('arguments')
+    return (command.get('directory', ''),
+            command.get('file', ''),
+            command.get('command', ''),
+            tuple(arguments) if arguments is not None else ())
+
+
+def _make_cache_key(entry: cdb.Entry,
+                    config: cfg.Config,
+                    result_cache: rc.ResultCache,
+                    scanner: dep.DependencyScanner) -> str:
+    """Compose result cache key of an entry."""
+    input_path, arguments, quote_dirs, angle_dirs = \
+        dep.get_translation_unit(entry, config.get_path_converter())
+    dependencies = scanner.get_dependencies(input_path,
+                                            quote_dirs,
+                                            angle_dirs)
+
+    version = rc.get_clang_tidy_version(config.get_clang_tidy())
+    return result_cache.make_key(version,
+                                 config.get_fingerprint(),
+                                 input_path,
+                                 arguments,
+                                 dependencies)
+
+
+def get_output_name(input_path: str):
+    """Get name of the output and error files of an input."""
+    file_name = os.path.basename(input_path)
+    file_id = hashlib.md5(file_name.encode('utf-8')).hexdigest()
+    return f'{file_name}.{file_id}'
+
 
-    return entry, proc.stdout, proc.stderr
+class Job:
+    """A clang-tidy invocation of one command entry."""
+
+    _index = -1
+    _entry = None
+    _command = []
+    _cache_key = ''
+    _result = None
+    _error = None
+    _cached = False
+    _duration = 0.0
+    _usage = None
+    _failure = None
+    _duplicate = False
+
+    def __init__(self, index: int, entry: cdb.Entry, command: list):
+        self._index = index
+        self._entry = entry
+        self._command = command
+        self._cache_key = ''
+        self._result = None
+        self._error = None
+        self._cached = False
+        self._duration = 0.0
+        self._usage = None
+        self._failure = None
+        self._duplicate = False
+
+    def get_index(self):
+        """Get command index."""
+        return self._index
+
+    def get_entry(self):
+        """Get command entry."""
+        return self._entry
+
+    def get_command(self):
+        """Get clang-tidy command line."""
+        return self._command
+
+    def get_cache_key(self):
+        """Get result cache key."""
+        return self._cache_key
+
+    def set_cache_key(self, key: str):
+        """Set result cache key."""
+        self._cache_key = key
+
+    def set_result(self, result: str, error: str, cached: bool = False):
+        """Set clang-tidy stdout and stderr."""
+        self._result = result
+        self._error = error
+        self._cached = cached
+
+    def get_result(self):
+        """Get clang-tidy stdout."""
+        return self._result
+
+    def get_error(self):
+        """Get clang-tidy stderr."""
+        return self._error
+
+    def is_done(self):
+        """Check whether the result is available."""
+        return self._result is not None
+
+    def is_cached(self):
+        """Check whether the result was replayed from the cache."""
+        return self._cached
+
+    def get_duration(self):
+        """Get wall time of clang-tidy execution in seconds."""
+        return self._duration
+
+    def set_duration(self, duration: float):
+        """Set wall time of clang-tidy execution in seconds."""
+        self._duration = duration
+
+    def get_usage(self):
+        """Get resources used by clang-tidy, or None if it did not run."""
+        return self._usage
+
+    def set_usage(self, usage: pr.ResourceUsage):
+        """Set resources used by clang-tidy and its wall time."""
+        self._usage = usage
+        self._duration = usage.get_wall_time()
+
+    def get_failure(self):
+        """Get failure record, or None if clang-tidy succeeded."""
+        return self._failure
+
+    def set_failure(self, failure: dict):
+        """Set failure record of the clang-tidy invocation."""
+        self._failure = failure
+
+    def is_duplicate(self):
+        """Check whether the result was fanned out from another entry."""
+        return self._duplicate
+
+    def set_duplicate(self, duplicate: bool):
+        """Set whether the result was fanned out from another entry."""
+        self._duplicate = duplicate
 
 
 class CommandManager:
@@ -62,32 +280,191 @@ class CommandManager:
     _command_count = 0
     _lock = threading.Lock()
     _current_index = 0
+    _order = None
+    _result_cache = None
+    _scanner = None
+    _source = None
+    _start_time = 0.0
+    _first_dispatch_time = None
+    _listeners = []
+    _duplicates = {}
+    _build_dir = ''
+    _shared_sources = set()
+    _memory_budget = None
+    _timeout = None
+    _retries = 0
+    _completed_count = 0
+    _remove_stale_outputs = False
+    _path = ''
+    _load_error = None
 
-    def __init__(self, path: str):
-        self._commands = cdb.load_compile_commands(path)
-        self._command_count = len(self._commands)
+    def __init__(self,
+                 path: str,
+                 result_cache: rc.ResultCache = None,
+                 stream: bool = False):
+        self._start_time = time.perf_counter()
+        self._first_dispatch_time = None
+        self._path = path
+        self._load_error = None
+        if stream:
+            # Entries are parsed on demand and released once processed.
+            self._source = cdb.iter_compile_commands(path)
+            self._commands = {}
+            self._command_count = 0
+        else:
+            self._source = None
+            self._commands = cdb.load_compile_commands(path)
+            self._command_count = len(self._commands)
         self._lock = threading.Lock()
         self._current_index = 0
+        self._order = None
+        self._result_cache = result_cache
+        self._scanner = dep.DependencyScanner()
+        self._listeners = []
+        self._duplicates = {}
+        self._build_dir = ''
+        self._shared_sources = set()
+        self._memory_budget = None
+        self._timeout = None
+        self._retries = 0
+        self._completed_count = 0
+        self._remove_stale_outputs = False
+
+    def _next_streamed_index(self):
+        """Parse next entry from the stream (lock must be held)."""
+        try:
+            command = next(self._source)
+        except StopIteration:
+            self._source = None
+            return -1
+        except ValueError as e:
+            self._stop_stream(e)
+            return -1
+
+        idx = self._current_index
+        self._commands[idx] = command
+        self._current_index += 1
+        self._command_count += 1
+        return idx
+
+    def _stop_stream(self, error: ValueError):
+        """Stop dispatching a stream that cannot be parsed further."""
+        self._source = None
+        self._load_error = f'Cannot parse {self._path}: {error}.'
+        con.error(self._load_error)
+
+    def get_load_error(self):
+        """Get error of a streamed database parsed partially, or None."""
+        return self._load_error
 
     def next_index(self):
         """Next index."""
-        if self._current_index >= self._command_count:
+        if self._source is None and \
+                self._current_index >= self._command_count:
             return -1
         with self._lock:
-            if self._current_index < self._command_count:
+            if self._source is not None:
+                idx = self._next_streamed_index()
+            elif self._current_index < self._command_count:
                 idx = self._current_index
+                if self._order is not None:
+                    idx = self._order[idx]
                 self._current_index += 1
             else:
                 idx = -1
 
+            if idx >= 0 and self._first_dispatch_time is None:
+                self._first_dispatch_time = time.perf_counter()
+
         return idx
 
+    def release(self, index):
+        """Release a processed streamed entry."""
+        if isinstance(self._commands, dict):
+            with self._lock:
+                self._commands.pop(index, None)
+
+    def is_loaded(self):
+        """Check whether the whole compile database has been parsed."""
+        return self._source is None
+
+    def get_time_to_first_dispatch(self):
+        """Get seconds from construction to first dispatched entry."""
+        if self._first_dispatch_time is None:
+            return None
+        return self._first_dispatch_time - self._start_time
+
     def __getitem__(self, index):
         return self._commands[index]
 
     def __len__(self):
         return self._command_count
 
+    def get_commands(self):
+        """Get all commands, parsing the rest of a streamed database."""
+        with self._lock:
+            if isinstance(self._commands, dict):
+                streamed = [self._commands[idx]
+                            for idx in sorted(self._commands)]
+                remaining = []
+                try:
+                    for command in self._source or ():
+                        remaining.append(command)
+                except ValueError as e:
+                    self._stop_stream(e)
+                self._commands = streamed + remaining
+                self._command_count = len(self._commands)
+                self._source = None
+        return self._commands
+
+    def select(self, indices):
+        """Restrict dispatching to the given command indices, in order."""
+        with self._lock:
+            self._order = list(indices)
+            self._command_count = len(self._order)
+            self._current_index = 0
+            self._completed_count = 0
+
+    def get_selected_indices(self):
+        """Get indices to be dispatched, in dispatch order."""
+        if self._order is not None:
+            return list(self._order)
+        return list(range(self._command_count))
+
+    def deduplicate(self, config: cfg.Config):
+        """Dispatch each unique invocation once.
+
+        Results of a dispatched entry are fanned out to the entries with
+        the same effective invocation. Entries with identical raw fields
+        share one fingerprint computation. Return number of saved
+        invocations.
+        """
+        commands = self.get_commands()
+        selected = self.get_selected_indices()
+        raw_fingerprints = {}
+        representatives = {}
+        duplicates = {}
+
+        for idx in selected:
+            raw_key = _get_raw_key(commands[idx])
+            fingerprint = raw_fingerprints.get(raw_key)
+            if fingerprint is None:
+                fingerprint = get_invocation_fingerprint(
+                    cdb.Entry(commands[idx]), config)
+                raw_fingerprints[raw_key] = fingerprint
+
+            representative = representatives.setdefault(fingerprint, idx)
+            if representative != idx:
+                duplicates.setdefault(representative, []).append(idx)
+
+        self.select(representatives.values())
+        self._duplicates = duplicates
+        return len(selected) - len(representatives)
+
+    def get_duplicates(self, index):
+        """Get indices of entries receiving the results of index."""
+        return self._duplicates.get(index, [])
+
     def get_current_index(self):
         """Get current index."""
         return self._current_index
@@ -96,6 +473,158 @@ class CommandManager:
         if len(content) > 0:
             with open(file_path, 'w', encoding="utf-8") as output_file:
                 print(content, file=output_file)
+        elif self._remove_stale_outputs:
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+    def set_remove_stale_outputs(self, remove: bool):
+        """Remove output files of re-analyzed entries producing none."""
+        self._remove_stale_outputs = remove
+
+    def get_result_cache(self):
+        """Get result cache, or None if caching is disabled."""
+        return self._result_cache
+
+    def invalidate(self, paths):
+        """Forget memoized includes and digests of changed files."""
+        for path in paths:
+            self._scanner.invalidate(path)
+        if self._result_cache is not None:
+            self._result_cache.invalidate(paths)
+
+    def add_completion_listener(self, listener):
+        """Call listener(job) whenever a job completes."""
+        self._listeners.append(listener)
+
+    def clear_completion_listeners(self):
+        """Remove all completion listeners."""
+        self._listeners = []
+
+    def set_build_directory(self, build_dir: str, shared_sources=()):
+        """Run clang-tidy with -p on a converted database in build_dir.
+
+        Sources with several entries in the database keep arguments on the
+        command line, as -p would analyze every entry of the source.
+        """
+        self._build_dir = build_dir
+        self._shared_sources = set(shared_sources)
+
+    def get_build_directory(self):
+        """Get build directory, or empty string if not used."""
+        return self._build_dir
+
+    def get_shared_sources(self):
+        """Get sources with several entries in the converted database."""
+        return self._shared_sources
+
+    def set_memory_budget(self, budget: adm.MemoryBudget):
+        """Admit clang-tidy processes within a memory budget."""
+        self._memory_budget = budget
+
+    def get_memory_budget(self):
+        """Get memory budget, or None if processes are not limited."""
+        return self._memory_budget
+
+    def set_failure_policy(self, timeout: float = None, retries: int = 0):
+        """Kill clang-tidy after timeout seconds, retry transient failures.
+
+        The timeout applies per translation unit, retries bound the
+        additional attempts after a timeout, a signal or a failed start.
+        """
+        self._timeout = timeout
+        self._retries = retries
+
+    def get_timeout(self):
+        """Get per translation unit timeout in seconds, or None."""
+        return self._timeout
+
+    def get_retries(self):
+        """Get number of retries of transient failures."""
+        return self._retries
+
+    def get_completed_count(self):
+        """Get number of completed dispatched jobs."""
+        return self._completed_count
+
+    def prepare_job(self, index, config: cfg.Config):
+        """Create job of a command, replaying cached result if available."""
+        entry = cdb.Entry(self[index])
+        build_dir = self._build_dir
+        if build_dir != '' and dep.get_source_path(
+                entry, config.get_path_converter()) in self._shared_sources:
+            build_dir = ''
+        job = Job(index, entry, _compose_command(entry, config, build_dir))
+
+        if self._result_cache is not None:
+            key = _make_cache_key(entry, config,
+                                  self._result_cache, self._scanner)
+            job.set_cache_key(key)
+            cached = self._result_cache.get(key)
+            if cached is not None:
+                job.set_result(cached[0], cached[1], cached=True)
+
+        return job
+
+    def _write_job(self,
+                   job,
+                   output_directory: str,
+                   error_directory: str):
+        output_name = get_output_name(job.get_entry().get_input_path())
+        output_file_path = f'{output_directory}/{output_name}'
+        error_file_path = f'{error_directory}/{output_name}'
+
+        self._write_to_file(job.get_result(), output_file_path)
+        self._write_to_file(job.get_error(), error_file_path)
+
+        for listener in self._listeners:
+            listener(job)
+        self.release(job.get_index())
+
+    def complete_job(self,
+                     job,
+                     output_directory: str,
+                     error_directory: str):
+        """Store and write result of a finished job and its duplicates."""
+        if self._result_cache is not None and not job.is_cached() and \
+                job.get_failure() is None:
+            self._result_cache.put(job.get_cache_key(),
+                                   job.get_result(),
+                                   job.get_error())
+
+        self._write_job(job, output_directory, error_directory)
+
+        with self._lock:
+            duplicates = self._duplicates.pop(job.get_index(), [])
+            self._completed_count += 1
+        for index in duplicates:
+            duplicate = Job(index, cdb.Entry(self[index]), job.get_command())
+            duplicate.set_result(job.get_result(), job.get_error(),
+                                 job.is_cached())
+            duplicate.set_duration(job.get_duration())
+            duplicate.set_failure(job.get_failure())
+            duplicate.set_duplicate(True)
+            self._write_job(duplicate, output_directory, error_directory)
+
+    def _run_job(self, job):
+        """Run clang-tidy of a job within the memory budget."""
+        budget = self._memory_budget
+        reserved = 0.0
+        memory_limit = 0
+        if budget is not None:
+            reserved = budget.acquire([job.get_entry().get_key()])
+            memory_limit = budget.get_job_limit()
+        try:
+            result, error, usage, failure = run_clang_tidy(
+                job.get_command(), memory_limit, self._timeout,
+                self._retries)
+        finally:
+            if budget is not None:
+                budget.release(reserved)
+        job.set_result(result, error)
+        job.set_usage(usage)
+        job.set_failure(failure)
 
     def job(self,
             config: cfg.Config,
@@ -104,18 +633,10 @@ class CommandManager:
         """Command executor job."""
         index = self.next_index()
         while index >= 0:
-            command = self[index]
-
-            entry, result, error = _execute_clang_tidy(command, config)
-
-            input_path = entry.get_input_path()
-            file_name = os.path.basename(input_path)
-            file_id = hashlib.md5(file_name.encode('utf-8')).hexdigest()
-
-            output_file_path = f'{output_directory}/{file_name}.{file_id}'
-            error_file_path = f'{error_directory}/{file_name}.{file_id}'
+            job = self.prepare_job(index, config)
+            if not job.is_done():
+                self._run_job(job)
 
-            self._write_to_file(result, output_file_path)
-            self._write_to_file(error, error_file_path)
+            self.complete_job(job, output_directory, error_directory)
 
             index = self.next_index()
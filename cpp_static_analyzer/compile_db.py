@@ -1,79 +1,89 @@
 """Compile commands loader & data-base handler."""
+import functools
 import json
+import os
 import pathlib as plib
-
-
-def get_next_quote(it, cc, cmd):
-    """Search for next double quotation."""
-    result = cc
-    try:
-        cc = cmd[next(it)]
-        while cc != '"':
-            result += cc
-            cc = cmd[next(it)]
-        result += cc
-        cc = cmd[next(it)]
-    except StopIteration:
-        cc = 0
-    return result, cc
-
-
-def get_next_space(it, cc, cmd):
-    """Search for next space."""
-    result = cc
-    try:
-        cc = cmd[next(it)]
-        while not cc in (' ', 0):
-            if cc == '"':
-                sub_str, cc = get_next_quote(it, cc, cmd)
-                result += sub_str
-            else:
-                result += cc
-                cc = cmd[next(it)]
-    except StopIteration:
-        cc = 0
-    return result, cc
-
-
-def skip_whitespace(it, cc, cmd):
-    """Skip whitespaces (space, line, tab)"""
-    try:
-        while cc in ('\n', '\t', ' '):
-            cc = cmd[next(it)]
-    except StopIteration:
-        cc = 0
-    return cc
+import re
+import sys
+
+
+# POSIX shell words: a backslash escapes the next character outside of
+# single quotes, and double quotes may contain escaped characters.
+_POSIX_TOKEN_PATTERN = re.compile(r"""
+    [^\s"'\\]+(?=\s|$)           # fast path for plain words
+  | (?:
+        [^\s"'\\]++               # plain characters
+      | \\.                       # escaped character
+      | \\$                       # trailing backslash
+      | "(?:[^"\\]++|\\.)*+(?:"|$)  # double quoted section
+      | '[^']*+(?:'|$)            # single quoted section
+    )++
+""", re.VERBOSE | re.DOTALL)
+
+# Windows (CommandLineToArgvW) words: backslashes are literal unless they
+# precede a double quote, where an odd count escapes the quote.
+_WINDOWS_TOKEN_PATTERN = re.compile(r"""
+    (?:
+        [^\s"\\]++                # plain characters
+      | \\++(?![\\"])             # literal backslashes
+      | (?:\\\\)*\\"              # escaped quote
+      | (?:\\\\)+(?=")            # backslashes before a quote
+      | "(?:
+            [^"\\]++
+          | \\++(?![\\"])
+          | (?:\\\\)*\\"
+          | (?:\\\\)+(?=")
+        )*+(?:"|$)                # double quoted section
+    )++
+""", re.VERBOSE)
+
+# Command lines without these characters are split on whitespace only.
+_POSIX_SPECIAL_PATTERN = re.compile(r'["\'\\]')
+_WINDOWS_SPECIAL_PATTERN = re.compile(r'"')
+
+_WINDOWS_COMMAND_PATTERN = re.compile(r'\s*"?(?:[A-Za-z]:[\\/]|\S*\.exe\b)')
+
+
+def is_windows_command(command: str):
+    """Check whether a command line uses Windows-style quoting."""
+    return _WINDOWS_COMMAND_PATTERN.match(command) is not None
+
+
+def tokenize_command(command: str, windows=None):
+    """Split a command line into arguments in a single pass.
+
+    Quotes and escapes are kept verbatim in the arguments. Windows-style
+    quoting is detected from the compiler path unless windows is given.
+    """
+    if windows is None:
+        windows = is_windows_command(command)
+    if windows:
+        if _WINDOWS_SPECIAL_PATTERN.search(command) is None:
+            return command.split()
+        return _WINDOWS_TOKEN_PATTERN.findall(command)
+    if _POSIX_SPECIAL_PATTERN.search(command) is None:
+        return command.split()
+    return _POSIX_TOKEN_PATTERN.findall(command)
 
 
 def get_command(dictionary: dict):
     """Get command from compile_commands.json."""
-    command_list = []
     if 'command' not in dictionary:
-        return command_list
-
-    string = dictionary['command']
-    str_len = len(string)
-    range_iter = iter(range(str_len))
-    command = ''
+        return []
 
-    for ii in range_iter:
-        curr_cc = string[ii]
+    return tokenize_command(dictionary['command'])
 
-        curr_cc = skip_whitespace(range_iter, curr_cc, string)
 
-        if curr_cc == '"':
-            # Search for next quote.
-            curr_cmd, curr_cc = get_next_quote(range_iter, curr_cc, string)
+def get_commands(dictionaries):
+    """Get commands of a batch of compile_commands.json entries."""
+    command_lists = []
+    for dictionary in dictionaries:
+        command = dictionary.get('command')
+        if command is None:
+            command_lists.append([])
         else:
-            # Search for next space.
-            curr_cmd, curr_cc = get_next_space(range_iter, curr_cc, string)
-        command += curr_cmd
-
-        if curr_cc in (' ', 0):
-            command_list.append(command)
-            command = ""
-
-    return command_list
+            command_lists.append(tokenize_command(command))
+    return command_lists
 
 
 def get_arguments(dictionary: dict):
@@ -84,27 +94,151 @@ def get_arguments(dictionary: dict):
     return dictionary['arguments']
 
 
+def _compact_command(dictionary: dict):
+    """Intern directory and arguments, which entries mostly share."""
+    directory = dictionary.get('directory')
+    if isinstance(directory, str):
+        dictionary['directory'] = sys.intern(directory)
+    arguments = dictionary.get('arguments')
+    if isinstance(arguments, list):
+        dictionary['arguments'] = [
+            sys.intern(argument) if isinstance(argument, str) else argument
+            for argument in arguments]
+    return dictionary
+
+
 def load_compile_commands(filename):
-    """Load compile_commands.json."""
+    """Load compile_commands.json.
+
+    Entries are decoded one at a time with shared fields interned, so
+    neither the file content nor duplicated strings are held at once.
+    """
+    return list(iter_compile_commands(filename))
+
+
+def _skip_whitespace(buffer: str, position: int):
+    """Skip JSON whitespace, return position of next character."""
+    while position < len(buffer) and buffer[position] in ' \t\r\n':
+        position += 1
+    return position
+
+
+def _read_array_start(f, filename, chunk_size: int):
+    """Read up to opening bracket, return (buffer, position after it)."""
+    buffer = f.read(chunk_size)
+    while buffer.strip() == '':
+        chunk = f.read(chunk_size)
+        if chunk == '':
+            break
+        buffer += chunk
+
+    position = _skip_whitespace(buffer, 0)
+    if buffer[position:position + 1] != '[':
+        raise ValueError(f'{filename}: expected a JSON array.')
+    return buffer, position + 1
+
+
+def iter_compile_commands(filename, chunk_size: int = 1 << 16):
+    """Yield entries of compile_commands.json one at a time.
+
+    The file is read in chunks and only the entry being decoded is kept in
+    memory, so memory use does not depend on the size of the database.
+    """
+    decoder = json.JSONDecoder(object_hook=_compact_command)
     with open(filename, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return data
+        buffer, position = _read_array_start(f, filename, chunk_size)
+        eof = False
+
+        while True:
+            position = _skip_whitespace(buffer, position)
+            if position < len(buffer) and buffer[position] in ',]':
+                if buffer[position] == ']':
+                    return
+                position = _skip_whitespace(buffer, position + 1)
+
+            try:
+                if position >= len(buffer):
+                    raise json.JSONDecodeError('Incomplete entry',
+                                               buffer, position)
+                entry, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = chunk == ''
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            yield entry
+
+
+def write_compile_commands(entries, file, indent: int = None):
+    """Write entries to a file as a JSON array one at a time.
+
+    Return number of written entries.
+    """
+    count = 0
+    file.write('[')
+    for entry in entries:
+        file.write(',\n' if count > 0 else '\n')
+        text = json.dumps(entry, indent=indent)
+        if indent is not None:
+            text = ''.join(' ' * indent + line
+                           for line in text.splitlines(keepends=True))
+        file.write(text)
+        count += 1
+    file.write('\n]\n' if count > 0 else ']\n')
+    return count
+
+
+# Maximum number of memoized conversions of a path converter.
+_CONVERSION_CACHE_SIZE = 1 << 16
+
+
+class PathConverter(dict):
+    """Path converter mapping compiled into one alternation pattern.
+
+    The first occurrence of a key is replaced, and the longest key wins
+    among keys occurring at the same position. Conversions are memoized
+    in a bounded cache, as the same include paths repeat across entries.
+    The mapping must not be modified after construction.
+    """
+
+    def __init__(self, mapping=None, cache_size: int = _CONVERSION_CACHE_SIZE):
+        super().__init__(mapping or {})
+        keys = sorted((str(key) for key in self if key != ''),
+                      key=len, reverse=True)
+        self._pattern = None
+        if keys:
+            self._pattern = re.compile('|'.join(re.escape(key)
+                                                for key in keys))
+        self._convert = functools.lru_cache(maxsize=cache_size)(
+            self._convert_uncached)
+
+    def _convert_uncached(self, path: str):
+        match = self._pattern.search(path)
+        if match is None:
+            return path
+        return path[:match.start()] + str(self[match.group()]) + \
+            path[match.end():]
+
+    def convert(self, path: str):
+        """Convert path."""
+        if self._pattern is None:
+            return path
+        return self._convert(path)
+
+    def get_cache_info(self):
+        """Get memo cache statistics."""
+        return self._convert.cache_info()
 
 
 def convert_path(path: str, converter: dict):
     """Convert path."""
-    result = path
-    for key, value in converter.items():
-        index = path.find(key)
-        if index >= 0:
-            if index > 0:
-                sub_str0 = path[0:index]
-            else:
-                sub_str0 = ''
-            sub_str1 = path[len(key) + index:]
-            result = sub_str0 + value + sub_str1
-            break
-    return result
+    if not isinstance(converter, PathConverter):
+        converter = PathConverter(converter, cache_size=0)
+    return converter.convert(path)
 
 
 def filter_warnings(commands):
@@ -119,36 +253,100 @@ def filter_warnings(commands):
     return filtered_commands
 
 
-class Entry:
-    """A command entry."""
+def _make_key(directory: str, input_path: str, output_path: str):
+    return '\0'.join((directory, input_path, output_path))
 
-    _directory = ''
-    _arguments = []
-    _input_path = ''
-    _output_path = ''
 
-    def __init__(self, dictionary):
-        if 'directory' in dictionary:
-            self._directory = plib.Path(dictionary['directory']).as_posix()
-        else:
-            self._directory = ''
+# Paths that pathlib would change on POSIX: empty, '.' components,
+# repeated or trailing separators.
+_UNNORMALIZED_PATH_PATTERN = re.compile(r'^$|(?:^|/)\.(?:/|$)|//|/$')
 
-        if 'arguments' in dictionary:
-            self._arguments = get_arguments(dictionary)
-        elif 'command' in dictionary:
-            self._arguments = get_command(dictionary)
+# Options whose value is the next argument and may name the input or
+# output of an entry.
+_SEPARATE_VALUE_OPTIONS = frozenset(('-o', '-c', '-MF', '-MT', '-MQ'))
 
-        self._arguments = filter_warnings(self._arguments)
+# Maximum number of distinct shared argument prefixes.
+_MAX_PREFIXES = 1 << 16
 
-        if 'file' in dictionary:
-            self._input_path = plib.Path(dictionary['file']).as_posix()
-        else:
-            self._input_path = ''
+_prefixes = {}
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _normalize_path_uncached(path: str):
+    return sys.intern(plib.Path(path).as_posix())
+
+
+def normalize_path(path: str):
+    """Normalize path like pathlib, skipping pathlib for normal paths."""
+    if os.sep == '/' and os.altsep is None and \
+            _UNNORMALIZED_PATH_PATTERN.search(path) is None:
+        return sys.intern(path)
+    return _normalize_path_uncached(path)
 
-        if 'output' in dictionary:
-            self._output_path = plib.Path(dictionary['output']).as_posix()
+
+def _share_arguments(arguments, input_path: str, output_path: str):
+    """Split arguments into a shared prefix and an entry specific suffix.
+
+    The suffix starts at the first argument naming the input or output
+    file, so entries compiled with the same flags share one prefix tuple.
+    """
+    names = [os.path.basename(path) for path in (input_path, output_path)
+             if path != '']
+    split = len(arguments)
+    for idx, argument in enumerate(arguments):
+        if any(name in argument for name in names):
+            split = idx
+            if idx > 0 and arguments[idx - 1] in _SEPARATE_VALUE_OPTIONS:
+                split = idx - 1
+            break
+
+    prefix = tuple(arguments[:split])
+    shared = _prefixes.get(prefix)
+    if shared is None:
+        shared = tuple(sys.intern(argument) for argument in prefix)
+        if len(_prefixes) < _MAX_PREFIXES:
+            _prefixes[shared] = shared
+    suffix = tuple(sys.intern(argument) for argument in arguments[split:])
+    return shared, suffix
+
+
+def get_entry_key(dictionary: dict):
+    """Get key identifying an entry across runs without parsing arguments."""
+    keys = []
+    for field in ('directory', 'file', 'output'):
+        if field in dictionary:
+            keys.append(normalize_path(dictionary[field]))
         else:
-            self._output_path = ''
+            keys.append('')
+    return _make_key(*keys)
+
+
+class Entry:
+    """A command entry.
+
+    Entries are compact: attributes live in slots, paths and arguments are
+    interned, and entries with the same flags share their argument prefix.
+    """
+
+    __slots__ = ('_directory', '_prefix', '_suffix',
+                 '_input_path', '_output_path')
+
+    def __init__(self, dictionary, arguments=None):
+        self._directory = normalize_path(dictionary['directory']) \
+            if 'directory' in dictionary else ''
+        self._input_path = normalize_path(dictionary['file']) \
+            if 'file' in dictionary else ''
+        self._output_path = normalize_path(dictionary['output']) \
+            if 'output' in dictionary else ''
+
+        if arguments is None:
+            if 'arguments' in dictionary:
+                arguments = get_arguments(dictionary)
+            else:
+                arguments = get_command(dictionary)
+
+        self._prefix, self._suffix = _share_arguments(
+            filter_warnings(arguments), self._input_path, self._output_path)
 
     def get_directory(self):
         """Get working diretory."""
@@ -156,7 +354,7 @@ class Entry:
 
     def get_arguments(self):
         """Get command arguments."""
-        return self._arguments
+        return [*self._prefix, *self._suffix]
 
     def get_input_path(self):
         """Get input path."""
@@ -165,3 +363,19 @@ class Entry:
     def get_output_path(self):
         """Get output path."""
         return self._output_path
+
+    def get_key(self):
+        """Get key identifying the entry across runs."""
+        return _make_key(self._directory,
+                         self._input_path,
+                         self._output_path)
+
+
+def get_entries(dictionaries):
+    """Get entries of a batch of compile_commands.json entries."""
+    dictionaries = list(dictionaries)
+    command_lists = get_commands(dictionaries)
+    return [Entry(dictionary,
+                  dictionary['arguments'] if 'arguments' in dictionary
+                  else command_list)
+            for dictionary, command_list in zip(dictionaries, command_lists)]
@@ -1,8 +1,12 @@
 """Configuration file processor."""
 import pathlib as plib
 import os
+import hashlib
+import json
 import yaml
 
+import cpp_static_analyzer.compile_db as cdb
+
 default_config = {
     'CompileCommands': '',
     'ClangTidy': 'clang-tidy',
@@ -44,6 +48,17 @@ default_config = {
 }
 
 
+def _canonical(value):
+    """Convert value to a deterministic JSON value (sets are sorted)."""
+    if isinstance(value, (set, frozenset)):
+        return sorted(str(item) for item in value)
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+
 def search_for_config_file(path):
     """Search for config.yml."""
     current_path = plib.Path(path)
@@ -82,9 +97,9 @@ def get_path_converter(config):
 def get_check_flags(config):
     """Get enabled/disabled checks."""
     if 'Checks' in config and config['Checks'] is not None:
-        return ','.join(config['Checks'])
+        return ','.join(_canonical(config['Checks']))
     print('No check flags available. Using all avaliable checks.')
-    return ','.join(default_config['Checks'])
+    return ','.join(_canonical(default_config['Checks']))
 
 
 def get_clang_tidy(config):
@@ -106,9 +121,9 @@ def get_additional_options(config):
 def get_warnings(config):
     """Get warning flags."""
     if 'Warnings' in config and config['Warnings'] is not None:
-        return config['Warnings']
+        return _canonical(config['Warnings'])
     print('No warnings available. Using -Wall and -Wextra.')
-    return default_config['Warnings']
+    return _canonical(default_config['Warnings'])
 
 
 def get_header_filter(config):
@@ -137,6 +152,7 @@ class Config:
     _warnings = {}
     _header_filter = ''
     _compile_commands = ''
+    _fingerprint = ''
 
     def __init__(self, yml):
         if isinstance(yml, str):
@@ -148,13 +164,23 @@ class Config:
         else:
             config = yml
 
-        self._path_converter = get_path_converter(config)
+        self._path_converter = cdb.PathConverter(get_path_converter(config))
         self._checks = get_check_flags(config)
         self._clang_tidy = get_clang_tidy(config)
         self._additional_options = get_additional_options(config)
         self._warnings = get_warnings(config)
         self._header_filter = get_header_filter(config)
         self._compile_commands = get_compile_commands(config)
+        self._fingerprint = self._make_fingerprint()
+
+    def _make_fingerprint(self):
+        settings = [self._checks,
+                    _canonical(self._warnings),
+                    self._header_filter,
+                    _canonical(self._path_converter),
+                    _canonical(self._additional_options)]
+        encoded = json.dumps(settings).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
 
     def get_path_converter(self):
         """Get path converter."""
@@ -172,6 +198,11 @@ class Config:
         """Get additional options."""
         return self._additional_options
 
+    def add_additional_options(self, options):
+        """Append options to the additional options."""
+        self._additional_options = [*self._additional_options, *options]
+        self._fingerprint = self._make_fingerprint()
+
     def get_warnings(self):
         """Get warning flags."""
         return self._warnings
@@ -183,3 +214,7 @@ class Config:
     def get_compile_commands(self):
         """Get path to compile commands."""
         return self._compile_commands
+
+    def get_fingerprint(self):
+        """Get digest of the settings affecting analysis results."""
+        return self._fingerprint
@@ -0,0 +1,48 @@
+"""Converted compile database analyzed through clang-tidy -p."""
+import os
+import os.path
+
+import cpp_static_analyzer.compile_db as cdb
+import cpp_static_analyzer.config as cfg
+import cpp_static_analyzer.dependency as dep
+
+DATABASE_FILE = 'compile_commands.json'
+
+
+def get_database_entry(entry: cdb.Entry, config: cfg.Config):
+    """Get converted compile database entry with configured warnings."""
+    path_converter = config.get_path_converter()
+    directory = cdb.convert_path(entry.get_directory(), path_converter)
+    source, arguments, _, _ = dep.get_translation_unit(entry,
+                                                       path_converter)
+    return {'directory': directory,
+            'file': source,
+            'arguments': arguments + list(config.get_warnings())}
+
+
+def write_database(commands, config: cfg.Config, directory: str):
+    """Write converted database of commands into a build directory.
+
+    Entries are converted and written one at a time. Return set of
+    sources with more than one entry, which clang-tidy -p would analyze
+    once per entry.
+    """
+    os.makedirs(directory, exist_ok=True)
+    sources = set()
+    shared_sources = set()
+
+    def _convert():
+        for command in commands:
+            database_entry = get_database_entry(cdb.Entry(command), config)
+            source = database_entry['file']
+            if source in sources:
+                shared_sources.add(source)
+            sources.add(source)
+            yield database_entry
+
+    path = os.path.join(directory, DATABASE_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        cdb.write_compile_commands(_convert(), file)
+    os.replace(tmp_path, path)
+    return shared_sources
@@ -0,0 +1,174 @@
+"""Per-entry fingerprints of a compile database and their differences."""
+import hashlib
+import json
+import os
+import os.path
+
+import cpp_static_analyzer.console as con
+
+# Snapshot written to the output directory.
+SNAPSHOT_FILE = '.compile_db.json'
+
+_SNAPSHOT_VERSION = 1
+
+
+def get_key(command: dict):
+    """Get key identifying an entry across databases from raw fields."""
+    return '\0'.join((command.get('directory', ''),
+                      command.get('file', ''),
+                      command.get('output', '')))
+
+
+def get_fingerprint(command: dict):
+    """Get digest of the raw fields of an entry, without parsing them."""
+    fields = [command.get('directory', ''),
+              command.get('file', ''),
+              command.get('output', ''),
+              command.get('command', '')]
+    fields.extend(command.get('arguments', ()))
+    return hashlib.blake2b('\0'.join(fields).encode('utf-8'),
+                           digest_size=8).hexdigest()
+
+
+def make_fingerprints(commands):
+    """Get (keys by index, fingerprints by key) of commands.
+
+    Entries sharing a key are combined into one fingerprint.
+    """
+    keys = []
+    fingerprints = {}
+    for command in commands:
+        key = get_key(command)
+        fingerprint = get_fingerprint(command)
+        if key in fingerprints:
+            fingerprint = hashlib.blake2b(
+                (fingerprints[key] + fingerprint).encode('ascii'),
+                digest_size=8).hexdigest()
+        keys.append(key)
+        fingerprints[key] = fingerprint
+    return keys, fingerprints
+
+
+def get_key_path(key: str):
+    """Get input path of the entry identified by a key."""
+    directory, input_path, _ = key.split('\0')
+    if directory != '' and not os.path.isabs(input_path):
+        return os.path.join(directory, input_path)
+    return input_path
+
+
+class DatabaseDiff:
+    """Added, removed and modified entry keys between two databases."""
+
+    def __init__(self, previous: dict, current: dict):
+        self._added = set()
+        self._modified = set()
+        for key, fingerprint in current.items():
+            previous_fingerprint = previous.get(key)
+            if previous_fingerprint is None:
+                self._added.add(key)
+            elif previous_fingerprint != fingerprint:
+                self._modified.add(key)
+        self._removed = {key for key in previous if key not in current}
+        self._unchanged = len(current) - len(self._added) - \
+            len(self._modified)
+
+    def get_added(self):
+        """Get keys of entries not in the previous database."""
+        return self._added
+
+    def get_removed(self):
+        """Get keys of entries not in the current database."""
+        return self._removed
+
+    def get_modified(self):
+        """Get keys of entries whose fields changed."""
+        return self._modified
+
+    def get_changed(self):
+        """Get keys of added and modified entries."""
+        return self._added | self._modified
+
+    def get_summary(self):
+        """Get number of entries by status."""
+        return {'added': len(self._added),
+                'removed': len(self._removed),
+                'modified': len(self._modified),
+                'unchanged': self._unchanged}
+
+
+class DatabaseSnapshot:
+    """Fingerprints of the entries analyzed successfully.
+
+    The snapshot of the previous run is compared with the current
+    database. Once the run ends, completed entries take their current
+    fingerprint, while other entries keep their previous one, so entries
+    that failed or were not run are still reported as changed next time.
+    A configuration change marks every entry as modified.
+    """
+
+    def __init__(self, path: str, commands, config_fingerprint: str):
+        self._path = path
+        self._config = config_fingerprint
+        self._keys, self._current = make_fingerprints(commands)
+        self._previous = None
+        self._config_changed = False
+        self._done = set()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self._path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            con.trace(f'Cannot read database snapshot {self._path}.')
+            return
+        if data.get('version') != _SNAPSHOT_VERSION:
+            return
+        entries = data['entries']
+        if data['config'] != self._config:
+            self._config_changed = True
+            entries = {key: '' for key in entries}
+        self._previous = entries
+
+    def has_previous(self):
+        """Check whether a previous run recorded a snapshot."""
+        return self._previous is not None
+
+    def is_config_changed(self):
+        """Check whether the previous run used another configuration."""
+        return self._config_changed
+
+    def get_diff(self):
+        """Get differences from the previous snapshot."""
+        return DatabaseDiff(self._previous or {}, self._current)
+
+    def get_changed_indices(self):
+        """Get indices of added and modified entries."""
+        changed = self.get_diff().get_changed()
+        return [idx for idx, key in enumerate(self._keys) if key in changed]
+
+    def add_job(self, job):
+        """Record a completed job."""
+        if job.get_failure() is None:
+            self._done.add(job.get_index())
+
+    def save(self):
+        """Write snapshot of the current database."""
+        previous = self._previous or {}
+        done = {self._keys[idx] for idx in self._done}
+        entries = {}
+        for key, fingerprint in self._current.items():
+            if key in done:
+                entries[key] = fingerprint
+            elif key in previous:
+                entries[key] = previous[key]
+
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'version': _SNAPSHOT_VERSION,
+                       'config': self._config,
+                       'entries': entries}, file, separators=(',', ':'))
+        os.replace(tmp_path, self._path)
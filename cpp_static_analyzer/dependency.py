@@ -0,0 +1,174 @@
+"""Include dependency scanner."""
+import os.path
+import re
+import threading
+
+import cpp_static_analyzer.compile_db as cdb
+
+_INCLUDE_PATTERN = re.compile(
+    rb'^[ \t]*#[ \t]*include[ \t]*([<"])([^>"\r\n]+)[>"]', re.MULTILINE)
+
+_QUOTE_OPTIONS = ('-iquote',)
+_ANGLE_OPTIONS = ('-I', '/I', '-isystem', '-idirafter')
+
+
+def _strip_quotes(path: str):
+    """Strip surrounding double quotations."""
+    if len(path) >= 2 and path[0] == '"' and path[-1] == '"':
+        return path[1:-1]
+    return path
+
+
+def _absolute_directory(path: str, directory: str):
+    """Make include directory absolute using working directory."""
+    path = _strip_quotes(path)
+    if directory != '' and not os.path.isabs(path):
+        path = os.path.join(directory, path)
+    return os.path.normpath(path)
+
+
+def _match_option(argument: str):
+    """Match include option, return (option, inline value)."""
+    for option in _QUOTE_OPTIONS + _ANGLE_OPTIONS:
+        if argument.startswith(option):
+            return option, argument[len(option):]
+    return None, ''
+
+
+def get_include_directories(arguments, directory: str = ''):
+    """Get quoted and angled include directories from arguments."""
+    quote_dirs = []
+    angle_dirs = []
+    pending = None
+
+    for argument in arguments:
+        if pending is not None:
+            option, value = pending, argument
+            pending = None
+        else:
+            option, value = _match_option(argument)
+            if option is None:
+                continue
+            if value == '':
+                pending = option
+                continue
+
+        include_dir = _absolute_directory(value, directory)
+        if option in _QUOTE_OPTIONS:
+            quote_dirs.append(include_dir)
+        else:
+            angle_dirs.append(include_dir)
+
+    return tuple(quote_dirs), tuple(angle_dirs)
+
+
+def get_source_path(entry: cdb.Entry, path_converter: dict):
+    """Get converted absolute input path of an entry."""
+    directory = cdb.convert_path(entry.get_directory(), path_converter)
+    input_path = cdb.convert_path(entry.get_input_path(), path_converter)
+    if directory != '' and not os.path.isabs(input_path):
+        input_path = os.path.join(directory, input_path)
+    return os.path.normpath(input_path)
+
+
+def get_translation_unit(entry: cdb.Entry, path_converter: dict):
+    """Get converted (input path, arguments, quote dirs, angle dirs)."""
+    directory = cdb.convert_path(entry.get_directory(), path_converter)
+    input_path = get_source_path(entry, path_converter)
+
+    arguments = [cdb.convert_path(arg, path_converter)
+                 for arg in entry.get_arguments()]
+    quote_dirs, angle_dirs = get_include_directories(arguments, directory)
+    return input_path, arguments, quote_dirs, angle_dirs
+
+
+def read_includes(path: str):
+    """Read include directives of a file, return (is_quoted, name) pairs."""
+    try:
+        with open(path, 'rb') as file:
+            content = file.read()
+    except OSError:
+        return []
+
+    includes = []
+    for match in _INCLUDE_PATTERN.finditer(content):
+        name = match.group(2).decode('utf-8', errors='replace').strip()
+        includes.append((match.group(1) == b'"', name))
+    return includes
+
+
+class DependencyScanner:
+    """Scan transitive header dependencies of source files.
+
+    Every include directive is followed regardless of preprocessor
+    conditions, so the result over-approximates the real dependency set.
+    Headers that cannot be resolved (e.g. toolchain headers not listed
+    with -I) are ignored.
+    """
+
+    def __init__(self):
+        self._includes = {}
+        self._is_file = {}
+        self._lock = threading.Lock()
+
+    def get_includes(self, path: str):
+        """Get include directives of a file (memoized)."""
+        includes = self._includes.get(path)
+        if includes is None:
+            includes = read_includes(path)
+            with self._lock:
+                self._includes[path] = includes
+        return includes
+
+    def set_includes(self, path: str, includes):
+        """Seed include directives of a file, e.g. from a persisted index."""
+        with self._lock:
+            self._includes[path] = includes
+
+    def invalidate(self, path: str):
+        """Forget memoized include directives of a file."""
+        with self._lock:
+            self._includes.pop(path, None)
+            self._is_file.pop(path, None)
+
+    def _is_file_cached(self, path: str):
+        is_file = self._is_file.get(path)
+        if is_file is None:
+            is_file = os.path.isfile(path)
+            with self._lock:
+                self._is_file[path] = is_file
+        return is_file
+
+    def resolve(self, includer: str, is_quoted: bool, name: str,
+                quote_dirs, angle_dirs):
+        """Resolve an include directive to a path, or '' if not found."""
+        if os.path.isabs(name):
+            return name if self._is_file_cached(name) else ''
+
+        search_dirs = angle_dirs
+        if is_quoted:
+            search_dirs = (os.path.dirname(includer),) + \
+                tuple(quote_dirs) + tuple(angle_dirs)
+
+        for search_dir in search_dirs:
+            candidate = os.path.normpath(os.path.join(search_dir, name))
+            if self._is_file_cached(candidate):
+                return candidate
+        return ''
+
+    def get_dependencies(self, source: str, quote_dirs=(), angle_dirs=()):
+        """Get sorted list of headers transitively included by source."""
+        visited = set()
+        pending = [source]
+
+        while pending:
+            current = pending.pop()
+            for is_quoted, name in self.get_includes(current):
+                header = self.resolve(current, is_quoted, name,
+                                      quote_dirs, angle_dirs)
+                if header != '' and header not in visited:
+                    visited.add(header)
+                    pending.append(header)
+
+        visited.discard(source)
+        return sorted(visited)
@@ -0,0 +1,364 @@
+"""Parsing and cross-unit deduplication of clang-tidy diagnostics."""
+import array
+import hashlib
+import json
+import pathlib as plib
+import re
+import threading
+
+# <file>:<line>:<column>: <severity>: <message> [<check>]
+_DIAGNOSTIC_PATTERN = re.compile(
+    r'^(?P<file>.+?):(?P<line>\d+):(?P<column>\d+): '
+    r'(?P<severity>warning|error|note|remark): '
+    r'(?P<message>.*?)(?: \[(?P<check>[^\[\]]+)\])?$')
+
+_INITIAL_CAPACITY = 1 << 10
+
+# Grow table when more than 7 of 10 slots are used.
+_MAX_LOAD_NUMERATOR = 7
+_MAX_LOAD_DENOMINATOR = 10
+
+
+class Diagnostic:
+    """A clang-tidy diagnostic with its notes and source excerpt."""
+
+    _file = ''
+    _line = 0
+    _column = 0
+    _severity = ''
+    _message = ''
+    _check = ''
+    _text = ''
+    _notes = []
+
+    def __init__(self, match: re.Match, text: str, notes: list = None):
+        self._file = match.group('file')
+        self._line = int(match.group('line'))
+        self._column = int(match.group('column'))
+        self._severity = match.group('severity')
+        self._message = match.group('message')
+        self._check = match.group('check') or ''
+        self._text = text
+        self._notes = [] if notes is None else notes
+
+    def get_file(self):
+        """Get file path."""
+        return self._file
+
+    def get_line(self):
+        """Get line number."""
+        return self._line
+
+    def get_column(self):
+        """Get column number."""
+        return self._column
+
+    def get_severity(self):
+        """Get severity."""
+        return self._severity
+
+    def get_message(self):
+        """Get message."""
+        return self._message
+
+    def get_check(self):
+        """Get check name, or empty string for compiler diagnostics."""
+        return self._check
+
+    def get_text(self):
+        """Get full text including notes and source excerpt."""
+        return self._text
+
+    def get_notes(self):
+        """Get notes as (file, line, column, message) tuples."""
+        return self._notes
+
+    def to_record(self):
+        """Get JSON serializable record."""
+        return {'file': self._file,
+                'line': self._line,
+                'column': self._column,
+                'severity': self._severity,
+                'check': self._check,
+                'message': self._message,
+                'notes': [{'file': file, 'line': line,
+                           'column': column, 'message': message}
+                          for file, line, column, message in self._notes]}
+
+    def get_fingerprint(self):
+        """Get 64-bit fingerprint of file, position, check and message."""
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(f'{self._file}\0{self._line}\0{self._column}\0'
+                      f'{self._check}\0{self._message}'.encode('utf-8'))
+        return int.from_bytes(digest.digest(), 'little')
+
+
+def _get_note(match: re.Match):
+    message = match.group('message')
+    if match.group('check') is not None:
+        message += f' [{match.group("check")}]'
+    return (match.group('file'), int(match.group('line')),
+            int(match.group('column')), message)
+
+
+def parse_diagnostics(output: str):
+    """Yield diagnostics of clang-tidy output.
+
+    Notes and excerpt lines are attached to the preceding diagnostic.
+    Lines before the first diagnostic are skipped.
+    """
+    match = None
+    lines = []
+    notes = []
+    for line in output.splitlines():
+        line_match = _DIAGNOSTIC_PATTERN.match(line)
+        if line_match is None or line_match.group('severity') == 'note':
+            if match is None:
+                continue
+            lines.append(line)
+            if line_match is not None:
+                notes.append(_get_note(line_match))
+            continue
+
+        if match is not None:
+            yield Diagnostic(match, '\n'.join(lines), notes)
+        match = line_match
+        lines = [line]
+        notes = []
+
+    if match is not None:
+        yield Diagnostic(match, '\n'.join(lines), notes)
+
+
+class CompactHashSet:
+    """Set of 64-bit fingerprints in one open addressing table.
+
+    Fingerprints are stored unboxed in an unsigned 64-bit array with
+    linear probing, 12 to 23 bytes per element, instead of a Python int
+    object plus a hash slot (about 60 bytes) per element in a built-in set.
+    """
+
+    _table = None
+    _mask = 0
+    _count = 0
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY):
+        size = _INITIAL_CAPACITY
+        while size * _MAX_LOAD_NUMERATOR < \
+                capacity * _MAX_LOAD_DENOMINATOR:
+            size <<= 1
+        self._table = array.array('Q', bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+
+    def _grow(self):
+        old_table = self._table
+        self._table = array.array('Q', bytes(16 * len(old_table)))
+        self._mask = len(self._table) - 1
+        for value in old_table:
+            if value != 0:
+                self._insert(value)
+
+    def _insert(self, value: int):
+        """Insert a non-zero value, return whether it was new."""
+        table = self._table
+        mask = self._mask
+        slot = value & mask
+        while True:
+            current = table[slot]
+            if current == 0:
+                table[slot] = value
+                return True
+            if current == value:
+                return False
+            slot = (slot + 1) & mask
+
+    def add(self, fingerprint: int):
+        """Add fingerprint, return whether it was not present."""
+        # Zero marks an empty slot.
+        value = fingerprint or 1
+        if not self._insert(value):
+            return False
+
+        self._count += 1
+        if self._count * _MAX_LOAD_DENOMINATOR > \
+                len(self._table) * _MAX_LOAD_NUMERATOR:
+            self._grow()
+        return True
+
+    def __contains__(self, fingerprint: int):
+        value = fingerprint or 1
+        slot = value & self._mask
+        while True:
+            current = self._table[slot]
+            if current == 0:
+                return False
+            if current == value:
+                return True
+            slot = (slot + 1) & self._mask
+
+    def __len__(self):
+        return self._count
+
+    def get_size(self):
+        """Get table size in bytes."""
+        return self._table.buffer_info()[1] * self._table.itemsize
+
+
+class DiagnosticMerger:
+    """Write each unique diagnostic of completed jobs once to a report.
+
+    Output of every job is parsed as it completes. A diagnostic reported
+    by several translation units, typically from a shared header, is
+    written only on first sight.
+    """
+
+    _file = None
+    _seen = None
+    _lock = None
+    _total = 0
+
+    def __init__(self, path: str):
+        self._file = open(path, 'w', encoding='utf-8')
+        self._seen = CompactHashSet()
+        self._lock = threading.Lock()
+        self._total = 0
+
+    def add(self, output: str):
+        """Merge clang-tidy output, return number of new diagnostics."""
+        if not output:
+            return 0
+
+        added = 0
+        diagnostics = list(parse_diagnostics(output))
+        with self._lock:
+            for diagnostic in diagnostics:
+                self._total += 1
+                if self._seen.add(diagnostic.get_fingerprint()):
+                    print(diagnostic.get_text(), file=self._file)
+                    added += 1
+        return added
+
+    def add_job(self, job):
+        """Merge output of a completed job."""
+        self.add(job.get_result())
+
+    def get_total_count(self):
+        """Get number of parsed diagnostics."""
+        return self._total
+
+    def get_unique_count(self):
+        """Get number of written diagnostics."""
+        return len(self._seen)
+
+    def close(self):
+        """Close merged report."""
+        with self._lock:
+            self._file.close()
+
+
+_SARIF_HEADER = ('{"version":"2.1.0",'
+                 '"$schema":"https://json.schemastore.org/sarif-2.1.0.json",'
+                 '"runs":[{"tool":{"driver":{"name":"clang-tidy",'
+                 '"informationUri":"https://clang.llvm.org/extra/clang-tidy/"'
+                 '}},"results":[')
+_SARIF_FOOTER = ']}]}'
+_SARIF_LEVELS = {'error': 'error', 'warning': 'warning', 'remark': 'note'}
+
+
+def _get_sarif_location(file: str, line: int, column: int):
+    if plib.PurePath(file).is_absolute():
+        uri = plib.PurePath(file).as_uri()
+    else:
+        uri = file.replace('\\', '/')
+    return {'physicalLocation': {
+        'artifactLocation': {'uri': uri},
+        'region': {'startLine': line, 'startColumn': column}}}
+
+
+def get_sarif_result(diagnostic: Diagnostic):
+    """Get SARIF result object of a diagnostic."""
+    result = {'ruleId': diagnostic.get_check() or 'clang-diagnostic',
+              'level': _SARIF_LEVELS.get(diagnostic.get_severity(),
+                                         'warning'),
+              'message': {'text': diagnostic.get_message()},
+              'locations': [_get_sarif_location(diagnostic.get_file(),
+                                                diagnostic.get_line(),
+                                                diagnostic.get_column())]}
+    related = []
+    for file, line, column, message in diagnostic.get_notes():
+        location = _get_sarif_location(file, line, column)
+        location['message'] = {'text': message}
+        related.append(location)
+    if related:
+        result['relatedLocations'] = related
+    return result
+
+
+class StructuredReport:
+    """Write diagnostics of completed jobs as JSON Lines and SARIF.
+
+    Records are appended as each job completes, so memory does not grow
+    with the number of findings. The SARIF document is written as a
+    stream of results and closed by close().
+    """
+
+    _jsonl_file = None
+    _sarif_file = None
+    _sarif_count = 0
+    _lock = None
+    _count = 0
+
+    def __init__(self, jsonl_path: str = '', sarif_path: str = ''):
+        self._jsonl_file = None
+        self._sarif_file = None
+        if jsonl_path != '':
+            self._jsonl_file = open(jsonl_path, 'w', encoding='utf-8')
+        if sarif_path != '':
+            self._sarif_file = open(sarif_path, 'w', encoding='utf-8')
+            self._sarif_file.write(_SARIF_HEADER)
+        self._sarif_count = 0
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def _write_sarif(self, diagnostic: Diagnostic):
+        if self._sarif_count > 0:
+            self._sarif_file.write(',')
+        json.dump(get_sarif_result(diagnostic), self._sarif_file,
+                  separators=(',', ':'))
+        self._sarif_count += 1
+
+    def add(self, output: str, unit: str = ''):
+        """Write diagnostics of clang-tidy output, return their number."""
+        if not output:
+            return 0
+
+        diagnostics = list(parse_diagnostics(output))
+        with self._lock:
+            for diagnostic in diagnostics:
+                if self._jsonl_file is not None:
+                    record = diagnostic.to_record()
+                    record['unit'] = unit
+                    print(json.dumps(record, separators=(',', ':')),
+                          file=self._jsonl_file)
+                if self._sarif_file is not None:
+                    self._write_sarif(diagnostic)
+            self._count += len(diagnostics)
+        return len(diagnostics)
+
+    def add_job(self, job):
+        """Write diagnostics of a completed job."""
+        self.add(job.get_result(), job.get_entry().get_input_path())
+
+    def get_count(self):
+        """Get number of written diagnostics."""
+        return self._count
+
+    def close(self):
+        """Finish and close report files."""
+        with self._lock:
+            if self._jsonl_file is not None:
+                self._jsonl_file.close()
+            if self._sarif_file is not None:
+                self._sarif_file.write(_SARIF_FOOTER)
+                self._sarif_file.close()
@@ -0,0 +1,279 @@
+"""Coordinator and workers running one analysis across several hosts."""
+import collections
+import json
+import socket
+import socketserver
+import threading
+import time
+
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.config as cfg
+import cpp_static_analyzer.console as con
+import cpp_static_analyzer.failures as fl
+import cpp_static_analyzer.process as pr
+
+# Seconds a worker waits before asking again while entries are in flight.
+_WAIT_INTERVAL = 0.5
+
+# Seconds between heartbeats of a worker running an entry.
+_HEARTBEAT_INTERVAL = 10.0
+
+# Seconds without any message after which a worker is considered dead.
+_LEASE = 60.0
+
+
+def parse_address(address: str):
+    """Split HOST:PORT into (host, port)."""
+    host, _, port = address.rpartition(':')
+    return host or 'localhost', int(port)
+
+
+def _send(stream, message: dict):
+    stream.write(json.dumps(message, separators=(',', ':')) + '\n')
+    stream.flush()
+
+
+def _receive(stream):
+    """Receive a message, or None if the peer closed the connection."""
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Serve entries to one worker connection."""
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        self.request.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.request.settimeout(coordinator.get_lease())
+        stream = self.request.makefile('rw', encoding='utf-8', newline='\n')
+        held = set()
+        try:
+            message = _receive(stream)
+            while message is not None:
+                if message['type'] == 'request':
+                    _send(stream, coordinator.take(held))
+                elif message['type'] == 'result':
+                    coordinator.finish(message, held)
+                message = _receive(stream)
+        except socket.timeout:
+            con.error(f'Worker {self.client_address} sent nothing for '
+                      f'{coordinator.get_lease()} s, dropping it.')
+        except (OSError, ValueError) as e:
+            con.trace(f'Worker {self.client_address} failed: {e}.')
+        finally:
+            coordinator.requeue(held)
+            stream.close()
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self, address, coordinator):
+        self.coordinator = coordinator
+        super().__init__(address, _Handler)
+
+
+class Coordinator:
+    """Serve the work queue of a command manager over TCP.
+
+    Workers pull one entry at a time, run clang-tidy locally and send the
+    result back. Cache lookups and result writes stay on the coordinator.
+    Entries held by a worker whose connection drops are requeued, so
+    workers may join or leave at any time during the run. A worker
+    holds its entries on a lease renewed by every message it sends, so
+    entries of a hung worker or an unreachable host are requeued too.
+    """
+
+    def __init__(self,
+                 cmd_mgr: cm.CommandManager,
+                 config: cfg.Config,
+                 output_directory: str,
+                 error_directory: str,
+                 on_complete=None,
+                 lease: float = _LEASE):
+        self._cmd_mgr = cmd_mgr
+        self._config = config
+        self._output_directory = output_directory
+        self._error_directory = error_directory
+        self._on_complete = on_complete
+        self._lease = lease
+        self._lock = threading.Lock()
+        self._requeued = collections.deque()
+        self._in_flight = {}
+        self._done = threading.Event()
+        self._completed = 0
+        self._failed = 0
+        self._server = None
+
+    def _next_index(self, held: set):
+        """Take next entry and mark it in flight, return -1 if none."""
+        with self._lock:
+            if self._requeued:
+                index = self._requeued.popleft()
+            else:
+                index = self._cmd_mgr.next_index()
+            if index >= 0:
+                self._in_flight[index] = None
+                held.add(index)
+        return index
+
+    def take(self, held: set):
+        """Get next message for a worker asking for work."""
+        index = self._next_index(held)
+        while index >= 0:
+            job = self._cmd_mgr.prepare_job(index, self._config)
+            if not job.is_done():
+                with self._lock:
+                    self._in_flight[index] = job
+                return {'type': 'job', 'index': index,
+                        'command': self._cmd_mgr[index]}
+
+            # Replay cached result without a round trip.
+            with self._lock:
+                del self._in_flight[index]
+            held.discard(index)
+            self._complete(job)
+            index = self._next_index(held)
+
+        with self._lock:
+            if self._in_flight or self._requeued:
+                return {'type': 'wait'}
+        self._done.set()
+        return {'type': 'done'}
+
+    def finish(self, message: dict, held: set):
+        """Complete job with a result sent by a worker."""
+        index = message['index']
+        with self._lock:
+            job = self._in_flight.pop(index, None)
+        held.discard(index)
+        if job is None:
+            return
+
+        job.set_result(message['result'], message['error'])
+        if 'usage' in message:
+            job.set_usage(pr.ResourceUsage(**message['usage']))
+        else:
+            job.set_duration(message['duration'])
+        failure = message.get('failure')
+        if failure is None and message['returncode'] != 0:
+            failure = fl.make_failure(message['returncode'],
+                                      job.get_duration(), message['error'])
+        if failure is not None:
+            job.set_failure(failure)
+            with self._lock:
+                self._failed += 1
+        self._complete(job)
+
+    def requeue(self, held: set):
+        """Requeue entries held by a disconnected worker."""
+        requeued = 0
+        with self._lock:
+            for index in sorted(held):
+                if index in self._in_flight:
+                    del self._in_flight[index]
+                    self._requeued.append(index)
+                    requeued += 1
+        held.clear()
+        if requeued > 0:
+            con.error(f'Worker left, requeued {requeued} entries.')
+
+    def _complete(self, job):
+        self._cmd_mgr.complete_job(job, self._output_directory,
+                                   self._error_directory)
+        with self._lock:
+            self._completed += 1
+            completed = self._completed
+        if self._on_complete is not None:
+            self._on_complete(completed)
+
+    def start(self, host: str, port: int):
+        """Start listening, return bound (host, port)."""
+        self._server = _Server((host, port), self)
+        thread = threading.Thread(target=self._server.serve_forever,
+                                  daemon=True)
+        thread.start()
+        return self._server.server_address[:2]
+
+    def wait(self):
+        """Wait until every entry is completed, return failed count."""
+        if self._cmd_mgr.is_loaded() and len(self._cmd_mgr) == 0:
+            self._done.set()
+        self._done.wait()
+        self._server.shutdown()
+        self._server.server_close()
+        return self._failed
+
+    def get_completed_count(self):
+        """Get number of completed jobs."""
+        return self._completed
+
+    def get_lease(self):
+        """Get seconds a worker may stay silent before being dropped."""
+        return self._lease
+
+
+def _run_entry(command: dict, config: cfg.Config,
+               timeout: float = None, retries: int = 0):
+    """Run clang-tidy on an entry, return result message fields."""
+    _, result, error, usage, failure = cm.execute_clang_tidy(
+        command, config, timeout, retries)
+    return {'result': result or '',
+            'error': error or '',
+            'returncode': 0 if failure is None else failure['returncode'],
+            'duration': usage.get_wall_time(),
+            'usage': usage.to_record(),
+            'failure': failure}
+
+
+def _run_with_heartbeat(stream, function):
+    """Call function, sending heartbeats to renew the lease meanwhile."""
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(_HEARTBEAT_INTERVAL):
+                _send(stream, {'type': 'heartbeat'})
+        except OSError as e:
+            con.trace(f'Cannot send heartbeat: {e}.')
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        return function()
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_worker(host: str, port: int, config: cfg.Config,
+               timeout: float = None, retries: int = 0):
+    """Pull and analyze entries until the coordinator is done.
+
+    Return number of analyzed entries.
+    """
+    count = 0
+    with socket.create_connection((host, port)) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        stream = sock.makefile('rw', encoding='utf-8', newline='\n')
+        while True:
+            _send(stream, {'type': 'request'})
+            message = _receive(stream)
+            if message is None or message['type'] == 'done':
+                break
+            if message['type'] == 'wait':
+                time.sleep(_WAIT_INTERVAL)
+                continue
+
+            reply = _run_with_heartbeat(
+                stream, lambda: _run_entry(message['command'], config,
+                                           timeout, retries))
+            reply.update({'type': 'result', 'index': message['index']})
+            _send(stream, reply)
+            count += 1
+    return count
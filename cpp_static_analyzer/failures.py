@@ -0,0 +1,98 @@
+"""Failure records of clang-tidy invocations and the failure manifest."""
+import json
+import os
+import signal
+import threading
+
+import cpp_static_analyzer.console as con
+
+# Manifest written to the output directory.
+MANIFEST_FILE = '.failures.json'
+
+# Number of stderr lines kept in a failure record.
+_TAIL_LINES = 20
+
+
+def _get_signal_name(returncode):
+    if returncode is None or returncode >= 0:
+        return None
+    try:
+        return signal.Signals(-returncode).name
+    except ValueError:
+        return str(-returncode)
+
+
+def make_failure(returncode, duration: float, error: str,
+                 timed_out: bool = False, attempts: int = 1):
+    """Make failure record of an invocation.
+
+    returncode is negative if the process was killed by a signal, and None
+    if it did not start or timed out.
+    """
+    return {'returncode': returncode,
+            'signal': _get_signal_name(returncode),
+            'timed_out': timed_out,
+            'duration': duration,
+            'attempts': attempts,
+            'stderr_tail': (error or '').splitlines()[-_TAIL_LINES:]}
+
+
+def is_transient(failure: dict):
+    """Check whether retrying the invocation may succeed.
+
+    Timeouts, signals and failures to start are transient, while an exit
+    code reports a problem of the translation unit itself.
+    """
+    return failure['timed_out'] or failure['returncode'] is None or \
+        failure['returncode'] < 0
+
+
+def describe(failure: dict):
+    """Describe failure record in a few words."""
+    if failure['timed_out']:
+        reason = f'timed out after {failure["duration"]:.1f}s'
+    elif failure['signal'] is not None:
+        reason = f'killed by {failure["signal"]}'
+    elif failure['returncode'] is None:
+        reason = 'could not start'
+    else:
+        reason = f'exited with {failure["returncode"]}'
+    if failure['attempts'] > 1:
+        reason += f' ({failure["attempts"]} attempts)'
+    return reason
+
+
+class FailureManifest:
+    """Failures of completed jobs, written as a JSON array."""
+
+    def __init__(self):
+        self._failures = []
+        self._lock = threading.Lock()
+
+    def add_job(self, job):
+        """Record failure of a completed job."""
+        failure = job.get_failure()
+        if failure is None:
+            return
+        entry = job.get_entry()
+        record = dict(index=job.get_index(),
+                      file=entry.get_input_path(),
+                      directory=entry.get_directory(),
+                      **failure)
+        with self._lock:
+            self._failures.append(record)
+        con.error(f'clang-tidy {describe(failure)} for {record["file"]}.')
+
+    def get_count(self):
+        """Get number of failed jobs."""
+        return len(self._failures)
+
+    def write(self, path: str):
+        """Write manifest sorted by entry index."""
+        tmp_path = path + '.tmp'
+        with self._lock:
+            failures = sorted(self._failures,
+                              key=lambda record: record['index'])
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(failures, file, indent=2)
+        os.replace(tmp_path, path)
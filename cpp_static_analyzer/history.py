@@ -0,0 +1,97 @@
+"""Persistent per-entry duration history and makespan estimation."""
+import heapq
+import json
+import os
+import statistics
+import threading
+
+import cpp_static_analyzer.console as con
+
+# Weight of the newest measurement in the smoothed duration.
+SMOOTHING = 0.5
+
+# Estimate used when nothing has been recorded yet.
+_DEFAULT_ESTIMATE = 1.0
+
+
+class DurationHistory:
+    """Smoothed wall time of every entry, keyed by entry key."""
+
+    def __init__(self, path: str = ''):
+        self._path = path
+        self._durations = {}
+        self._lock = threading.Lock()
+        if path != '' and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    self._durations = json.load(file)
+            except (OSError, ValueError):
+                con.trace(f'Cannot read duration history {path}.')
+
+    def record(self, key: str, duration: float):
+        """Record a measured duration."""
+        with self._lock:
+            previous = self._durations.get(key)
+            if previous is not None:
+                duration = SMOOTHING * duration + \
+                    (1.0 - SMOOTHING) * previous
+            self._durations[key] = duration
+
+    def get(self, key: str):
+        """Get recorded duration, or None if the entry is unknown."""
+        return self._durations.get(key)
+
+    def get_default_estimate(self):
+        """Get estimate for entries without history (median duration)."""
+        if not self._durations:
+            return _DEFAULT_ESTIMATE
+        return statistics.median(self._durations.values())
+
+    def estimate(self, keys):
+        """Get duration estimates of keys."""
+        default = self.get_default_estimate()
+        return [self._durations.get(key, default) for key in keys]
+
+    def save(self):
+        """Persist history."""
+        if self._path == '':
+            return
+        tmp_path = self._path + '.tmp'
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(self._durations, file, separators=(',', ':'))
+        os.replace(tmp_path, self._path)
+
+    def __len__(self):
+        return len(self._durations)
+
+
+class MemoryHistory(DurationHistory):
+    """Peak RSS of every entry in bytes, keyed by entry key.
+
+    Increases are taken at once while decreases are smoothed, so estimates
+    err on the high side.
+    """
+
+    def record(self, key: str, duration: float):
+        """Record a measured peak RSS."""
+        with self._lock:
+            previous = self._durations.get(key)
+            if previous is not None and duration < previous:
+                duration = SMOOTHING * duration + \
+                    (1.0 - SMOOTHING) * previous
+            self._durations[key] = duration
+
+
+def order_longest_first(estimates):
+    """Get indices ordered by descending estimate, stable for ties."""
+    return sorted(range(len(estimates)), key=lambda idx: -estimates[idx])
+
+
+def simulate_makespan(durations, num_of_jobs: int):
+    """Simulate greedy list scheduling of durations on workers."""
+    workers = [0.0] * max(1, num_of_jobs)
+    for duration in durations:
+        start_time = heapq.heappop(workers)
+        heapq.heappush(workers, start_time + duration)
+    return max(workers)
@@ -0,0 +1,291 @@
+"""Persistent reverse include index (header to translation units)."""
+import json
+import os
+import os.path
+import subprocess as sproc
+
+import cpp_static_analyzer.compile_db as cdb
+import cpp_static_analyzer.console as con
+import cpp_static_analyzer.db_diff as dbd
+import cpp_static_analyzer.dependency as dep
+
+_INDEX_VERSION = 3
+
+
+def stat_file(path: str):
+    """Get [mtime_ns, size] of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class IncludeIndex:
+    """Include graph with reverse edges, updated incrementally.
+
+    The index stores the direct include edges of every file once per set of
+    include search paths, plus the reverse edges (header to includers) with
+    reference counts. On update only files whose stat changed are re-read
+    and re-resolved. Affected translation units are found by walking the
+    reverse edges from the changed files, so selection cost depends on the
+    size of the change rather than on the size of the database.
+
+    Raw compile database fields are fingerprinted too, so entries that did
+    not change since the index was saved are not parsed again.
+    """
+
+    def __init__(self, path: str = ''):
+        self._path = path
+        self._files = {}
+        self._search_paths = []
+        self._search_path_ids = {}
+        self._edges = {}
+        self._includers = {}
+        self._units = {}
+        self._unit_sources = {}
+        self._fingerprints = {}
+        self._converter = ''
+        self._modified = False
+        if path != '' and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self._path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            con.trace(f'Cannot read include index {self._path}.')
+            return
+        if data.get('version') != _INDEX_VERSION:
+            return
+
+        self._files = data['files']
+        for quote_dirs, angle_dirs in data['search_paths']:
+            self._search_path_id(tuple(quote_dirs), tuple(angle_dirs))
+        self._edges = {(path, search_id): targets
+                       for path, search_id, targets in data['edges']}
+        self._includers = data['includers']
+        for key, (source, search_id) in data['units'].items():
+            self._add_unit(key, source, search_id)
+        self._fingerprints = data['fingerprints']
+        self._converter = data['converter']
+
+    def save(self):
+        """Persist index, unless it is saved and was not modified."""
+        if not self._modified and os.path.exists(self._path):
+            return
+        data = {'version': _INDEX_VERSION,
+                'files': self._files,
+                'search_paths': self._search_paths,
+                'edges': [[path, search_id, targets]
+                          for (path, search_id), targets
+                          in self._edges.items()],
+                'includers': self._includers,
+                'units': self._units,
+                'fingerprints': self._fingerprints,
+                'converter': self._converter}
+
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, separators=(',', ':'))
+        os.replace(tmp_path, self._path)
+        self._modified = False
+
+    def _search_path_id(self, quote_dirs, angle_dirs):
+        key = (quote_dirs, angle_dirs)
+        search_id = self._search_path_ids.get(key)
+        if search_id is None:
+            search_id = len(self._search_paths)
+            self._search_paths.append([list(quote_dirs), list(angle_dirs)])
+            self._search_path_ids[key] = search_id
+        return search_id
+
+    def _add_unit(self, key, source, search_id):
+        self._remove_unit(key)
+        self._units[key] = [source, search_id]
+        self._unit_sources.setdefault(source, set()).add(key)
+
+    def _remove_unit(self, key):
+        unit = self._units.pop(key, None)
+        if unit is not None:
+            self._unit_sources[unit[0]].discard(key)
+
+    def _refresh_files(self):
+        """Re-read changed files, return set of changed paths."""
+        changed = set()
+        for path, record in list(self._files.items()):
+            stat = stat_file(path)
+            if stat == record[:2]:
+                continue
+            changed.add(path)
+            if stat is None:
+                del self._files[path]
+            else:
+                self._files[path] = stat + [dep.read_includes(path)]
+        return changed
+
+    def _get_includes(self, path):
+        record = self._files.get(path)
+        if record is None:
+            stat = stat_file(path)
+            if stat is None:
+                return []
+            record = stat + [dep.read_includes(path)]
+            self._files[path] = record
+        return record[2]
+
+    def _set_edges(self, node, targets):
+        path = node[0]
+        for target in self._edges.get(node, []):
+            includers = self._includers[target]
+            includers[path] -= 1
+            if includers[path] == 0:
+                del includers[path]
+        for target in targets:
+            includers = self._includers.setdefault(target, {})
+            includers[path] = includers.get(path, 0) + 1
+        self._edges[node] = targets
+
+    def _resolve_nodes(self, nodes, scanner: dep.DependencyScanner):
+        """Resolve direct edges of nodes and of every newly reached node."""
+        pending = list(nodes)
+        while pending:
+            node = pending.pop()
+            path, search_id = node
+            quote_dirs, angle_dirs = self._search_paths[search_id]
+            targets = []
+            for is_quoted, name in self._get_includes(path):
+                target = scanner.resolve(path, is_quoted, name,
+                                         tuple(quote_dirs),
+                                         tuple(angle_dirs))
+                if target != '':
+                    targets.append(target)
+            self._set_edges(node, targets)
+
+            for target in targets:
+                if (target, search_id) not in self._edges:
+                    self._edges[(target, search_id)] = []
+                    pending.append((target, search_id))
+
+    def _update(self, keys: set, entries, path_converter: dict):
+        """Update units of entries and drop units not in keys."""
+        changed = self._refresh_files()
+        nodes = {node for node in self._edges if node[0] in changed}
+
+        for entry in entries:
+            key = entry.get_key()
+            source, _, quote_dirs, angle_dirs = \
+                dep.get_translation_unit(entry, path_converter)
+            search_id = self._search_path_id(quote_dirs, angle_dirs)
+
+            if self._units.get(key) != [source, search_id]:
+                self._add_unit(key, source, search_id)
+            if (source, search_id) not in self._edges:
+                nodes.add((source, search_id))
+
+        removed = set(self._units) - keys
+        for key in removed:
+            self._remove_unit(key)
+
+        self._resolve_nodes(nodes, dep.DependencyScanner())
+        if changed or nodes or removed or entries:
+            self._modified = True
+        return len(nodes)
+
+    def update(self, entries, path_converter: dict):
+        """Update index for entries, return number of resolved files."""
+        entries = list(entries)
+        return self._update({entry.get_key() for entry in entries},
+                            entries, path_converter)
+
+    def update_commands(self, commands, path_converter: dict):
+        """Update index for raw commands, parsing changed entries only.
+
+        Return (keys of entries by index, number of resolved files).
+        """
+        converter = json.dumps(path_converter, sort_keys=True, default=str)
+        if converter != self._converter:
+            self._fingerprints = {}
+            self._converter = converter
+
+        raw_keys, fingerprints = dbd.make_fingerprints(commands)
+        keys = []
+        entries = []
+        parsed = set()
+        for raw_key, command in zip(raw_keys, commands):
+            record = self._fingerprints.get(raw_key)
+            # Duplicates are parsed again, so the last one wins as in update.
+            if record is None or record[0] != fingerprints[raw_key] or \
+                    record[1] not in self._units or raw_key in parsed:
+                entry = cdb.Entry(command)
+                entries.append(entry)
+                parsed.add(raw_key)
+                record = [fingerprints[raw_key], entry.get_key()]
+                self._fingerprints[raw_key] = record
+            keys.append(record[1])
+
+        if len(self._fingerprints) != len(fingerprints):
+            self._fingerprints = {raw_key: self._fingerprints[raw_key]
+                                  for raw_key in fingerprints}
+        return keys, self._update(set(keys), entries, path_converter)
+
+    def get_affected(self, paths):
+        """Get keys of translation units affected by changed paths."""
+        affected = set()
+        visited = set()
+        pending = list(paths)
+        while pending:
+            path = pending.pop()
+            if path in visited:
+                continue
+            visited.add(path)
+            affected.update(self._unit_sources.get(path, ()))
+            pending.extend(self._includers.get(path, ()))
+        return affected
+
+    def get_dependencies(self, key: str):
+        """Get sorted headers transitively included by a unit."""
+        unit = self._units.get(key)
+        if unit is None:
+            return []
+
+        source, search_id = unit
+        visited = set()
+        pending = [source]
+        while pending:
+            path = pending.pop()
+            for target in self._edges.get((path, search_id), ()):
+                if target not in visited:
+                    visited.add(target)
+                    pending.append(target)
+        visited.discard(source)
+        return sorted(visited)
+
+    def get_files(self):
+        """Get sources and headers read by the index."""
+        return list(self._files)
+
+    def __len__(self):
+        return len(self._units)
+
+
+def get_changed_files(ref: str, directory: str = ''):
+    """Get absolute paths of files changed since a git ref."""
+    cwd = directory if directory != '' else None
+    toplevel = sproc.run(['git', 'rev-parse', '--show-toplevel'],
+                         cwd=cwd, stdout=sproc.PIPE, stderr=sproc.PIPE,
+                         text=True, check=True).stdout.strip()
+    diff = sproc.run(['git', 'diff', '--name-only', ref, '--'],
+                     cwd=toplevel, stdout=sproc.PIPE, stderr=sproc.PIPE,
+                     text=True, check=True).stdout
+    untracked = sproc.run(['git', 'ls-files', '--others',
+                           '--exclude-standard'],
+                          cwd=toplevel, stdout=sproc.PIPE, stderr=sproc.PIPE,
+                          text=True, check=True).stdout
+
+    changed = set()
+    for name in diff.splitlines() + untracked.splitlines():
+        if name != '':
+            changed.add(os.path.normpath(os.path.join(toplevel, name)))
+    return changed
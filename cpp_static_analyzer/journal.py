@@ -0,0 +1,129 @@
+"""Crash-safe journal of completed entries to resume interrupted runs."""
+import json
+import os
+import threading
+
+import cpp_static_analyzer.batch_queue as bq
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.console as con
+
+# Journal written to the output directory.
+JOURNAL_FILE = '.journal.jsonl'
+
+# Maximum number of records made durable by one fsync.
+_BATCH_SIZE = 1024
+
+
+def _fsync_path(path: str):
+    """Flush a written file to disk, ignoring files that do not exist."""
+    try:
+        descriptor = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def load(path: str, header: dict):
+    """Get keys of entries completed successfully by a journaled run.
+
+    The journal must have been started with the same header. A record
+    torn by a crash ends the journal. Return None if the journal cannot be
+    resumed.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            lines = iter(file)
+            try:
+                if json.loads(next(lines)) != header:
+                    return None
+            except (StopIteration, ValueError):
+                return None
+
+            done = set()
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record['failed']:
+                    done.discard(record['key'])
+                else:
+                    done.add(record['key'])
+            return done
+    except OSError:
+        return None
+
+
+class Journal:
+    """Append completed entries to a journal.
+
+    Workers only queue records. A writer thread appends queued records in
+    batches and makes each batch durable with one fsync of the journal,
+    after flushing the output files the batch refers to, so the journal
+    never names an entry whose outputs could be lost.
+    """
+
+    def __init__(self,
+                 path: str,
+                 header: dict,
+                 output_directory: str,
+                 error_directory: str,
+                 resume: bool = False):
+        self._output_directory = output_directory
+        self._error_directory = error_directory
+        self._count = 0
+        if resume:
+            self._file = open(path, 'a', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+            self._file.write(json.dumps(header) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+        self._queue = bq.BatchQueue(_BATCH_SIZE)
+        self._thread = threading.Thread(target=self._write_records)
+        self._thread.start()
+
+    def add_job(self, job):
+        """Queue record of a completed job."""
+        output_name = cm.get_output_name(job.get_entry().get_input_path())
+        output = None
+        if job.get_result():
+            output = f'{self._output_directory}/{output_name}'
+        error = None
+        if job.get_error():
+            error = f'{self._error_directory}/{output_name}'
+        self._queue.put({'key': job.get_entry().get_key(),
+                         'output': output,
+                         'error': error,
+                         'failed': job.get_failure() is not None})
+
+    def _write_records(self):
+        batch = self._queue.get_batch()
+        while batch is not None:
+            for record in batch:
+                for path in (record['output'], record['error']):
+                    if path is not None:
+                        _fsync_path(path)
+            self._file.write(''.join(json.dumps(record) + '\n'
+                                     for record in batch))
+            self._file.flush()
+            try:
+                os.fsync(self._file.fileno())
+            except OSError as e:
+                con.trace(f'Cannot sync journal: {e}.')
+            self._count += len(batch)
+            batch = self._queue.get_batch()
+
+    def get_count(self):
+        """Get number of journaled records."""
+        return self._count
+
+    def close(self):
+        """Write remaining records and close the journal."""
+        self._queue.close()
+        self._thread.join()
+        self._file.close()
@@ -2,16 +2,37 @@
 import os
 import os.path as fpath
 import argparse
+import asyncio
 import threading
 import time
 import sys
 import pathlib as plib
 import json
+import subprocess as sproc
+import sqlite3
+import cpp_static_analyzer.admission as adm
+import cpp_static_analyzer.async_executor as ae
+import cpp_static_analyzer.batch as bt
+import cpp_static_analyzer.check_profile as chp
 import cpp_static_analyzer.command_manager as cm
 import cpp_static_analyzer.compile_db as cdb
 import cpp_static_analyzer.thread_manager as tm
 import cpp_static_analyzer.config as cfg
 import cpp_static_analyzer.console as con
+import cpp_static_analyzer.converted_db as cvdb
+import cpp_static_analyzer.db_diff as dbd
+import cpp_static_analyzer.diagnostics as diag
+import cpp_static_analyzer.distributed as dist
+import cpp_static_analyzer.failures as fl
+import cpp_static_analyzer.history as hist
+import cpp_static_analyzer.include_index as ii
+import cpp_static_analyzer.journal as jr
+import cpp_static_analyzer.metrics as mt
+import cpp_static_analyzer.progress as pg
+import cpp_static_analyzer.result_cache as rc
+import cpp_static_analyzer.result_store as rs
+import cpp_static_analyzer.shard as sh
+import cpp_static_analyzer.watch as wt
 
 
 def _check_and_make_directory(directory):
@@ -25,43 +46,243 @@ def _check_and_make_directory(directory):
     return 0
 
 
-def _print_progress(command_manager,
-                    last_index,
-                    sleep_interval):
-    current_idx = command_manager.get_current_index()
-    msg_len = 0
+def _get_changed_since(cmd_mgr, config, ref, index_path):
+    """Get indices of entries affected by changes since ref, or None."""
+    start_time = time.perf_counter()
+    index = ii.IncludeIndex(index_path)
+    keys, resolved = index.update_commands(cmd_mgr.get_commands(),
+                                           config.get_path_converter())
+    index.save()
+
+    try:
+        changed_files = ii.get_changed_files(ref)
+    except (sproc.CalledProcessError, OSError) as e:
+        con.error(f'Cannot get files changed since {ref}: {e}.')
+        return None
+
+    affected = index.get_affected(changed_files)
+    selected = [idx for idx, key in enumerate(keys) if key in affected]
+
+    elapsed = time.perf_counter() - start_time
+    con.trace(f'Include index: {resolved} of {len(keys)} units resolved.')
+    con.error(f'{len(changed_files)} files changed since {ref}, '
+              f'{len(selected)} of {len(keys)} entries selected '
+              f'({elapsed:.2f}s).')
+    return selected
+
+
+def _print_database_diff(snapshot):
+    """Print differences of the database from the previous snapshot."""
+    summary = snapshot.get_diff().get_summary()
+    if not snapshot.has_previous():
+        con.error('No compile database snapshot of a previous run.')
+    elif snapshot.is_config_changed():
+        con.error('Configuration changed, every entry is modified.')
+    con.error(f'Compile database: {summary["added"]} added, '
+              f'{summary["modified"]} modified, {summary["removed"]} '
+              f'removed, {summary["unchanged"]} unchanged entries.')
+
+
+def _get_database_changes(snapshot):
+    """Get indices of entries added or modified since the previous run."""
+    _print_database_diff(snapshot)
+    return snapshot.get_changed_indices()
+
+
+def _order_by_history(cmd_mgr, history, num_of_jobs):
+    """Order selected entries longest-expected-first.
+
+    Return predicted makespan in (new order, original order).
+    """
+    commands = cmd_mgr.get_commands()
+    selected = cmd_mgr.get_selected_indices()
+    keys = [cdb.get_entry_key(commands[idx]) for idx in selected]
+    estimates = history.estimate(keys)
+
+    order = hist.order_longest_first(estimates)
+    cmd_mgr.select([selected[idx] for idx in order])
+
+    predicted = hist.simulate_makespan([estimates[idx] for idx in order],
+                                       num_of_jobs)
+    original = hist.simulate_makespan(estimates, num_of_jobs)
+    return predicted, original
+
+
+def _select_shard(cmd_mgr, config, shard, durations_path):
+    """Restrict command manager to the entries of a shard."""
+    shard_index, shard_count = sh.parse_shard(shard)
+    commands = cmd_mgr.get_commands()
+    selected = cmd_mgr.get_selected_indices()
+    entries = cdb.get_entries(commands[idx] for idx in selected)
+
+    if durations_path != '':
+        costs = sh.estimate_duration_costs(
+            entries, hist.DurationHistory(durations_path))
+    else:
+        costs = sh.estimate_size_costs(entries, config.get_path_converter())
+
+    assignment = sh.partition(costs, shard_count)
+    cmd_mgr.select([idx for idx, shard_id in zip(selected, assignment)
+                    if shard_id == shard_index])
+
+    shard_cost = sum(cost for cost, shard_id in zip(costs, assignment)
+                     if shard_id == shard_index)
+    total_cost = sum(costs)
+    share = shard_cost / total_cost * 100 if total_cost > 0 else 0.0
+    con.error(f'Shard {shard}: {len(cmd_mgr)} of {len(selected)} entries, '
+              f'{share:.1f}% of estimated cost.')
+
+
+def _select_entries(arguments, cmd_mgr, config, out_dir, snapshot):
+    """Apply --since, --db-changes, deduplication and --shard selections.
+
+    Entries selected by --since or --db-changes are analyzed.
+    """
+    selections = []
+    if arguments.since != '':
+        index_path = f'{out_dir}/.include_index.json'
+        selected = _get_changed_since(cmd_mgr, config, arguments.since,
+                                      index_path)
+        if selected is None:
+            return -1
+        selections.append(selected)
+
+    if arguments.db_changes:
+        selections.append(_get_database_changes(snapshot))
+
+    if selections:
+        cmd_mgr.select(sorted(set().union(*selections)))
+
+    if not arguments.stream and not arguments.no_dedup:
+        saved = cmd_mgr.deduplicate(config)
+        con.error(f'Deduplicated {saved} identical invocations.')
+
+    if arguments.shard != '':
+        _select_shard(cmd_mgr, config, arguments.shard,
+                      arguments.shard_durations)
+    return 0
 
-    while current_idx <= last_index:
-        rate = current_idx / last_index * 100
 
-        prev_msg_len = msg_len
-        msg = f'Processing files: {rate:.1f}%'
-        msg_len = len(msg)
+def _open_snapshot(arguments, cmd_mgr, config, out_dir):
+    """Compare the database with the previous run and record this run."""
+    if arguments.stream:
+        return None
+    snapshot = dbd.DatabaseSnapshot(f'{out_dir}/{dbd.SNAPSHOT_FILE}',
+                                    cmd_mgr.get_commands(),
+                                    config.get_fingerprint())
+    cmd_mgr.add_completion_listener(snapshot.add_job)
+    return snapshot
 
-        if msg_len < prev_msg_len:
-            del_line = ''
-            for _ in range(prev_msg_len):
-                del_line += ' '
-            con.error(del_line, end='\r')
 
-        if current_idx < last_index:
-            con.error(msg, end='\r')
-            current_idx = command_manager.get_current_index()
+def _select_remaining(cmd_mgr, done):
+    """Restrict command manager to entries not done by a resumed run."""
+    commands = cmd_mgr.get_commands()
+    selected = cmd_mgr.get_selected_indices()
+    remaining = [idx for idx in selected
+                 if any(cdb.get_entry_key(commands[index]) not in done
+                        for index in (idx, *cmd_mgr.get_duplicates(idx)))]
+    cmd_mgr.select(remaining)
+    con.error(f'Resuming: {len(selected) - len(remaining)} of '
+              f'{len(selected)} entries already done.')
+
+
+def _open_journal(arguments, cmd_mgr, config, out_dir, err_dir):
+    """Journal completed entries, skipping those of a resumed run."""
+    path = f'{out_dir}/{jr.JOURNAL_FILE}'
+    header = {'database': os.path.abspath(arguments.input_file),
+              'fingerprint': config.get_fingerprint()}
+    resume = False
+    if arguments.resume:
+        done = jr.load(path, header)
+        if done is None:
+            con.error('Cannot resume, the journal is missing or was written '
+                      'for another database or configuration.')
         else:
-            con.error(msg)
-            break
+            _select_remaining(cmd_mgr, done)
+            resume = True
+
+    journal = jr.Journal(path, header, out_dir, err_dir, resume)
+    cmd_mgr.add_completion_listener(journal.add_job)
+    return journal
+
+
+def _write_converted_database(cmd_mgr, config, build_dir):
+    """Write converted database of selected entries, run jobs with -p."""
+    start_time = time.perf_counter()
+    commands = cmd_mgr.get_commands()
+    selected = cmd_mgr.get_selected_indices()
+    shared_sources = cvdb.write_database((commands[idx] for idx in selected),
+                                         config, build_dir)
+    cmd_mgr.set_build_directory(build_dir, shared_sources)
+
+    elapsed = time.perf_counter() - start_time
+    con.trace(f'Converted database: {len(selected)} entries, '
+              f'{len(shared_sources)} shared sources ({elapsed:.2f}s).')
+
+
+def _enable_check_profile(arguments, cmd_mgr, config, out_dir):
+    """Store per-check profiles of analyzed jobs if requested."""
+    if arguments.check_profile == '':
+        return None
+    profile_dir = f'{out_dir}/{chp.PROFILE_DIR}'
+    chp.clear_profiles(profile_dir)
+    config.add_additional_options(chp.get_profile_options(profile_dir))
+
+    profile = chp.CheckProfile()
+    cmd_mgr.add_completion_listener(profile.add_job)
+    return profile
+
+
+def _write_check_profile(arguments, profile, out_dir, elapsed):
+    """Aggregate stored per-check profiles into the ranked report."""
+    profile.load_directory(f'{out_dir}/{chp.PROFILE_DIR}')
+    profile.write_report(arguments.check_profile, elapsed)
+    con.error(f'Check profile: {profile.get_unit_count()} translation '
+              f'units, {profile.get_check_time():.1f}s in checks.')
+
+
+def _write_metrics(arguments, metrics, elapsed):
+    """Write run metrics files."""
+    record = metrics.to_record(elapsed)
+    if arguments.metrics != '':
+        mt.write_json(arguments.metrics, record)
+    if arguments.metrics_prometheus != '':
+        mt.write_prometheus(arguments.metrics_prometheus, record)
+    con.error(f'Metrics: {record["throughput"]:.1f} units per minute, '
+              f'{record["utilization"]:.0%} worker utilization.')
 
-        time.sleep(sleep_interval)
 
+def _record_duration(history, job):
+    if not job.is_cached():
+        history.record(job.get_entry().get_key(), job.get_duration())
 
-def _execute_analyzer_threads(compile_commands_json,
-                              config_yaml,
+
+def _record_memory(memory_history, job):
+    usage = job.get_usage()
+    if usage is not None and usage.get_max_rss() is not None:
+        memory_history.record(job.get_entry().get_key(),
+                              usage.get_max_rss())
+
+
+def _add_memory_budget(arguments, cmd_mgr, out_dir):
+    """Record peak RSS of entries and admit jobs within the budget."""
+    memory_history = hist.MemoryHistory(f'{out_dir}/.memory.json')
+    cmd_mgr.add_completion_listener(
+        lambda job: _record_memory(memory_history, job))
+
+    if arguments.memory_budget > 0 or arguments.job_memory_limit > 0:
+        cmd_mgr.set_memory_budget(adm.MemoryBudget(
+            arguments.memory_budget * 1024 * 1024, memory_history,
+            arguments.jobs, arguments.job_memory_limit * 1024 * 1024))
+    return memory_history
+
+
+def _execute_analyzer_threads(cmd_mgr,
+                              config,
                               num_of_jobs,
                               out_dir,
                               err_dir):
-    cmd_mgr = cm.CommandManager(compile_commands_json)
     thread_mgr = tm.ThreadManager()
-    config = cfg.Config(config_yaml)
 
     job_args = (cmd_mgr, config, out_dir, err_dir)
     for _ in range(num_of_jobs):
@@ -69,23 +290,293 @@ def _execute_analyzer_threads(compile_commands_json,
                                                args=job_args))
 
     thread_mgr.start_all_threads()
+    thread_mgr.join_all_threads()
+    thread_mgr.remove_all_threads()
+
+
+def _execute_analyzer_async(cmd_mgr,
+                            config,
+                            num_of_jobs,
+                            out_dir,
+                            err_dir):
+    executor = ae.AsyncExecutor(cmd_mgr, config, num_of_jobs, out_dir,
+                                err_dir)
+    asyncio.run(executor.run())
+
+
+def _add_reports(arguments, cmd_mgr):
+    """Register report writers, return (merger, report, store)."""
+    merger = None
+    if arguments.merged_report != '':
+        merger = diag.DiagnosticMerger(arguments.merged_report)
+        cmd_mgr.add_completion_listener(merger.add_job)
 
-    # Print progress.
-    last_idx = len(cmd_mgr)
+    report = None
+    if arguments.jsonl != '' or arguments.sarif != '':
+        report = diag.StructuredReport(arguments.jsonl, arguments.sarif)
+        cmd_mgr.add_completion_listener(report.add_job)
 
-    _print_progress(cmd_mgr, last_idx, 0.5)
+    store = None
+    if arguments.result_db != '':
+        store = rs.ResultStore(arguments.result_db)
+        cmd_mgr.add_completion_listener(store.add_job)
 
+    return merger, report, store
+
+
+def _close_reports(merger, report, store):
+    if merger is not None:
+        merger.close()
+        con.error(f'Merged report: {merger.get_unique_count()} unique of '
+                  f'{merger.get_total_count()} diagnostics.')
+
+    if report is not None:
+        report.close()
+        con.error(f'Structured report: {report.get_count()} diagnostics.')
+
+    if store is not None:
+        store.close()
+        con.error(f'Result database: run {store.get_run_id()}.')
+
+
+def _print_summary(cmd_mgr, result_cache, makespan, elapsed):
+    if makespan is not None:
+        con.error(f'Makespan: predicted {makespan[0]:.1f}s '
+                  f'({makespan[1]:.1f}s in database order), '
+                  f'actual {elapsed:.1f}s.')
+
+    budget = cmd_mgr.get_memory_budget()
+    if budget is not None and budget.get_peak() > 0.0:
+        con.error(f'Memory budget: predicted peak '
+                  f'{budget.get_peak() / (1024 * 1024):.0f} MiB, waited '
+                  f'{budget.get_wait_time():.1f}s for admission.')
+
+    first_dispatch_time = cmd_mgr.get_time_to_first_dispatch()
+    if first_dispatch_time is not None:
+        con.error(f'Time to first dispatched job: '
+                  f'{first_dispatch_time:.3f}s.')
+
+    if result_cache is not None:
+        result_cache.evict()
+        con.error(f'Result cache: {result_cache.get_hits()} hits, '
+                  f'{result_cache.get_misses()} misses.')
+
+
+def _execute_analyzer_coordinator(cmd_mgr,
+                                  config,
+                                  address,
+                                  out_dir,
+                                  err_dir):
+    coordinator = dist.Coordinator(cmd_mgr, config, out_dir, err_dir)
+    host, port = coordinator.start(*dist.parse_address(address))
+    con.error(f'Waiting for workers on {host}:{port}.')
+    coordinator.wait()
+
+
+def _execute_analyzer_batches(cmd_mgr,
+                              config,
+                              arguments,
+                              out_dir,
+                              err_dir,
+                              history):
+    estimate = history.get_default_estimate() if len(history) > 0 else None
+    sizer = bt.BatchSizer(arguments.batch_size, arguments.batch_target,
+                          estimate)
+    executor = bt.BatchExecutor(cmd_mgr, config, arguments.jobs, sizer)
+    thread_mgr = tm.ThreadManager()
+
+    for _ in range(arguments.jobs):
+        thread_mgr.add_thread(threading.Thread(target=executor.job,
+                                               args=(out_dir, err_dir)))
+
+    thread_mgr.start_all_threads()
     thread_mgr.join_all_threads()
     thread_mgr.remove_all_threads()
 
-    if last_idx == cmd_mgr.get_current_index():
+    if sizer.get_estimate() is not None:
+        con.trace(f'Batch cost: {sizer.get_estimate():.3f}s per file.')
+
+
+def _execute_engine(arguments, cmd_mgr, config, out_dir, err_dir, history):
+    """Run selected entries with the selected engine.
+
+    Failed entries are recorded on their jobs.
+    """
+    if arguments.listen != '':
+        _execute_analyzer_coordinator(cmd_mgr, config, arguments.listen,
+                                      out_dir, err_dir)
+    elif arguments.batch_size > 1:
+        _execute_analyzer_batches(cmd_mgr, config, arguments,
+                                  out_dir, err_dir, history)
+    elif arguments.engine == 'async':
+        _execute_analyzer_async(cmd_mgr, config, arguments.jobs,
+                                out_dir, err_dir)
+    else:
+        _execute_analyzer_threads(cmd_mgr, config, arguments.jobs,
+                                  out_dir, err_dir)
+
+
+def _analyze_changes(arguments, cmd_mgr, config, dirs, histories, indices):
+    """Re-analyze entries of a watch cycle, updating outputs in place."""
+    out_dir, err_dir = dirs
+    history, memory_history = histories
+    cmd_mgr.clear_completion_listeners()
+    cmd_mgr.select(indices)
+    if not arguments.no_dedup:
+        cmd_mgr.deduplicate(config)
+    if arguments.converted_db:
+        _write_converted_database(cmd_mgr, config, f'{out_dir}/.build')
+
+    cmd_mgr.add_completion_listener(
+        lambda job: _record_duration(history, job))
+    cmd_mgr.add_completion_listener(
+        lambda job: _record_memory(memory_history, job))
+    progress = pg.ProgressReporter(cmd_mgr, history)
+    cmd_mgr.add_completion_listener(progress.add_job)
+    manifest = fl.FailureManifest()
+    cmd_mgr.add_completion_listener(manifest.add_job)
+
+    _execute_engine(arguments, cmd_mgr, config, out_dir, err_dir, history)
+    progress.close()
+    history.save()
+    memory_history.save()
+    manifest.write(f'{out_dir}/{fl.MANIFEST_FILE}')
+
+
+def _get_watch_inputs(arguments):
+    """Get absolute paths of the compile database and configuration."""
+    return {os.path.abspath(path)
+            for path in (arguments.input_file, arguments.config_file)
+            if path != ''}
+
+
+def _watch_changes(arguments, cmd_mgr, config, dirs, histories):
+    """Re-analyze entries affected by changed files until interrupted.
+
+    The compile database, configuration and include index stay loaded, so
+    a cycle only re-reads changed files and runs the affected entries.
+    """
+    entries = cdb.get_entries(cmd_mgr.get_commands())
+    indices = {}
+    for idx, entry in enumerate(entries):
+        indices.setdefault(entry.get_key(), []).append(idx)
+
+    path_converter = config.get_path_converter()
+    index = ii.IncludeIndex(f'{dirs[0]}/.include_index.json')
+    index.update(entries, path_converter)
+    index.save()
+    inputs = _get_watch_inputs(arguments)
+    watcher = wt.make_watcher(index.get_files() + list(inputs))
+    cmd_mgr.set_remove_stale_outputs(True)
+
+    try:
+        while True:
+            con.error(f'Watching {len(index.get_files())} files.')
+            changed = wt.wait_for_changes(watcher, arguments.watch_debounce)
+            for path in sorted(changed & inputs):
+                con.error(f'{path} changed, restart to reload it.')
+
+            cmd_mgr.invalidate(changed)
+            index.update(entries, path_converter)
+            selected = sorted(idx for key in index.get_affected(changed)
+                              for idx in indices.get(key, ()))
+            con.error(f'{len(changed)} files changed, {len(selected)} '
+                      f'entries affected.')
+            if selected:
+                _analyze_changes(arguments, cmd_mgr, config, dirs,
+                                 histories, selected)
+            index.save()
+            watcher.set_paths(index.get_files() + list(inputs))
+    except KeyboardInterrupt:
+        con.error('Stopped watching.')
+    finally:
+        watcher.close()
+    return 0
+
+
+def _get_exit_status(cmd_mgr, failed: int, out_dir: str):
+    """Report outcome of a run, return its exit status."""
+    if cmd_mgr.get_load_error() is not None:
+        con.error(f'Analysis stopped early: {cmd_mgr.get_load_error()}')
+        return 1
+
+    unprocessed = len(cmd_mgr) - cmd_mgr.get_completed_count()
+    if failed == 0 and unprocessed == 0:
         con.error('All commands processed successfully!')
         return 0
 
-    con.error('Some commands failed to process!')
+    con.error(f'Some commands failed to process! {failed} failed, '
+              f'{unprocessed} not processed, see '
+              f'{out_dir}/{fl.MANIFEST_FILE}.')
     return 1
 
 
+def _run_analysis(arguments, out_dir, err_dir, result_cache):
+    cmd_mgr = cm.CommandManager(arguments.input_file, result_cache,
+                                arguments.stream)
+    config = cfg.Config(arguments.config_file)
+
+    snapshot = _open_snapshot(arguments, cmd_mgr, config, out_dir)
+    if _select_entries(arguments, cmd_mgr, config, out_dir, snapshot) < 0:
+        return -1
+
+    journal = _open_journal(arguments, cmd_mgr, config, out_dir, err_dir)
+
+    if arguments.converted_db:
+        _write_converted_database(cmd_mgr, config, f'{out_dir}/.build')
+
+    history = hist.DurationHistory(f'{out_dir}/.durations.json')
+    cmd_mgr.add_completion_listener(
+        lambda job: _record_duration(history, job))
+    memory_history = _add_memory_budget(arguments, cmd_mgr, out_dir)
+    progress = pg.ProgressReporter(cmd_mgr, history)
+    cmd_mgr.add_completion_listener(progress.add_job)
+    cmd_mgr.set_failure_policy(arguments.timeout or None, arguments.retries)
+    manifest = fl.FailureManifest()
+    cmd_mgr.add_completion_listener(manifest.add_job)
+
+    reports = _add_reports(arguments, cmd_mgr)
+    profile = _enable_check_profile(arguments, cmd_mgr, config, out_dir)
+    metrics = mt.RunMetrics(arguments.jobs)
+    cmd_mgr.add_completion_listener(metrics.add_job)
+
+    makespan = None
+    if not arguments.stream and len(history) > 0:
+        makespan = _order_by_history(cmd_mgr, history, arguments.jobs)
+
+    start_time = time.perf_counter()
+    _execute_engine(arguments, cmd_mgr, config, out_dir, err_dir, history)
+    elapsed = time.perf_counter() - start_time
+    progress.close()
+    journal.close()
+    if snapshot is not None:
+        snapshot.save()
+    history.save()
+    memory_history.save()
+    manifest.write(f'{out_dir}/{fl.MANIFEST_FILE}')
+
+    _close_reports(*reports)
+    if profile is not None:
+        _write_check_profile(arguments, profile, out_dir, elapsed)
+    if arguments.metrics != '' or arguments.metrics_prometheus != '':
+        _write_metrics(arguments, metrics, elapsed)
+
+    _print_summary(cmd_mgr, result_cache, makespan, elapsed)
+
+    failed = manifest.get_count()
+    if arguments.shard != '':
+        sh.write_summary(out_dir, {'shard': arguments.shard,
+                                   'entries': len(cmd_mgr),
+                                   'failed': failed,
+                                   'elapsed': elapsed})
+
+    if arguments.watch:
+        return _watch_changes(arguments, cmd_mgr, config, (out_dir, err_dir),
+                              (history, memory_history))
+
+    return _get_exit_status(cmd_mgr, failed, out_dir)
+
+
 def _execute_analyzer(arguments) -> int:
     out_dir = plib.Path(arguments.output_dir).as_posix()
     err_dir = out_dir + '/errors'
@@ -108,37 +599,30 @@ def _execute_analyzer(arguments) -> int:
     if error_code == 1:
         con.trace(f'Using existing {err_dir} as error directory.')
 
-    compile_commands_json = arguments.input_file
-    config_yaml = arguments.config_file
-    num_of_jobs = arguments.jobs
+    result_cache = None
+    if arguments.cache_dir != '' and arguments.check_profile != '':
+        con.error('Result cache is disabled while profiling checks.')
+    elif arguments.cache_dir != '':
+        cache_size = arguments.cache_size * 1024 * 1024
+        result_cache = rc.ResultCache(arguments.cache_dir, cache_size)
 
-    return _execute_analyzer_threads(compile_commands_json,
-                                     config_yaml,
-                                     num_of_jobs,
-                                     out_dir,
-                                     err_dir)
+    return _run_analysis(arguments, out_dir, err_dir, result_cache)
 
 
 def _process_commands(commands, config):
-    compile_commands = []
+    """Yield converted entries of commands one at a time."""
+    path_converter = config.get_path_converter()
     for command in commands:
         entry = cdb.Entry(command)
         entry_dict = {}
 
         directory = entry.get_directory()
-        path_converter = config.get_path_converter()
-
         entry_dict['directory'] = cdb.convert_path(directory,
                                                    path_converter)
 
-        command_str = ''
-        arguments = entry.get_arguments()
-        for arg in arguments:
-            if command_str != '':
-                command_str += ' '
-            command_str += cdb.convert_path(arg, path_converter)
-
-        entry_dict['command'] = command_str
+        entry_dict['command'] = ' '.join(
+            cdb.convert_path(arg, path_converter)
+            for arg in entry.get_arguments())
 
         input_path = entry.get_input_path()
         if input_path != '':
@@ -150,26 +634,23 @@ def _process_commands(commands, config):
             entry_dict['output'] = cdb.convert_path(output_path,
                                                     path_converter)
 
-        compile_commands.append(entry_dict)
-
-    return compile_commands
+        yield entry_dict
 
 
 def _execute_dump_compile_commands(arguments) -> int:
     compile_commands_json = arguments.input_file
-    commands = cdb.load_compile_commands(compile_commands_json)
+    commands = cdb.iter_compile_commands(compile_commands_json)
 
     config_yaml = arguments.config_file
     config = cfg.Config(config_yaml)
 
-    compile_commands = _process_commands(commands, config)
-
     dump_compile_commands = arguments.dump_compile_commands
     con.error(f'Dumping compile commands to {dump_compile_commands}.')
 
     try:
         with open(dump_compile_commands, 'w', encoding='utf-8') as output_file:
-            print(json.dumps(compile_commands, indent=2), file=output_file)
+            cdb.write_compile_commands(_process_commands(commands, config),
+                                       output_file, indent=2)
 
     except (FileNotFoundError, PermissionError) as e:
         con.trace('Error opening file.')
@@ -206,8 +687,203 @@ def _check_file(path, parser, arg: str):
     return path
 
 
+def _check_shard(shard, parser):
+    """Check shard specification."""
+    if shard == '':
+        return ''
+    try:
+        sh.parse_shard(shard)
+    except ValueError as e:
+        parser.error(str(e))
+    return shard
+
+
+def _execute_query(argv) -> int:
+    parser = argparse.ArgumentParser(
+        prog='cpp-static-analyzer query',
+        description='Count diagnostics recorded in a result database.')
+    parser.add_argument('--run',
+                        type=int,
+                        help='Run id. Latest run if omitted.',
+                        default=None)
+    parser.add_argument('--check',
+                        type=str,
+                        help='GLOB pattern of check names, e.g. bugprone-*.',
+                        default='')
+    parser.add_argument('--file',
+                        type=str,
+                        help='GLOB pattern of absolute file paths, '
+                             'e.g. */src/net/*.',
+                        default='')
+    parser.add_argument('--group-by',
+                        type=str,
+                        choices=sorted(rs.GROUPS),
+                        help='Column to count diagnostics by.',
+                        default='check')
+    parser.add_argument('database',
+                        type=lambda
+                        file_path: _check_file(file_path, parser, 'Database'),
+                        help='Result database to query.')
+    args = parser.parse_args(argv)
+
+    try:
+        run_id, rows = rs.query(args.database, args.run, args.check,
+                                args.file, args.group_by)
+    except sqlite3.Error as e:
+        con.error(f'Cannot query {args.database}: {e}.')
+        return -1
+
+    total = 0
+    for group, count in rows:
+        con.out(f'{count}\t{group}')
+        total += count
+    con.error(f'Run {run_id}: {total} diagnostics.')
+    return 0
+
+
+def _execute_worker(argv) -> int:
+    parser = argparse.ArgumentParser(
+        prog='cpp-static-analyzer worker',
+        description='Analyze entries served by a coordinator.')
+    parser.add_argument('-cfg', '--config-file',
+                        type=lambda
+                        file_path: _check_file(file_path, parser, 'Config file'),
+                        help='Path YAML config file.',
+                        default='')
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        help='Number of concurrent connections.',
+                        default=1)
+    parser.add_argument('--timeout',
+                        type=float,
+                        help='Kill clang-tidy and its process group after \
+                        this many seconds per entry. Disabled if 0.',
+                        default=0.0)
+    parser.add_argument('--retries',
+                        type=int,
+                        help='Retries of an entry after a timeout, a signal \
+                        or a failed start.',
+                        default=1)
+    parser.add_argument('address',
+                        type=str,
+                        help='Coordinator HOST:PORT.')
+    args = parser.parse_args(argv)
+
+    if args.config_file == '':
+        args.config_file = cfg.search_for_config_file(os.getcwd())
+    config = cfg.Config(args.config_file)
+    host, port = dist.parse_address(args.address)
+
+    counts = []
+    errors = []
+
+    def _work():
+        try:
+            counts.append(dist.run_worker(host, port, config,
+                                          args.timeout or None,
+                                          args.retries))
+        except OSError as e:
+            errors.append(e)
+
+    thread_mgr = tm.ThreadManager()
+    for _ in range(max(1, args.jobs)):
+        thread_mgr.add_thread(threading.Thread(target=_work))
+    thread_mgr.start_all_threads()
+    thread_mgr.join_all_threads()
+    thread_mgr.remove_all_threads()
+
+    for e in errors:
+        con.error(f'Cannot reach coordinator {args.address}: {e}.')
+    con.error(f'Analyzed {sum(counts)} entries.')
+    return 0 if not errors else -1
+
+
+def _execute_merge(argv) -> int:
+    parser = argparse.ArgumentParser(
+        prog='cpp-static-analyzer merge',
+        description='Merge output directories of shard runs.')
+    parser.add_argument('-o', '--output-dir',
+                        type=str,
+                        help='Merged output directory.',
+                        required=True)
+    parser.add_argument('shard_dirs',
+                        nargs='+',
+                        help='Output directories of shard runs.')
+    args = parser.parse_args(argv)
+
+    for shard_dir in args.shard_dirs:
+        if not fpath.isdir(shard_dir):
+            con.error(f'Shard output {shard_dir} must be a directory.')
+            return -1
+
+    summary = sh.merge_shards(args.shard_dirs, args.output_dir)
+    con.out(json.dumps(summary, indent=2))
+    if summary['shards'] != len(args.shard_dirs):
+        con.error('Some shard directories have no summary.')
+        return 1
+    return 0 if summary['failed'] == 0 else 1
+
+
+def _execute_db_diff(argv) -> int:
+    parser = argparse.ArgumentParser(
+        prog='cpp-static-analyzer db-diff',
+        description='Compare a compile database with the one analyzed by \
+        the previous run into an output directory.')
+    parser.add_argument('-cfg', '--config-file',
+                        type=lambda
+                        file_path: _check_file(file_path, parser, 'Config file'),
+                        help='Path YAML config file of the runs.',
+                        default='')
+    parser.add_argument('-o', '--output-dir',
+                        type=str,
+                        help='Output directory of the previous run.',
+                        required=True)
+    parser.add_argument('--list',
+                        action='store_true',
+                        help='Print status (A, M or D) and file of added, \
+                        modified and removed entries.')
+    parser.add_argument('input_file',
+                        type=lambda
+                        file_path: _check_file(file_path, parser, 'Input file'),
+                        help='Compile commands to compare.')
+    args = parser.parse_args(argv)
+
+    config = cfg.Config(args.config_file)
+    out_dir = plib.Path(args.output_dir).as_posix()
+    snapshot = dbd.DatabaseSnapshot(f'{out_dir}/{dbd.SNAPSHOT_FILE}',
+                                    cdb.load_compile_commands(args.input_file),
+                                    config.get_fingerprint())
+    if not snapshot.has_previous():
+        con.error(f'No compile database snapshot in {out_dir}.')
+        return -1
+
+    diff = snapshot.get_diff()
+    if not args.list:
+        if snapshot.is_config_changed():
+            con.error('Configuration changed, every entry is modified.')
+        con.out(json.dumps(diff.get_summary(), indent=2))
+        return 0
+
+    for status, keys in (('A', diff.get_added()),
+                         ('M', diff.get_modified()),
+                         ('D', diff.get_removed())):
+        for path in sorted(dbd.get_key_path(key) for key in keys):
+            con.out(f'{status}\t{path}')
+    _print_database_diff(snapshot)
+    return 0
+
+
 def execute():
     """Begin execution."""
+    if len(sys.argv) > 1 and sys.argv[1] == 'query':
+        sys.exit(_execute_query(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'worker':
+        sys.exit(_execute_worker(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'merge':
+        sys.exit(_execute_merge(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'db-diff':
+        sys.exit(_execute_db_diff(sys.argv[2:]))
+
     parser = argparse.ArgumentParser(description='C/C++ static analyzer \
     using clang-tidy.')
 
@@ -232,11 +908,169 @@ def execute():
                         type=int,
                         help='Number of jobs.',
                         default=1)
+    # Analyze entries with identical invocations separately.
+    parser.add_argument('--no-dedup',
+                        action='store_true',
+                        help='Do not deduplicate entries with identical \
+                        clang-tidy invocations.')
+    # Select job execution engine.
+    parser.add_argument('--engine',
+                        type=str,
+                        choices=['thread', 'async'],
+                        help='Job execution engine: one thread per job or \
+                        an asyncio event loop dispatching jobs.',
+                        default='thread')
+    # Write each unique diagnostic once to a merged report.
+    parser.add_argument('--merged-report',
+                        type=str,
+                        help='Write diagnostics reported by several \
+                        entries only once to this file.',
+                        default='')
+    # Write diagnostics as JSON Lines records.
+    parser.add_argument('--jsonl',
+                        type=str,
+                        help='Write parsed diagnostics as JSON Lines to \
+                        this file.',
+                        default='')
+    # Write diagnostics as SARIF log.
+    parser.add_argument('--sarif',
+                        type=str,
+                        help='Write parsed diagnostics as SARIF to this \
+                        file.',
+                        default='')
+    # Record results in a SQLite database.
+    parser.add_argument('--result-db',
+                        type=str,
+                        help='Record status, timings and diagnostics in \
+                        this SQLite database.',
+                        default='')
+    # Serve entries to remote workers instead of running them locally.
+    parser.add_argument('--listen',
+                        type=str,
+                        help='Coordinate workers connecting to HOST:PORT \
+                        instead of analyzing locally.',
+                        default='')
+    # Analyze one of N deterministic cost-balanced shards.
+    parser.add_argument('--shard',
+                        type=lambda shard: _check_shard(shard, parser),
+                        help='Analyze shard i of N (1 <= i <= N), e.g. 2/4.',
+                        default='')
+    # Balance shards with recorded durations instead of file sizes.
+    parser.add_argument('--shard-durations',
+                        type=str,
+                        help='Duration history used to balance shards. \
+                        Source and header sizes are used if empty.',
+                        default='')
+    # Pass compile arguments through a converted database.
+    parser.add_argument('--converted-db',
+                        action='store_true',
+                        help='Write a converted compile database and run \
+                        clang-tidy with -p instead of passing compile \
+                        arguments on the command line.')
+    # Analyze several entries per clang-tidy process.
+    parser.add_argument('--batch-size',
+                        type=int,
+                        help='Maximum number of entries per clang-tidy \
+                        process. Batching is disabled if 1.',
+                        default=1)
+    # Target wall time of a batch.
+    parser.add_argument('--batch-target',
+                        type=float,
+                        help='Target seconds per batch used to adapt the \
+                        batch size to observed per-file cost.',
+                        default=10.0)
+    # Profile time spent by each check.
+    parser.add_argument('--check-profile',
+                        type=str,
+                        help='Run clang-tidy with check profiling and write \
+                        time spent by each check, ranked, to this file.',
+                        default='')
+    # Resume an interrupted run.
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='Skip entries completed by an interrupted run \
+                        into the same output directory.')
+    # Kill clang-tidy processes running too long.
+    parser.add_argument('--timeout',
+                        type=float,
+                        help='Kill clang-tidy and its process group after \
+                        this many seconds per entry. Disabled if 0.',
+                        default=0.0)
+    # Retry entries failing transiently.
+    parser.add_argument('--retries',
+                        type=int,
+                        help='Retries of an entry after a timeout, a signal \
+                        or a failed start.',
+                        default=1)
+    # Admit jobs while their predicted peak RSS fits in a budget.
+    parser.add_argument('--memory-budget',
+                        type=int,
+                        help='Run jobs only while their peak RSS recorded in \
+                        previous runs fits in this many MiB. Disabled if 0.',
+                        default=0)
+    # Limit memory of each clang-tidy process.
+    parser.add_argument('--job-memory-limit',
+                        type=int,
+                        help='Limit address space of each clang-tidy process \
+                        to this many MiB. Unlimited if 0.',
+                        default=0)
+    # Write run metrics.
+    parser.add_argument('--metrics',
+                        type=str,
+                        help='Write throughput, utilization, resource usage \
+                        and slowest entries as JSON to this file.',
+                        default='')
+    # Export run metrics to a node exporter.
+    parser.add_argument('--metrics-prometheus',
+                        type=str,
+                        help='Write run metrics in Prometheus text format \
+                        to this file.',
+                        default='')
     # Analyze single file using current settings.
     parser.add_argument('-f', '--file',
                         type=str,
                         help='Analyze single file.',
                         default='')
+    # Cache analysis results of unchanged translation units.
+    parser.add_argument('--cache-dir',
+                        type=str,
+                        help='Result cache directory. Disabled if empty.',
+                        default='')
+    # Limit size of result cache.
+    parser.add_argument('--cache-size',
+                        type=int,
+                        help='Maximum result cache size in MiB.',
+                        default=1024)
+    # Analyze only entries affected by changes since a git ref.
+    parser.add_argument('--since',
+                        type=str,
+                        help='Analyze only entries affected by files changed \
+                        since a git ref.',
+                        default='')
+    # Analyze only entries whose compile command changed.
+    parser.add_argument('--db-changes',
+                        action='store_true',
+                        help='Analyze only entries added or modified since \
+                        the compile database of the previous run into the \
+                        output directory. Combined with --since, entries \
+                        selected by either are analyzed.')
+    # Re-analyze entries affected by changed files.
+    parser.add_argument('--watch',
+                        action='store_true',
+                        help='Keep running after the analysis and \
+                        re-analyze entries affected by changed sources and \
+                        headers, updating the output directory in place.')
+    # Wait for bursts of changes to settle.
+    parser.add_argument('--watch-debounce',
+                        type=float,
+                        help='Seconds without changes before a watch cycle \
+                        starts.',
+                        default=0.3)
+    # Parse compile commands while dispatching jobs.
+    parser.add_argument('--stream',
+                        action='store_true',
+                        help='Stream compile commands instead of loading \
+                        the whole database before the first job.')
     # Set logging verbosity.
     parser.add_argument('-v', '--verbosity',
                         type=int,
@@ -251,6 +1085,10 @@ def execute():
                         default='')
 
     args = parser.parse_args()
+    if args.watch and (args.stream or args.listen != ''):
+        parser.error('--watch cannot be used with --stream or --listen.')
+    if args.db_changes and args.stream:
+        parser.error('--db-changes cannot be used with --stream.')
 
     # Define verbosity.
     if args.verbosity == 0:
@@ -0,0 +1,132 @@
+"""Run metrics aggregated from per-job resource usage."""
+import heapq
+import json
+import os
+import threading
+
+# Prefix of exported Prometheus metric names.
+_PROMETHEUS_PREFIX = 'cpp_static_analyzer_'
+
+# Scalar Prometheus metrics: (record key, name, help).
+_PROMETHEUS_METRICS = (
+    ('elapsed', 'elapsed_seconds', 'Wall time of the run.'),
+    ('units', 'units', 'Completed translation units.'),
+    ('analyzed', 'analyzed_units', 'Translation units run by clang-tidy.'),
+    ('cached', 'cached_units', 'Translation units replayed from cache.'),
+    ('throughput', 'units_per_minute', 'Completed units per minute.'),
+    ('utilization', 'worker_utilization',
+     'Share of worker time spent running clang-tidy.'),
+    ('wall_time', 'wall_seconds', 'Summed wall time of clang-tidy.'),
+    ('user_time', 'user_seconds', 'Summed user CPU time of clang-tidy.'),
+    ('system_time', 'system_seconds',
+     'Summed system CPU time of clang-tidy.'),
+    ('max_rss', 'max_rss_bytes', 'Peak RSS of a clang-tidy process.'),
+    ('output_bytes', 'output_bytes', 'Bytes written by clang-tidy.'))
+
+
+def _escape_label(value: str):
+    return value.replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+class RunMetrics:
+    """Resource usage of every job of a run.
+
+    Jobs replayed from the cache or fanned out to duplicate entries are
+    counted but not accounted, as they run no clang-tidy.
+    """
+
+    def __init__(self, num_of_jobs: int, slowest: int = 10):
+        self._num_of_jobs = max(1, num_of_jobs)
+        self._slowest_count = slowest
+        self._slowest = []
+        self._units = 0
+        self._analyzed = 0
+        self._cached = 0
+        self._wall_time = 0.0
+        self._user_time = 0.0
+        self._system_time = 0.0
+        self._max_rss = 0
+        self._output_bytes = 0
+        self._lock = threading.Lock()
+
+    def _account(self, job, usage):
+        self._analyzed += 1
+        self._wall_time += usage.get_wall_time()
+        self._user_time += usage.get_user_time() or 0.0
+        self._system_time += usage.get_system_time() or 0.0
+        self._max_rss = max(self._max_rss, usage.get_max_rss() or 0)
+        output_bytes = len(job.get_result() or '') + \
+            len(job.get_error() or '')
+        self._output_bytes += output_bytes
+
+        item = (usage.get_wall_time(), job.get_index(),
+                job.get_entry().get_input_path(), usage, output_bytes)
+        if len(self._slowest) < self._slowest_count:
+            heapq.heappush(self._slowest, item)
+        elif self._slowest and item[:2] > self._slowest[0][:2]:
+            heapq.heapreplace(self._slowest, item)
+
+    def add_job(self, job):
+        """Account a completed job."""
+        usage = job.get_usage()
+        with self._lock:
+            self._units += 1
+            if job.is_cached():
+                self._cached += 1
+            elif usage is not None:
+                self._account(job, usage)
+
+    def to_record(self, elapsed: float):
+        """Get metrics of a run of elapsed seconds."""
+        slowest = sorted(self._slowest, key=lambda item: item[:2],
+                         reverse=True)
+        return {
+            'elapsed': elapsed,
+            'jobs': self._num_of_jobs,
+            'units': self._units,
+            'analyzed': self._analyzed,
+            'cached': self._cached,
+            'throughput': self._units * 60.0 / elapsed
+            if elapsed > 0.0 else 0.0,
+            'utilization': self._wall_time / (elapsed * self._num_of_jobs)
+            if elapsed > 0.0 else 0.0,
+            'wall_time': self._wall_time,
+            'user_time': self._user_time,
+            'system_time': self._system_time,
+            'max_rss': self._max_rss,
+            'output_bytes': self._output_bytes,
+            'slowest': [dict(usage.to_record(), file=file,
+                             output_bytes=output_bytes)
+                        for _, _, file, usage, output_bytes in slowest]}
+
+
+def write_json(path: str, record: dict):
+    """Write metrics record as JSON."""
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(record, file, indent=2)
+
+
+def write_prometheus(path: str, record: dict):
+    """Write metrics record in Prometheus text format.
+
+    The file is replaced atomically for the node exporter textfile
+    collector.
+    """
+    lines = []
+    for key, name, text in _PROMETHEUS_METRICS:
+        lines.append(f'# HELP {_PROMETHEUS_PREFIX}{name} {text}')
+        lines.append(f'# TYPE {_PROMETHEUS_PREFIX}{name} gauge')
+        lines.append(f'{_PROMETHEUS_PREFIX}{name} {record[key]}')
+
+    name = f'{_PROMETHEUS_PREFIX}slowest_unit_wall_seconds'
+    lines.append(f'# HELP {name} Wall time of the slowest units.')
+    lines.append(f'# TYPE {name} gauge')
+    for item in record['slowest']:
+        lines.append(f'{name}{{file="{_escape_label(item["file"])}"}} '
+                     f'{item["wall_time"]}')
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
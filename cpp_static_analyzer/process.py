@@ -0,0 +1,145 @@
+"""Child process execution with resource accounting."""
+import os
+import signal
+import subprocess as sproc
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class ResourceUsage:
+    """Resources used by a child process.
+
+    CPU times and peak RSS are None where the platform or the engine does
+    not report them.
+    """
+
+    __slots__ = ('_wall_time', '_user_time', '_system_time', '_max_rss')
+
+    def __init__(self,
+                 wall_time: float,
+                 user_time: float = None,
+                 system_time: float = None,
+                 max_rss: int = None):
+        self._wall_time = wall_time
+        self._user_time = user_time
+        self._system_time = system_time
+        self._max_rss = max_rss
+
+    def get_wall_time(self):
+        """Get wall time in seconds."""
+        return self._wall_time
+
+    def get_user_time(self):
+        """Get user CPU time in seconds, or None."""
+        return self._user_time
+
+    def get_system_time(self):
+        """Get system CPU time in seconds, or None."""
+        return self._system_time
+
+    def get_max_rss(self):
+        """Get peak resident set size in bytes, or None."""
+        return self._max_rss
+
+    def split(self, count: int):
+        """Get usage of one of count units sharing the process."""
+        count = max(1, count)
+        return ResourceUsage(
+            self._wall_time / count,
+            None if self._user_time is None else self._user_time / count,
+            None if self._system_time is None else
+            self._system_time / count,
+            self._max_rss)
+
+    def to_record(self):
+        """Get JSON serializable record, the keyword arguments of usage."""
+        return {'wall_time': self._wall_time,
+                'user_time': self._user_time,
+                'system_time': self._system_time,
+                'max_rss': self._max_rss}
+
+
+def get_max_rss(rusage):
+    """Get ru_maxrss in bytes, it is in kilobytes except on macOS."""
+    if sys.platform == 'darwin':
+        return rusage.ru_maxrss
+    return rusage.ru_maxrss * 1024
+
+
+def limit_memory(pid: int, limit: int):
+    """Limit address space of a started process to limit bytes.
+
+    The limit is set from outside with prlimit, as setting it between fork
+    and exec is unsafe with threads. Return whether it was set.
+    """
+    if limit <= 0 or resource is None or not hasattr(resource, 'prlimit'):
+        return False
+    try:
+        resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def kill_group(proc, killed: threading.Event = None):
+    """Kill a process started in its own session with its descendants."""
+    if killed is not None:
+        killed.set()
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def run_process(exec_cmd: list, memory_limit: int = 0, timeout: float = None):
+    """Run command, return (exit code, stdout, stderr, usage).
+
+    The child is reaped with wait4 where available, so its CPU times and
+    peak RSS are accounted to it alone even with concurrent children. With
+    a timeout, the child runs in its own session and its whole process
+    group is killed when the timeout expires, raising TimeoutExpired.
+    """
+    start_time = time.perf_counter()
+    if not hasattr(os, 'wait4'):
+        proc = sproc.run(exec_cmd, stdout=sproc.PIPE, stderr=sproc.PIPE,
+                         encoding='utf-8', errors='replace', check=False,
+                         timeout=timeout)
+        usage = ResourceUsage(time.perf_counter() - start_time)
+        return proc.returncode, proc.stdout, proc.stderr, usage
+
+    with sproc.Popen(exec_cmd, stdout=sproc.PIPE, stderr=sproc.PIPE,
+                     encoding='utf-8', errors='replace',
+                     start_new_session=timeout is not None) as proc:
+        limit_memory(proc.pid, memory_limit)
+        killed = threading.Event()
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, kill_group, (proc, killed))
+            timer.start()
+
+        errors = []
+        reader = threading.Thread(
+            target=lambda: errors.append(proc.stderr.read()))
+        reader.start()
+        output = proc.stdout.read()
+        reader.join()
+
+        _, status, rusage = os.wait4(proc.pid, 0)
+        # Popen must not reap the child again.
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if timer is not None:
+            timer.cancel()
+        if killed.is_set() and proc.returncode == -signal.SIGKILL:
+            raise sproc.TimeoutExpired(exec_cmd, timeout, output, errors[0])
+
+    usage = ResourceUsage(time.perf_counter() - start_time,
+                          rusage.ru_utime,
+                          rusage.ru_stime,
+                          get_max_rss(rusage))
+    return proc.returncode, output, errors[0], usage
@@ -0,0 +1,134 @@
+"""Progress of a run driven by job completion events."""
+import collections
+import sys
+import threading
+import time
+
+import cpp_static_analyzer.compile_db as cdb
+import cpp_static_analyzer.console as con
+
+# Seconds of completions used to measure throughput.
+_WINDOW = 30.0
+
+# Minimum seconds between two redraws of the progress line.
+_REDRAW_INTERVAL = 0.1
+
+# Seconds between two progress logs when stderr is not a terminal.
+_LOG_INTERVAL = 10.0
+
+
+def format_duration(seconds: float):
+    """Format seconds as H:MM:SS or M:SS."""
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours > 0:
+        return f'{hours}:{minutes:02}:{seconds:02}'
+    return f'{minutes}:{seconds:02}'
+
+
+class ProgressReporter:
+    """Report completed, running and failed entries, throughput and ETA.
+
+    Progress is updated by completion events. The ETA weights remaining
+    entries by their duration history, so heavy entries still running
+    keep it from reaching zero early. On a terminal the progress line is
+    redrawn in place, otherwise a line is logged periodically.
+    """
+
+    def __init__(self, cmd_mgr, history=None, interactive: bool = None,
+                 clock=time.monotonic):
+        self._cmd_mgr = cmd_mgr
+        self._interactive = sys.stderr.isatty() if interactive is None \
+            else interactive
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._completed = 0
+        self._failed = 0
+        self._done_cost = 0.0
+        self._default_cost = 1.0
+        if history is not None:
+            self._default_cost = history.get_default_estimate()
+        # Costs are taken before the run records new durations.
+        self._costs = {}
+        self._total_cost = None
+        if cmd_mgr.is_loaded():
+            commands = cmd_mgr.get_commands()
+            for idx in cmd_mgr.get_selected_indices():
+                key = cdb.get_entry_key(commands[idx])
+                self._costs[key] = self._default_cost if history is None \
+                    else history.get(key) or self._default_cost
+            self._total_cost = sum(self._costs.values())
+        self._samples = collections.deque([(clock(), 0, 0.0)])
+        self._last_output = None
+        self._last_completed = None
+        self._line_length = 0
+
+    def _get_rates(self, now: float):
+        """Get (entries, cost) per second over the window."""
+        while len(self._samples) > 1 and \
+                now - self._samples[1][0] >= _WINDOW:
+            self._samples.popleft()
+        start_time, completed, done_cost = self._samples[0]
+        elapsed = now - start_time
+        if elapsed <= 0.0:
+            return 0.0, 0.0
+        return (self._completed - completed) / elapsed, \
+            (self._done_cost - done_cost) / elapsed
+
+    def get_message(self, now: float = None):
+        """Get progress line."""
+        now = self._clock() if now is None else now
+        total = len(self._cmd_mgr)
+        running = max(0, self._cmd_mgr.get_current_index() - self._completed)
+        rate, cost_rate = self._get_rates(now)
+
+        if self._cmd_mgr.is_loaded() and total > 0:
+            msg = f'Processing files: {self._completed}/{total} ' \
+                f'({self._completed / total * 100:.1f}%)'
+        else:
+            msg = f'Processing files: {self._completed}'
+        msg += f', {running} running, {self._failed} failed, ' \
+            f'{rate:.1f} files/s'
+        remaining = 0.0 if self._total_cost is None else \
+            max(0.0, self._total_cost - self._done_cost)
+        if remaining > 0.0 and cost_rate > 0.0 and self._completed < total:
+            msg += f', ETA {format_duration(remaining / cost_rate)}'
+        return msg
+
+    def _emit(self, now: float, final: bool = False):
+        if final and not self._interactive and \
+                self._completed == self._last_completed:
+            return
+        msg = self.get_message(now)
+        if self._interactive:
+            padding = ' ' * max(0, self._line_length - len(msg))
+            con.error(msg + padding, end='\n' if final else '\r')
+            self._line_length = len(msg)
+        else:
+            con.error(msg)
+        self._last_output = now
+        self._last_completed = self._completed
+
+    def add_job(self, job):
+        """Account a completed job and update progress."""
+        if job.is_duplicate():
+            return
+        with self._lock:
+            now = self._clock()
+            self._completed += 1
+            if job.get_failure() is not None:
+                self._failed += 1
+            self._done_cost += self._costs.get(job.get_entry().get_key(),
+                                               self._default_cost)
+            self._samples.append((now, self._completed, self._done_cost))
+
+            interval = _REDRAW_INTERVAL if self._interactive \
+                else _LOG_INTERVAL
+            if self._last_output is None or \
+                    now - self._last_output >= interval:
+                self._emit(now)
+
+    def close(self):
+        """Report final progress."""
+        with self._lock:
+            self._emit(self._clock(), final=True)
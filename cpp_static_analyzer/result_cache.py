@@ -0,0 +1,172 @@
+"""Content-addressed cache of clang-tidy results."""
+import functools
+import hashlib
+import json
+import os
+import os.path
+import subprocess as sproc
+import tempfile
+import threading
+
+import cpp_static_analyzer.console as con
+
+_CACHE_SUFFIX = '.json'
+
+# Eviction trims the cache below this fraction of the limit so that it is
+# not triggered again by the very next insertion.
+_LOW_WATER_MARK = 0.9
+
+
+@functools.lru_cache(maxsize=None)
+def get_clang_tidy_version(clang_tidy: str):
+    """Get version string of clang-tidy executable."""
+    try:
+        proc = sproc.run([clang_tidy, '--version'],
+                         stdout=sproc.PIPE,
+                         stderr=sproc.PIPE,
+                         text=True,
+                         check=False)
+    except OSError:
+        con.trace(f'Cannot query version of {clang_tidy}.')
+        return ''
+    return proc.stdout.strip()
+
+
+def hash_file(path: str):
+    """Get SHA-256 digest of file content, or '' if not readable."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+    except OSError:
+        return ''
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """On-disk result cache with size-bounded LRU eviction.
+
+    Entries are stored as `<key[:2]>/<key>.json`. The access time of an
+    entry is refreshed on every hit and used as eviction order.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        self._directory = directory
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._file_hashes = {}
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, _, size in self._list_entries())
+
+    def _list_entries(self):
+        for root, _, files in os.walk(self._directory):
+            for file_name in files:
+                if not file_name.endswith(_CACHE_SUFFIX):
+                    continue
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_atime, stat.st_size
+
+    def _entry_path(self, key: str):
+        return os.path.join(self._directory, key[:2], key + _CACHE_SUFFIX)
+
+    def hash_file(self, path: str):
+        """Get file digest, memoized for the lifetime of the cache object."""
+        digest = self._file_hashes.get(path)
+        if digest is None:
+            digest = hash_file(path)
+            with self._lock:
+                self._file_hashes[path] = digest
+        return digest
+
+    def invalidate(self, paths):
+        """Forget memoized digests of changed files."""
+        with self._lock:
+            for path in paths:
+                self._file_hashes.pop(path, None)
+
+    def make_key(self, version: str, fingerprint: str, input_path: str,
+                 arguments, dependencies):
+        """Compose cache key from everything affecting the result."""
+        digest = hashlib.sha256()
+        for part in (version, fingerprint, input_path,
+                     self.hash_file(input_path)):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        for argument in arguments:
+            digest.update(argument.encode('utf-8'))
+            digest.update(b'\0')
+        for dependency in dependencies:
+            digest.update(dependency.encode('utf-8'))
+            digest.update(b'\0')
+            digest.update(self.hash_file(dependency).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """Get cached (stdout, stderr), or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                record = json.load(file)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self._misses += 1
+            return None
+
+        with self._lock:
+            self._hits += 1
+        return record['stdout'], record['stderr']
+
+    def put(self, key: str, stdout: str, stderr: str):
+        """Store result and evict old entries when over size limit."""
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        content = json.dumps({'stdout': stdout, 'stderr': stderr})
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(content)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += size
+            over_limit = self._size > self._max_size
+        if over_limit:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until under size limit."""
+        with self._lock:
+            entries = sorted(self._list_entries(), key=lambda item: item[1])
+            size = sum(item[2] for item in entries)
+            target_size = self._max_size * _LOW_WATER_MARK
+            for path, _, entry_size in entries:
+                if size <= target_size:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                size -= entry_size
+            self._size = size
+
+    def get_hits(self):
+        """Get number of cache hits."""
+        return self._hits
+
+    def get_misses(self):
+        """Get number of cache misses."""
+        return self._misses
+
+    def get_size(self):
+        """Get total size of cached entries in bytes."""
+        return self._size
@@ -0,0 +1,182 @@
+"""SQLite store of per-unit status, timings and diagnostics."""
+import json
+import sqlite3
+import threading
+import time
+
+import cpp_static_analyzer.batch_queue as bq
+import cpp_static_analyzer.console as con
+import cpp_static_analyzer.diagnostics as diag
+
+# Maximum number of queued jobs written in one transaction.
+_BATCH_SIZE = 512
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS units (
+    run_id INTEGER NOT NULL,
+    unit TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL,
+    diagnostics INTEGER NOT NULL,
+    returncode INTEGER,
+    timed_out INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS diagnostics (
+    run_id INTEGER NOT NULL,
+    unit TEXT NOT NULL,
+    file TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    severity TEXT NOT NULL,
+    check_name TEXT NOT NULL,
+    message TEXT NOT NULL,
+    notes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS units_run ON units (run_id, unit);
+CREATE INDEX IF NOT EXISTS diagnostics_file
+    ON diagnostics (run_id, file, check_name);
+CREATE INDEX IF NOT EXISTS diagnostics_check
+    ON diagnostics (run_id, check_name, file);
+'''
+
+# Column of every supported grouping.
+GROUPS = {'check': 'check_name',
+          'file': 'file',
+          'severity': 'severity',
+          'unit': 'unit'}
+
+
+def _connect(path: str):
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = NORMAL')
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+class ResultStore:
+    """Record analysis results of a run in a SQLite database.
+
+    Workers only parse their job output and enqueue rows. A dedicated
+    writer thread owns the connection and inserts queued rows in batched
+    transactions, so workers never contend on the database.
+    """
+
+    _path = ''
+    _run_id = 0
+    _queue = None
+    _thread = None
+
+    def __init__(self, path: str):
+        self._path = path
+        with _connect(path) as connection:
+            cursor = connection.execute(
+                'INSERT INTO runs (started) VALUES (?)', (time.time(),))
+            self._run_id = cursor.lastrowid
+        connection.close()
+
+        self._queue = bq.BatchQueue(_BATCH_SIZE)
+        self._thread = threading.Thread(target=self._write_rows)
+        self._thread.start()
+
+    def get_run_id(self):
+        """Get id of the current run."""
+        return self._run_id
+
+    def add_job(self, job):
+        """Queue status and diagnostics of a completed job."""
+        unit = job.get_entry().get_input_path()
+        diagnostics = []
+        for diagnostic in diag.parse_diagnostics(job.get_result() or ''):
+            diagnostics.append((self._run_id, unit,
+                                diagnostic.get_file(),
+                                diagnostic.get_line(),
+                                diagnostic.get_column(),
+                                diagnostic.get_severity(),
+                                diagnostic.get_check(),
+                                diagnostic.get_message(),
+                                json.dumps(diagnostic.get_notes())))
+
+        failure = job.get_failure()
+        returncode, timed_out = 0, False
+        if failure is not None:
+            status = 'failed'
+            returncode, timed_out = failure['returncode'], \
+                failure['timed_out']
+        elif job.is_cached():
+            status = 'cached'
+        else:
+            status = 'analyzed'
+        self._queue.put(((self._run_id, unit, status, job.get_duration(),
+                          len(diagnostics), returncode, int(timed_out)),
+                         diagnostics))
+
+    def _write_rows(self):
+        connection = _connect(self._path)
+        batch = self._queue.get_batch()
+        while batch is not None:
+            with connection:
+                connection.executemany(
+                    'INSERT INTO units (run_id, unit, status, duration, '
+                    'diagnostics, returncode, timed_out) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [unit for unit, _ in batch])
+                connection.executemany(
+                    'INSERT INTO diagnostics VALUES '
+                    '(?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [row for _, rows in batch for row in rows])
+            batch = self._queue.get_batch()
+
+        with connection:
+            connection.execute('UPDATE runs SET finished = ? WHERE id = ?',
+                               (time.time(), self._run_id))
+        connection.close()
+
+    def close(self):
+        """Write remaining rows and finish the run."""
+        self._queue.close()
+        self._thread.join()
+
+
+def get_latest_run(connection):
+    """Get id of the latest run, or None if the store is empty."""
+    row = connection.execute('SELECT MAX(id) FROM runs').fetchone()
+    return row[0]
+
+
+def query(path: str,
+          run_id: int = None,
+          check: str = '',
+          file: str = '',
+          group_by: str = 'check'):
+    """Count diagnostics of a run grouped by a column.
+
+    check and file are GLOB patterns. Return (run id, [(group, count)])
+    ordered by descending count.
+    """
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        if run_id is None:
+            run_id = get_latest_run(connection)
+
+        sql = f'SELECT {GROUPS[group_by]}, COUNT(*) FROM diagnostics ' \
+            'WHERE run_id = ?'
+        parameters = [run_id]
+        if check != '':
+            sql += ' AND check_name GLOB ?'
+            parameters.append(check)
+        if file != '':
+            sql += ' AND file GLOB ?'
+            parameters.append(file)
+        sql += ' GROUP BY 1 ORDER BY 2 DESC, 1'
+
+        con.trace(f'Query: {sql} {parameters}')
+        rows = connection.execute(sql, parameters).fetchall()
+    finally:
+        connection.close()
+    return run_id, rows
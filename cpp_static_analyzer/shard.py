@@ -0,0 +1,147 @@
+"""Deterministic cost-balanced sharding and merging of shard outputs."""
+import heapq
+import json
+import os
+import os.path
+import shutil
+
+import cpp_static_analyzer.console as con
+import cpp_static_analyzer.dependency as dep
+import cpp_static_analyzer.failures as fl
+import cpp_static_analyzer.history as hist
+
+SUMMARY_FILE = '.summary.json'
+DURATIONS_FILE = '.durations.json'
+
+
+def parse_shard(text: str):
+    """Parse 'i/N' (1 <= i <= N) into zero based (index, count)."""
+    index, separator, count = text.partition('/')
+    if separator == '' or not index.isdigit() or not count.isdigit():
+        raise ValueError(f'Shard {text} must be i/N.')
+    index, count = int(index), int(count)
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f'Shard {text} must satisfy 1 <= i <= N.')
+    return index - 1, count
+
+
+def _get_size(path: str):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def estimate_size_costs(entries, path_converter: dict):
+    """Estimate cost of entries as size of source plus included headers."""
+    scanner = dep.DependencyScanner()
+    sizes = {}
+    costs = []
+    for entry in entries:
+        source, _, quote_dirs, angle_dirs = \
+            dep.get_translation_unit(entry, path_converter)
+        cost = 0
+        for path in [source] + scanner.get_dependencies(source, quote_dirs,
+                                                        angle_dirs):
+            if path not in sizes:
+                sizes[path] = _get_size(path)
+            cost += sizes[path]
+        costs.append(cost)
+    return costs
+
+
+def estimate_duration_costs(entries, history: hist.DurationHistory):
+    """Estimate cost of entries from recorded durations."""
+    return history.estimate([entry.get_key() for entry in entries])
+
+
+def partition(costs, count: int):
+    """Assign items to count shards, return shard id of every item.
+
+    Items are placed longest-first on the least loaded shard. Equal loads
+    are broken by item count, then by item and shard order, so every
+    runner computes the same assignment from the same costs.
+    """
+    shards = [(0, 0, shard_id) for shard_id in range(count)]
+    assignment = [0] * len(costs)
+    for idx in hist.order_longest_first(costs):
+        load, items, shard_id = heapq.heappop(shards)
+        assignment[idx] = shard_id
+        heapq.heappush(shards, (load + costs[idx], items + 1, shard_id))
+    return assignment
+
+
+def write_summary(directory: str, summary: dict):
+    """Write summary of a shard run."""
+    with open(os.path.join(directory, SUMMARY_FILE), 'w',
+              encoding='utf-8') as file:
+        json.dump(summary, file, indent=2)
+
+
+def _read_json(path: str):
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        con.trace(f'Cannot read {path}.')
+        return None
+
+
+def _copy_files(source_dir: str, output_dir: str):
+    """Copy result files of a directory, return number of copied files."""
+    copied = 0
+    for name in os.listdir(source_dir):
+        path = os.path.join(source_dir, name)
+        if name.startswith('.') or not os.path.isfile(path):
+            continue
+        shutil.copyfile(path, os.path.join(output_dir, name))
+        copied += 1
+    return copied
+
+
+def merge_shards(shard_dirs, output_dir: str):
+    """Merge outputs, errors, durations and failures of shard directories.
+
+    Return combined summary.
+    """
+    os.makedirs(os.path.join(output_dir, 'errors'), exist_ok=True)
+    durations = {}
+    failures = []
+    summaries = []
+    files = 0
+    for shard_dir in shard_dirs:
+        files += _copy_files(shard_dir, output_dir)
+        error_dir = os.path.join(shard_dir, 'errors')
+        if os.path.isdir(error_dir):
+            _copy_files(error_dir, os.path.join(output_dir, 'errors'))
+
+        shard_durations = _read_json(os.path.join(shard_dir, DURATIONS_FILE))
+        if shard_durations is not None:
+            durations.update(shard_durations)
+
+        shard_failures = _read_json(os.path.join(shard_dir,
+                                                 fl.MANIFEST_FILE))
+        if shard_failures is not None:
+            failures.extend(shard_failures)
+
+        summary = _read_json(os.path.join(shard_dir, SUMMARY_FILE))
+        if summary is not None:
+            summaries.append(summary)
+
+    with open(os.path.join(output_dir, DURATIONS_FILE), 'w',
+              encoding='utf-8') as file:
+        json.dump(durations, file, separators=(',', ':'))
+    with open(os.path.join(output_dir, fl.MANIFEST_FILE), 'w',
+              encoding='utf-8') as file:
+        json.dump(failures, file, indent=2)
+
+    elapsed = [summary['elapsed'] for summary in summaries]
+    combined = {'shards': len(summaries),
+                'entries': sum(summary['entries'] for summary in summaries),
+                'failed': sum(summary['failed'] for summary in summaries),
+                'files': files,
+                'makespan': max(elapsed, default=0.0),
+                'mean_elapsed': sum(elapsed) / len(elapsed)
+                if elapsed else 0.0}
+    write_summary(output_dir, combined)
+    return combined
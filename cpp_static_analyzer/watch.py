@@ -0,0 +1,184 @@
+"""Watch sources and headers and report changed files."""
+import ctypes
+import errno
+import os
+import os.path
+import select
+import struct
+import sys
+import time
+
+import cpp_static_analyzer.console as con
+import cpp_static_analyzer.include_index as ii
+
+# Seconds between two scans of the stat watcher.
+_POLL_INTERVAL = 0.5
+
+# inotify events of a file written, replaced or removed.
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_Q_OVERFLOW = 0x4000
+_IN_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | \
+    _IN_DELETE
+
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct('iIII')
+
+
+class StatWatcher:
+    """Detect changed files by comparing their stat in periodic scans."""
+
+    def __init__(self, paths, interval: float = _POLL_INTERVAL):
+        self._interval = interval
+        self._stats = {}
+        self.set_paths(paths)
+
+    def set_paths(self, paths):
+        """Watch paths, keeping the last known stat of watched ones."""
+        stats = self._stats
+        self._stats = {path: stats[path] if path in stats else ii.stat_file(path)
+                       for path in paths}
+
+    def _scan(self):
+        changed = set()
+        for path, record in self._stats.items():
+            stat = ii.stat_file(path)
+            if stat != record:
+                self._stats[path] = stat
+                changed.add(path)
+        return changed
+
+    def wait(self, timeout: float = None):
+        """Wait up to timeout seconds for changes, return changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed = self._scan()
+        while not changed:
+            delay = self._interval
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+                if delay <= 0.0:
+                    break
+            time.sleep(delay)
+            changed = self._scan()
+        return changed
+
+    def close(self):
+        """Stop watching."""
+        self._stats = {}
+
+
+class InotifyWatcher:
+    """Detect changed files with inotify watches of their directories.
+
+    Directories are watched rather than files, so files replaced by an
+    editor saving through a rename stay watched.
+    """
+
+    def __init__(self, paths):
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self._paths = set()
+        self._directories = {}
+        self._watches = {}
+        try:
+            self.set_paths(paths)
+        except OSError:
+            self.close()
+            raise
+
+    def set_paths(self, paths):
+        """Watch paths, adding watches of new directories."""
+        self._paths = set(paths)
+        for path in self._paths:
+            directory = os.path.dirname(path)
+            if directory in self._directories:
+                continue
+            descriptor = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), _IN_MASK)
+            if descriptor >= 0:
+                self._directories[directory] = descriptor
+                self._watches[descriptor] = directory
+                continue
+            code = ctypes.get_errno()
+            if code in (errno.ENOSPC, errno.ENOMEM):
+                raise OSError(code, os.strerror(code))
+            # Missing directories are picked up by later updates.
+            con.trace(f'Cannot watch {directory}: {os.strerror(code)}.')
+
+    def _read_events(self):
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                descriptor, mask, _, length = \
+                    _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & _IN_Q_OVERFLOW:
+                    # Events were lost, report every watched file.
+                    changed.update(self._paths)
+                    continue
+                directory = self._watches.get(descriptor)
+                if directory is None:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name))
+                if path in self._paths:
+                    changed.add(path)
+
+    def wait(self, timeout: float = None):
+        """Wait up to timeout seconds for changes, return changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = None
+            if deadline is not None:
+                delay = max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self._fd], [], [], delay)
+            if not readable:
+                return set()
+            changed = self._read_events()
+            if changed or deadline is not None and \
+                    time.monotonic() >= deadline:
+                return changed
+
+    def close(self):
+        """Stop watching."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def make_watcher(paths):
+    """Make inotify watcher where available, stat watcher otherwise."""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError) as e:
+            con.trace(f'Cannot use inotify: {e}.')
+    return StatWatcher(paths)
+
+
+def wait_for_changes(watcher, debounce: float):
+    """Wait for changes and return them once debounce seconds are quiet.
+
+    Bursts of saves, as written by editors and code generators, are
+    reported together.
+    """
+    changed = watcher.wait()
+    while True:
+        more = watcher.wait(debounce)
+        if not more:
+            return changed
+        changed |= more
@@ -0,0 +1,78 @@
+"""Test cases for memory-aware admission."""
+import threading
+import time
+import cpp_static_analyzer.admission as adm
+import cpp_static_analyzer.history as hist
+
+
+def test_estimate():
+    """Unknown entries are predicted from history or the budget share."""
+    history = hist.MemoryHistory()
+    assert adm.MemoryBudget(800, history, 4).estimate(['a']) == 200, \
+        'Empty history must share the budget evenly.'
+
+    history.record('a', 100)
+    history.record('b', 300)
+    history.record('c', 500)
+    budget = adm.MemoryBudget(800, history, 4)
+    assert budget.estimate(['a']) == 100, 'Wrong recorded estimate.'
+    assert budget.estimate(['unknown']) == 300, 'Median must be used.'
+    assert budget.estimate(['a', 'c']) == 500, \
+        'Batch must be predicted at its largest entry.'
+
+
+def test_admission():
+    """Processes wait while the budget is exhausted."""
+    history = hist.MemoryHistory()
+    history.record('small', 300)
+    history.record('large', 600)
+    budget = adm.MemoryBudget(1000, history)
+
+    first = budget.acquire(['large'])
+    second = budget.acquire(['small'])
+    admitted = threading.Event()
+
+    def acquire_large():
+        budget.release(budget.acquire(['large']))
+        admitted.set()
+
+    thread = threading.Thread(target=acquire_large)
+    thread.start()
+    time.sleep(0.05)
+    assert not admitted.is_set(), 'Process over budget must wait.'
+    budget.release(first)
+    assert admitted.wait(5.0), 'Process must be admitted once it fits.'
+    thread.join()
+    budget.release(second)
+
+    assert budget.get_peak() == 900, 'Wrong predicted peak.'
+    assert budget.acquire(['huge']) == 450, 'Wrong default estimate.'
+
+
+def test_oversized_process():
+    """A process larger than the budget runs alone."""
+    history = hist.MemoryHistory()
+    history.record('huge', 5000)
+    budget = adm.MemoryBudget(1000, history)
+    budget.release(budget.acquire(['huge']))
+
+
+def test_fractional_reservations():
+    """Rounding remainders of fractional estimates never block admission."""
+    history = hist.MemoryHistory()
+    budget = adm.MemoryBudget(16 * 1024 ** 3, history, 3)
+    reserved = [budget.acquire([key]) for key in ('a', 'b', 'c')]
+    for value in reserved:
+        budget.release(value)
+
+    history.record('huge', 32 * 1024 ** 3)
+    admitted = threading.Event()
+
+    def acquire_huge():
+        budget.release(budget.acquire(['huge']))
+        admitted.set()
+
+    thread = threading.Thread(target=acquire_huge, daemon=True)
+    thread.start()
+    assert admitted.wait(5.0), 'Idle budget must admit a process over it.'
+    thread.join()
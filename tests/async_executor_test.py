@@ -0,0 +1,33 @@
+"""Test cases for asynchronous executor."""
+import asyncio
+import os
+import pytest
+import cpp_static_analyzer.async_executor as ae
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.config as cfg
+
+
+@pytest.mark.parametrize('compile_commands', [3], indirect=True)
+def test_async_executor(tmp_path, fake_clang_tidy, compile_commands):
+    """Run all jobs with bounded concurrency."""
+    config = cfg.Config({'ClangTidy': fake_clang_tidy})
+    cmd_mgr = cm.CommandManager(compile_commands)
+    out_dir = tmp_path / 'out'
+    err_dir = out_dir / 'errors'
+    err_dir.mkdir(parents=True)
+
+    jobs = []
+    cmd_mgr.add_completion_listener(jobs.append)
+    completions = []
+    executor = ae.AsyncExecutor(cmd_mgr, config, 2, str(out_dir),
+                                str(err_dir), completions.append)
+    assert asyncio.run(executor.run()) == 0, 'No job must fail.'
+    assert completions == [1, 2, 3], 'Every job must report completion.'
+
+    outputs = sorted(name for name in os.listdir(out_dir)
+                     if name != 'errors')
+    assert len(outputs) == 3, 'Must write one output per file.'
+    assert len(os.listdir(err_dir)) == 3, 'Must write one error per file.'
+    if hasattr(os, 'wait4'):
+        assert all(job.get_usage().get_max_rss() for job in jobs), \
+            'Peak RSS of every process must be known.'
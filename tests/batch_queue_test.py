@@ -0,0 +1,14 @@
+"""Test cases for batch queue."""
+import cpp_static_analyzer.batch_queue as bq
+
+
+def test_batch_queue():
+    """Queued items are taken in bounded batches until closed."""
+    items = bq.BatchQueue(2)
+    for item in range(3):
+        items.put(item)
+    items.close()
+
+    assert items.get_batch() == [0, 1], 'Batch must be bounded.'
+    assert items.get_batch() == [2], 'Batch must stop at the close.'
+    assert items.get_batch() is None, 'Closed queue must end.'
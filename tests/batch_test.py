@@ -0,0 +1,87 @@
+"""Test cases for batched execution."""
+import threading
+import cpp_static_analyzer.batch as bt
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.config as cfg
+
+
+def test_split_output():
+    """Attribute source and header diagnostics to units."""
+    output = ('/s/common.h:1:1: warning: header [x]\n'
+              '/s/a.cpp:2:1: warning: a [x]\n'
+              'b.cpp:3:1: warning: b [x]\n'
+              '/s/other.h:1:1: warning: other [x]\n')
+    units = [('/s/a.cpp', '/s'), ('/s/b.cpp', '/s'), ('/s/c.cpp', '/s')]
+    dependencies = [{'/s/common.h'}, set(), {'/s/common.h'}]
+    results = bt.split_output(output, units, dependencies.__getitem__)
+
+    assert results[0] == ('/s/common.h:1:1: warning: header [x]\n'
+                          '/s/a.cpp:2:1: warning: a [x]\n'
+                          '/s/other.h:1:1: warning: other [x]\n'), \
+        'Unknown header must go to the first unit.'
+    assert results[1] == 'b.cpp:3:1: warning: b [x]\n', \
+        'Relative path must match its unit.'
+    assert results[2] == '/s/common.h:1:1: warning: header [x]\n', \
+        'Header diagnostic must go to every including unit.'
+
+
+def test_split_output_directories():
+    """Relative paths are resolved against the directory of each unit."""
+    output = ('a.cpp:1:1: warning: a [x]\n'
+              'b.cpp:1:1: warning: b [x]\n'
+              'inc/b.h:1:1: warning: header [x]\n')
+    units = [('a.cpp', '/s/one'), ('b.cpp', '/s/two')]
+    dependencies = [{'/s/one/inc/a.h'}, {'/s/two/inc/b.h'}]
+    results = bt.split_output(output, units, dependencies.__getitem__)
+
+    assert results[0] == 'a.cpp:1:1: warning: a [x]\n', \
+        'Source diagnostic must go to its directory.'
+    assert results[1] == ('b.cpp:1:1: warning: b [x]\n'
+                          'inc/b.h:1:1: warning: header [x]\n'), \
+        'Header must be resolved against the including unit.'
+
+
+def test_batch_sizer():
+    """Batch size follows observed per-file cost."""
+    sizer = bt.BatchSizer(16, 10.0)
+    assert sizer.get_size() == 1, 'First batch must measure one file.'
+    sizer.record(2.0, 1)
+    assert sizer.get_size() == 5, 'Must fill the target time.'
+    sizer.record(0.5, 5)
+    assert sizer.get_size() == 9, 'Estimate must be smoothed.'
+    assert sizer.get_size(remaining=6, num_of_jobs=3) == 2, \
+        'Tail must be spread over workers.'
+    sizer.record(0.0, 100)
+    assert sizer.get_size() == 16, 'Size must be capped.'
+
+
+def test_batch_executor(tmp_path, fake_clang_tidy, compile_commands):
+    """Analyze all entries in batches with per-unit results."""
+    config = cfg.Config({'ClangTidy': fake_clang_tidy})
+    cmd_mgr = cm.CommandManager(compile_commands)
+    out_dir = tmp_path / 'out'
+    err_dir = out_dir / 'errors'
+    err_dir.mkdir(parents=True)
+
+    jobs = []
+    cmd_mgr.add_completion_listener(jobs.append)
+    executor = bt.BatchExecutor(cmd_mgr, config, 2,
+                                bt.BatchSizer(4, 10.0, 0.1))
+    threads = [threading.Thread(target=executor.job,
+                                args=(str(out_dir), str(err_dir)))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert executor.get_failed_count() == 0, 'No batch must fail.'
+    assert len(jobs) == 5, 'Every entry must complete.'
+    for job in jobs:
+        source = job.get_entry().get_input_path()
+        assert f'{source}:1:1: warning: fake' in job.get_result(), \
+            'Source diagnostic must be attributed.'
+        assert 'common.h:1:1: warning: header' in job.get_result(), \
+            'Header diagnostic must be attributed to every includer.'
+        assert f'processing {tmp_path / source}' in job.get_error(), \
+            'Error line must be attributed.'
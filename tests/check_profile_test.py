@@ -0,0 +1,76 @@
+"""Test cases for per-check profiling."""
+import json
+import cpp_static_analyzer.check_profile as chp
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.compile_db as cdb
+
+
+def _profile(file: str, timings: dict):
+    """Profile as stored by clang-tidy --store-check-profile."""
+    profile = {}
+    for check, seconds in timings.items():
+        profile[f'time.clang-tidy.{check}.wall'] = seconds
+        profile[f'time.clang-tidy.{check}.user'] = seconds / 2
+        profile[f'time.clang-tidy.{check}.sys'] = 0.0
+    return {'file': file, 'timestamp': '2026-01-01 00:00:00',
+            'profile': profile}
+
+
+def test_parse_profile():
+    """Wall time is preferred over user and system time."""
+    file, timings = chp.parse_profile(_profile('/s/a.cpp', {'x-a': 0.5}))
+    assert file == '/s/a.cpp', 'Wrong file.'
+    assert timings == {'x-a': 0.5}, 'Wall time must be used.'
+
+    _, timings = chp.parse_profile({'profile': {
+        'time.clang-tidy.x-b.user': 0.25,
+        'time.clang-tidy.x-b.sys': 0.25}})
+    assert timings == {'x-b': 0.5}, 'CPU time must be the fallback.'
+
+
+def test_check_profile(tmp_path):
+    """Aggregate stored profiles into a ranked report."""
+    profile_dir = tmp_path / chp.PROFILE_DIR
+    (profile_dir / 'stale').mkdir(parents=True)
+    (profile_dir / 'stale.json').write_text('{}')
+    chp.clear_profiles(str(profile_dir))
+    assert not (profile_dir / 'stale.json').exists(), \
+        'Stale profile must be removed.'
+
+    for name, timings in (('a', {'x-cheap': 0.1, 'x-costly': 1.0}),
+                          ('b', {'x-cheap': 0.1, 'x-costly': 3.0})):
+        (profile_dir / f'{name}.json').write_text(
+            json.dumps(_profile(f'/s/{name}.cpp', timings)))
+    (profile_dir / 'broken.json').write_text('{')
+
+    profile = chp.CheckProfile()
+    assert profile.load_directory(str(profile_dir)) == 2, \
+        'Broken profile must be skipped.'
+    rows = profile.get_rows()
+    assert [row[0] for row in rows] == ['x-costly', 'x-cheap'], \
+        'Costliest check must rank first.'
+    check, total, mean, maximum, saving = rows[0]
+    assert (total, mean, maximum) == (4.0, 2.0, 3.0), 'Wrong timings.'
+    assert abs(saving - 4.0 / 4.2) < 1e-9, 'Wrong saving.'
+
+    report = tmp_path / 'profile.txt'
+    profile.write_report(str(report), 10.0)
+    lines = report.read_text().splitlines()
+    assert lines[0].startswith('2 translation units'), 'Wrong header.'
+    assert lines[3].split()[:2] == ['1', check], 'Wrong first row.'
+
+
+def test_analysis_time():
+    """Cached and duplicate jobs add no analysis time."""
+    entry = cdb.Entry({'directory': '/s', 'file': 'a.cpp',
+                       'arguments': ['c++', '-c', 'a.cpp']})
+    profile = chp.CheckProfile()
+    for cached, duplicate in ((False, False), (True, False),
+                              (False, True)):
+        job = cm.Job(0, entry, [])
+        job.set_result('', '', cached)
+        job.set_duration(2.0)
+        job.set_duplicate(duplicate)
+        profile.add_job(job)
+    assert profile.get_analysis_time() == 2.0, \
+        'Only the analyzed job must be accounted.'
@@ -1,5 +1,12 @@
 """Test cases for command manager,"""
+import json
+import os
+import sys
+import time
 import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.config as cfg
+import cpp_static_analyzer.failures as fl
+import cpp_static_analyzer.result_cache as rc
 
 
 def test_command_manager():
@@ -18,3 +25,187 @@ def test_command_manager():
 
     ii = cmd_mgr.next_index()
     assert ii == -1, 'Must be -1.'
+
+
+def test_streaming_command_manager():
+    """Streaming command manager parses entries on demand."""
+    cmd_mgr = cm.CommandManager('tests/compile_commands.json', stream=True)
+    assert len(cmd_mgr) == 0, 'Nothing must be parsed yet.'
+    assert cmd_mgr.get_time_to_first_dispatch() is None, \
+        'Nothing must be dispatched yet.'
+
+    indices = []
+    ii = cmd_mgr.next_index()
+    while ii >= 0:
+        assert 'file' in cmd_mgr[ii], 'Entry must be available.'
+        cmd_mgr.release(ii)
+        indices.append(ii)
+        ii = cmd_mgr.next_index()
+
+    assert indices == [0, 1, 2], 'Must dispatch three entries in order.'
+    assert cmd_mgr.is_loaded(), 'Database must be fully parsed.'
+    assert len(cmd_mgr) == 3, 'Must have three commands.'
+    assert cmd_mgr.get_time_to_first_dispatch() is not None, \
+        'First dispatch must be recorded.'
+
+
+def test_streaming_truncated(tmp_path):
+    """Streaming stops at a malformed entry and records the error."""
+    path = tmp_path / 'compile_commands.json'
+    path.write_text('[{"directory": "/s", "command": "c++ -c a.cpp", '
+                    '"file": "a.cpp"}, {"file": ')
+    cmd_mgr = cm.CommandManager(str(path), stream=True)
+    assert cmd_mgr.next_index() == 0, 'Complete entry must be dispatched.'
+    assert cmd_mgr.get_load_error() is None, 'No error yet.'
+    assert cmd_mgr.next_index() == -1, 'Dispatching must stop.'
+    assert cmd_mgr.next_index() == -1, 'Dispatching must stay stopped.'
+    assert str(path) in cmd_mgr.get_load_error(), 'Error must be recorded.'
+
+
+def test_deduplicate(tmp_path):
+    """Entries with identical effective invocations run once."""
+    arguments = ['c++', '-O2', '-c', 'a.cpp']
+    commands = [
+        {'directory': '/work', 'arguments': arguments, 'file': 'a.cpp'},
+        {'directory': '/work', 'arguments': arguments + ['-Wall'],
+         'file': 'a.cpp', 'output': 'other.o'},
+        {'directory': '/work', 'arguments': arguments + ['-DX'],
+         'file': 'a.cpp'},
+        {'directory': '/work', 'arguments': arguments, 'file': 'a.cpp'}
+    ]
+    path = tmp_path / 'compile_commands.json'
+    path.write_text(json.dumps(commands))
+
+    config = cfg.Config({})
+    cmd_mgr = cm.CommandManager(str(path))
+    assert cmd_mgr.deduplicate(config) == 2, 'Must save two invocations.'
+    assert cmd_mgr.get_selected_indices() == [0, 2], \
+        'First entry of each invocation must be dispatched.'
+
+    completed = []
+    cmd_mgr.add_completion_listener(
+        lambda job: completed.append(job.get_index()))
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+
+    index = cmd_mgr.next_index()
+    while index >= 0:
+        job = cmd_mgr.prepare_job(index, config)
+        job.set_result(f'result {index}', '')
+        cmd_mgr.complete_job(job, str(out_dir), str(out_dir))
+        index = cmd_mgr.next_index()
+
+    assert sorted(completed) == [0, 1, 2, 3], \
+        'Every entry must complete.'
+
+
+def test_deduplicate_directories(tmp_path):
+    """Same arguments in different directories are different units."""
+    commands = [{'directory': f'/p/{name}',
+                 'arguments': ['c++', '-O2', '-c', 'a.cpp'],
+                 'file': 'a.cpp'} for name in ('x', 'y')]
+    path = tmp_path / 'compile_commands.json'
+    path.write_text(json.dumps(commands))
+
+    cmd_mgr = cm.CommandManager(str(path))
+    assert cmd_mgr.deduplicate(cfg.Config({})) == 0, \
+        'Entries of different directories must not be merged.'
+    assert cmd_mgr.get_selected_indices() == [0, 1], \
+        'Both entries must be dispatched.'
+
+
+def test_failure_policy(tmp_path):
+    """Failed entries are recorded and workers keep processing."""
+    tidy = tmp_path / 'flaky-clang-tidy'
+    tidy.write_text(f'#!{sys.executable}\n'
+                    'import os, sys, time\n'
+                    'source = sys.argv[sys.argv.index("--") - 1]\n'
+                    'if source.endswith("hang.cpp"):\n'
+                    '    os.system("sleep 30")\n'
+                    'if source.endswith("bad.cpp"):\n'
+                    '    sys.exit("bad.cpp:1:1: error: broken")\n'
+                    'print(f"{source}:1:1: warning: fake [fake-check]")\n')
+    os.chmod(tidy, 0o755)
+    path = tmp_path / 'compile_commands.json'
+    path.write_text(json.dumps([{'directory': str(tmp_path),
+                                 'arguments': ['c++', '-c', f'{name}.cpp'],
+                                 'file': f'{name}.cpp'}
+                                for name in ('hang', 'bad', 'good')]))
+    config = cfg.Config({'ClangTidy': str(tidy)})
+    cmd_mgr = cm.CommandManager(str(path))
+    cmd_mgr.set_failure_policy(0.5, 1)
+    manifest = fl.FailureManifest()
+    cmd_mgr.add_completion_listener(manifest.add_job)
+    (tmp_path / 'errors').mkdir()
+
+    start_time = time.perf_counter()
+    cmd_mgr.job(config, str(tmp_path), str(tmp_path / 'errors'))
+    assert time.perf_counter() - start_time < 10.0, \
+        'Process group must be killed.'
+    assert cmd_mgr.get_completed_count() == 3, 'Every entry must complete.'
+
+    manifest.write(str(tmp_path / fl.MANIFEST_FILE))
+    failures = json.loads((tmp_path / fl.MANIFEST_FILE).read_text())
+    assert [record['file'] for record in failures] == \
+        ['hang.cpp', 'bad.cpp'], 'Wrong failed entries.'
+    assert failures[0]['timed_out'] and failures[0]['attempts'] == 2, \
+        'Timeout must be retried.'
+    assert failures[1]['returncode'] == 1 and \
+        failures[1]['attempts'] == 1, 'Exit code must not be retried.'
+    assert failures[1]['stderr_tail'] == ['bad.cpp:1:1: error: broken'], \
+        'Wrong stderr tail.'
+
+
+def test_remove_stale_outputs(tmp_path):
+    """Re-analyzed entries producing no output leave no stale file."""
+    tidy = tmp_path / 'quiet-clang-tidy'
+    tidy.write_text('#!/bin/sh\n')
+    os.chmod(tidy, 0o755)
+    path = tmp_path / 'compile_commands.json'
+    path.write_text(json.dumps([{'directory': str(tmp_path),
+                                 'arguments': ['c++', '-c', 'a.cpp'],
+                                 'file': 'a.cpp'}]))
+    config = cfg.Config({'ClangTidy': str(tidy)})
+    output = tmp_path / cm.get_output_name('a.cpp')
+    output.write_text('a.cpp:1:1: warning: fixed [fake-check]\n')
+    (tmp_path / 'errors').mkdir()
+
+    cmd_mgr = cm.CommandManager(str(path))
+    cmd_mgr.job(config, str(tmp_path), str(tmp_path / 'errors'))
+    assert output.exists(), 'Outputs are kept by default.'
+
+    cmd_mgr.set_remove_stale_outputs(True)
+    cmd_mgr.select([0])
+    cmd_mgr.job(config, str(tmp_path), str(tmp_path / 'errors'))
+    assert not output.exists(), 'Stale output must be removed.'
+    assert cmd_mgr.get_completed_count() == 1, 'Selection resets count.'
+
+
+def test_invalidate(tmp_path, fake_clang_tidy, compile_commands):
+    """Changed files are hashed and scanned again after invalidation."""
+    config = cfg.Config({'ClangTidy': fake_clang_tidy})
+    cache = rc.ResultCache(str(tmp_path / 'cache'), 1 << 20)
+    cmd_mgr = cm.CommandManager(compile_commands, cache)
+    out_dir = tmp_path / 'out'
+    (out_dir / 'errors').mkdir(parents=True)
+    cmd_mgr.job(config, str(out_dir), str(out_dir / 'errors'))
+    assert cmd_mgr.prepare_job(0, config).is_cached(), 'Result is cached.'
+
+    header = tmp_path / 'common.h'
+    header.write_text('int y;\n')
+    cmd_mgr.invalidate([str(header)])
+    assert not cmd_mgr.prepare_job(0, config).is_cached(), \
+        'Changed header must miss the cache.'
+
+    source = tmp_path / 'a.cpp'
+    source.write_text('#include "common.h"\n#include "new.h"\n')
+    (tmp_path / 'new.h').write_text('int n;\n')
+    cmd_mgr.invalidate([str(source)])
+    assert not cmd_mgr.prepare_job(0, config).is_cached(), \
+        'Changed source must miss the cache.'
+    cmd_mgr.select([0])
+    cmd_mgr.job(config, str(out_dir), str(out_dir / 'errors'))
+    (tmp_path / 'new.h').write_text('int m;\n')
+    cmd_mgr.invalidate([str(tmp_path / 'new.h')])
+    assert not cmd_mgr.prepare_job(0, config).is_cached(), \
+        'New include must be scanned.'
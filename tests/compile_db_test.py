@@ -166,3 +166,144 @@ def test_filter_command(compile_command):
             f'Argument {filtered_command} must be filtered.'
         assert filtered_command.startswith('-W') is False, \
             f'Argument {filtered_command} must be filtered.'
+
+
+def test_streaming_loader():
+    """Streamed entries must match the loaded database."""
+    loaded = cdb.load_compile_commands('tests/compile_commands.json')
+    for chunk_size in (1, 17, 1 << 16):
+        streamed = list(cdb.iter_compile_commands(
+            'tests/compile_commands.json', chunk_size))
+        assert streamed == loaded, \
+            f'Streamed entries differ with chunk size {chunk_size}.'
+
+
+def test_streaming_loader_truncated(tmp_path):
+    """Truncated database must raise a decode error."""
+    path = tmp_path / 'truncated.json'
+    path.write_text('[{"file": "a.cpp"}, {"file": ')
+    with pytest.raises(json.JSONDecodeError):
+        list(cdb.iter_compile_commands(str(path), 4))
+
+
+def test_command_escapes():
+    """Escaped spaces and quotes do not split arguments."""
+    command_list = cdb.tokenize_command(
+        'c++ -DNAME=\\"a\\ b\\" \'-DX=1 2\' "-I/a b" -c x.cpp')
+    assert command_list == ['c++', '-DNAME=\\"a\\ b\\"', '\'-DX=1 2\'',
+                            '"-I/a b"', '-c', 'x.cpp'], \
+        f'Wrong arguments: {command_list}'
+
+
+def test_windows_command():
+    """Windows-style quoting keeps backslashes literal."""
+    command = ('"C:\\Program Files\\LLVM\\bin\\clang-cl.exe" '
+               '/I"C:\\third party\\include\\\\" /DX=\\"1\\" '
+               'C:\\src\\dir\\ /c C:\\src\\x.cpp')
+    assert cdb.is_windows_command(command), 'Must be a Windows command.'
+    command_list = cdb.tokenize_command(command)
+    assert command_list == ['"C:\\Program Files\\LLVM\\bin\\clang-cl.exe"',
+                            '/I"C:\\third party\\include\\\\"',
+                            '/DX=\\"1\\"',
+                            'C:\\src\\dir\\',
+                            '/c',
+                            'C:\\src\\x.cpp'], \
+        f'Wrong arguments: {command_list}'
+
+
+def test_batch_command_parser(compile_commands_json):
+    """Batch tokenization matches single entry tokenization."""
+    command_lists = cdb.get_commands(compile_commands_json)
+    assert command_lists[0] == cdb.get_command(compile_commands_json[0]), \
+        'Batch result must match single result.'
+    assert command_lists[1] == [], 'Entry without command must be empty.'
+
+
+def test_entry_key(compile_commands_json):
+    """Entry key can be computed without parsing the entry."""
+    for dictionary in compile_commands_json:
+        assert cdb.get_entry_key(dictionary) == \
+            cdb.Entry(dictionary).get_key(), 'Keys must match.'
+
+
+def test_write_compile_commands(tmp_path, compile_commands_json):
+    """Written entries load back unchanged."""
+    path = tmp_path / 'compile_commands.json'
+    for indent in (None, 2):
+        with open(path, 'w', encoding='utf-8') as file:
+            count = cdb.write_compile_commands(iter(compile_commands_json),
+                                               file, indent)
+        assert count == len(compile_commands_json), 'Wrong entry count.'
+        assert json.loads(path.read_text()) == compile_commands_json, \
+            'Entries must round trip.'
+
+    with open(path, 'w', encoding='utf-8') as file:
+        cdb.write_compile_commands([], file)
+    assert json.loads(path.read_text()) == [], 'Must write empty array.'
+
+
+def test_compiled_path_converter(path_converter):
+    """Compiled converter replaces the longest key at the first match."""
+    converter = cdb.PathConverter({'C:/src': 'X', 'C:/src/lib': 'Y',
+                                   'lib': 'Z'})
+    assert converter.convert('-IC:/src/lib/include') == '-IY/include', \
+        'Longest key must win.'
+    assert converter.convert('-IC:/srcs') == '-IXs', 'Wrong conversion.'
+    assert converter.convert('/opt/lib/C:/src') == '/opt/Z/C:/src', \
+        'First occurrence must win.'
+    assert converter == {'C:/src': 'X', 'C:/src/lib': 'Y', 'lib': 'Z'}, \
+        'Converter must keep its mapping.'
+
+    compiled = cdb.PathConverter(path_converter)
+    for path in ('/Users/nus/test/a.cpp', '/Users/nus/test/a.cpp', '-O2'):
+        assert compiled.convert(path) == \
+            cdb.convert_path(path, path_converter), \
+            'Compiled and plain converters must agree.'
+    assert compiled.get_cache_info().hits == 1, 'Must reuse conversion.'
+
+
+def test_compact_entry():
+    """Entries with the same flags share their argument prefix."""
+    dictionaries = [{'directory': '/src//project/',
+                     'command': f'c++ -O2 -Wall -DX -o {name}.o -c {name}.cpp',
+                     'file': f'{name}.cpp',
+                     'output': f'{name}.o'} for name in ('a', 'b')]
+    first, second = cdb.get_entries(dictionaries)
+    assert first.get_arguments() == ['c++', '-O2', '-DX', '-o', 'a.o',
+                                     '-c', 'a.cpp'], 'Wrong arguments.'
+    assert first.get_arguments() == \
+        cdb.Entry(dictionaries[0]).get_arguments(), \
+        'Batch and single loading must agree.'
+    assert first.get_directory() == '/src/project', 'Path must be normalized.'
+    assert first.get_directory() is second.get_directory(), \
+        'Directory must be shared.'
+    assert first._prefix is second._prefix, 'Prefix must be shared.'
+    assert not hasattr(first, '__dict__'), 'Entry must use slots.'
+
+
+def test_normal_path_interned():
+    """Normal paths skipping pathlib are shared between entries too."""
+    dictionaries = json.loads(json.dumps(
+        [{'directory': '/src/project', 'command': f'c++ -c {name}.cpp',
+          'file': f'{name}.cpp'} for name in ('a', 'b')]))
+    assert dictionaries[0]['directory'] is not \
+        dictionaries[1]['directory'], 'Loaded paths must be distinct.'
+    first, second = cdb.get_entries(dictionaries)
+    assert first.get_directory() is second.get_directory(), \
+        'Directory must be shared.'
+
+
+def test_load_shares_strings(tmp_path):
+    """Loaded entries share their directory and argument strings."""
+    path = tmp_path / 'compile_commands.json'
+    path.write_text(json.dumps(
+        [{'directory': '/src/project', 'file': f'{name}.cpp',
+          'arguments': ['c++', '-O2', '-c', f'{name}.cpp']}
+         for name in ('a', 'b')]))
+    first, second = cdb.load_compile_commands(str(path))
+    assert first['directory'] is second['directory'], \
+        'Directory must be shared.'
+    assert first['arguments'][1] is second['arguments'][1], \
+        'Arguments must be shared.'
+    assert first['arguments'] == ['c++', '-O2', '-c', 'a.cpp'], \
+        'Raw fields must not change.'
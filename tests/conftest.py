@@ -0,0 +1,58 @@
+"""Fixtures shared by test cases running clang-tidy."""
+import json
+import os
+import sys
+import pytest
+
+_FAKE_CLANG_TIDY = '''
+import json, os, sys
+arguments = sys.argv[1:]
+if '--' in arguments:
+    arguments = arguments[:arguments.index('--')]
+sources = [arg for arg in arguments if not arg.startswith('-')]
+build_dir = next((arg[3:] for arg in arguments if arg.startswith('-p=')),
+                 None)
+if build_dir is not None:
+    with open(os.path.join(build_dir, 'compile_commands.json')) as file:
+        database = json.load(file)
+    assert sources == [item['file'] for item in database]
+header = os.path.join(os.path.dirname(sources[0]), 'common.h')
+if os.path.exists(header):
+    print(f'{header}:1:1: warning: header [fake-check]')
+for source in sources:
+    print(f'{source}:1:1: warning: fake [fake-check]')
+    print(f'Error while processing {source}.', file=sys.stderr)
+'''
+
+
+@pytest.fixture(name='fake_clang_tidy')
+def fixture_fake_clang_tidy(tmp_path):
+    """Executable reporting every source it is given, one call or batch.
+
+    Sources are read from the command line and, with -p, checked against
+    the database of the build directory. A common.h next to the first
+    source gets one diagnostic per process.
+    """
+    path = tmp_path / 'fake-clang-tidy'
+    path.write_text(f'#!{sys.executable}\n{_FAKE_CLANG_TIDY}')
+    os.chmod(path, 0o755)
+    return str(path)
+
+
+@pytest.fixture(name='compile_commands')
+def fixture_compile_commands(tmp_path, request):
+    """Compile database of files including a common header.
+
+    The number of files is the fixture parameter, five by default.
+    """
+    count = getattr(request, 'param', 5)
+    (tmp_path / 'common.h').write_text('int x;\n')
+    names = [chr(ord('a') + idx) for idx in range(count)]
+    for name in names:
+        (tmp_path / f'{name}.cpp').write_text('#include "common.h"\n')
+    path = tmp_path / 'compile_commands.json'
+    path.write_text(json.dumps([{'directory': str(tmp_path),
+                                 'arguments': ['c++', '-c', f'{name}.cpp'],
+                                 'file': f'{name}.cpp'}
+                                for name in names]))
+    return str(path)
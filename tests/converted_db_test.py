@@ -0,0 +1,52 @@
+"""Test cases for converted compile database."""
+import json
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.config as cfg
+import cpp_static_analyzer.converted_db as cvdb
+
+
+def test_write_database(tmp_path):
+    """Write converted entries and report shared sources."""
+    commands = [{'directory': '/old/src',
+                 'command': 'c++ -I/old/inc -Wall -c a.cpp',
+                 'file': 'a.cpp'},
+                {'directory': '/old/src',
+                 'arguments': ['c++', '-DX', '-c', 'a.cpp'],
+                 'file': 'a.cpp'},
+                {'directory': '/old/src',
+                 'arguments': ['c++', '-c', 'b.cpp'],
+                 'file': 'b.cpp'}]
+    config = cfg.Config({'PathConverter': {'/old': '/new'},
+                         'Warnings': ['-Wextra']})
+    build_dir = tmp_path / 'build'
+    shared_sources = cvdb.write_database(iter(commands), config,
+                                         str(build_dir))
+    assert shared_sources == {'/new/src/a.cpp'}, 'Wrong shared sources.'
+
+    database = json.loads((build_dir / cvdb.DATABASE_FILE).read_text())
+    assert database[0] == {'directory': '/new/src',
+                           'file': '/new/src/a.cpp',
+                           'arguments': ['c++', '-I/new/inc', '-c', 'a.cpp',
+                                         '-Wextra']}, \
+        'Paths must be converted and warnings replaced.'
+    assert len(database) == 3, 'Every entry must be written.'
+
+
+def test_build_directory_command(tmp_path):
+    """Jobs pass compile arguments through the build directory."""
+    path = tmp_path / 'compile_commands.json'
+    path.write_text(json.dumps([{'directory': '/src',
+                                 'arguments': ['c++', '-c', f'{name}.cpp'],
+                                 'file': f'{name}.cpp'}
+                                for name in ('a', 'b')]))
+    config = cfg.Config({'ClangTidy': 'clang-tidy'})
+    cmd_mgr = cm.CommandManager(str(path))
+    cmd_mgr.set_build_directory('/build', {'/src/b.cpp'})
+
+    command = cmd_mgr.prepare_job(0, config).get_command()
+    assert command[-2:] == ['-p=/build', '/src/a.cpp'], \
+        'Must analyze source with the build directory.'
+    assert '--' not in command, 'Arguments must not be passed.'
+
+    command = cmd_mgr.prepare_job(1, config).get_command()
+    assert '--' in command, 'Shared source must keep its arguments.'
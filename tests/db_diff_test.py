@@ -0,0 +1,69 @@
+"""Test cases for compile database differences."""
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.compile_db as cdb
+import cpp_static_analyzer.db_diff as dbd
+import cpp_static_analyzer.failures as fl
+
+
+def _make_commands(flags=('-O2', '-O2', '-O2')):
+    """Commands of three sources compiled with flags."""
+    return [{'directory': '/build',
+             'command': f'c++ {flag} -c /src/{name}.cpp',
+             'file': f'/src/{name}.cpp'}
+            for name, flag in zip(('a', 'b', 'c'), flags)]
+
+
+def _complete(snapshot, commands, index, failed=False):
+    """Record completed job of an entry."""
+    job = cm.Job(index, cdb.Entry(commands[index]), [])
+    if failed:
+        job.set_failure(fl.make_failure(1, 1.0, ''))
+    snapshot.add_job(job)
+
+
+def test_diff():
+    """Entries are added, removed, modified or unchanged by key."""
+    diff = dbd.DatabaseDiff({'a': '1', 'b': '2', 'c': '3'},
+                            {'a': '1', 'b': '4', 'd': '5'})
+    assert diff.get_added() == {'d'}, 'Wrong added entries.'
+    assert diff.get_removed() == {'c'}, 'Wrong removed entries.'
+    assert diff.get_modified() == {'b'}, 'Wrong modified entries.'
+    assert diff.get_summary() == {'added': 1, 'removed': 1,
+                                  'modified': 1, 'unchanged': 1}, \
+        'Wrong summary.'
+
+
+def test_snapshot(tmp_path):
+    """Entries not analyzed successfully stay changed for the next run."""
+    path = str(tmp_path / dbd.SNAPSHOT_FILE)
+    commands = _make_commands()
+    snapshot = dbd.DatabaseSnapshot(path, commands, 'config')
+    assert not snapshot.has_previous(), 'No previous run.'
+    assert snapshot.get_changed_indices() == [0, 1, 2], \
+        'Every entry is added.'
+    _complete(snapshot, commands, 0)
+    _complete(snapshot, commands, 1, failed=True)
+    _complete(snapshot, commands, 2)
+    snapshot.save()
+
+    snapshot = dbd.DatabaseSnapshot(path, commands, 'config')
+    assert snapshot.get_changed_indices() == [1], \
+        'Failed entry must stay changed.'
+
+    commands = _make_commands(('-O2', '-O2', '-O0'))
+    snapshot = dbd.DatabaseSnapshot(path, commands, 'config')
+    assert snapshot.get_diff().get_modified() == \
+        {dbd.get_key(commands[2])}, 'Flag change must modify the entry.'
+    assert snapshot.get_changed_indices() == [1, 2], \
+        'Modified and failed entries must be selected.'
+
+    snapshot = dbd.DatabaseSnapshot(path, commands, 'other')
+    assert snapshot.is_config_changed(), 'Configuration changed.'
+    assert snapshot.get_changed_indices() == [0, 1, 2], \
+        'Configuration change must select every entry.'
+
+
+def test_key_path():
+    """Key path joins relative input with the directory."""
+    key = dbd.get_key({'directory': '/build', 'file': 'src/a.cpp'})
+    assert dbd.get_key_path(key) == '/build/src/a.cpp', 'Wrong path.'
@@ -0,0 +1,52 @@
+"""Test cases for include dependency scanner."""
+import os
+import pytest
+import cpp_static_analyzer.dependency as dep
+
+
+@pytest.fixture(name='source_tree')
+def fixture_source_tree(tmp_path):
+    """Small source tree with nested includes."""
+    (tmp_path / 'include').mkdir()
+    (tmp_path / 'src').mkdir()
+    (tmp_path / 'include' / 'a.h').write_text('#include "b.h"\n')
+    (tmp_path / 'include' / 'b.h').write_text('#include <vector>\n')
+    (tmp_path / 'src' / 'local.h').write_text('  #  include "a.h"\n')
+    (tmp_path / 'src' / 'main.cpp').write_text(
+        '#include "local.h"\n#include <a.h>\n#include "missing.h"\n')
+    return tmp_path
+
+
+def test_include_directories():
+    """Collect include directories from arguments."""
+    arguments = ['c++', '-Iinclude', '-I', '/abs/inc', '-isystem',
+                 '/sys', '-iquote', 'quoted', '-I"/with space"',
+                 '-O2']
+    quote_dirs, angle_dirs = dep.get_include_directories(arguments,
+                                                         '/work')
+    assert quote_dirs == ('/work/quoted',), 'Wrong quoted directories.'
+    assert angle_dirs == ('/work/include', '/abs/inc', '/sys',
+                          '/with space'), 'Wrong angled directories.'
+
+
+def test_transitive_dependencies(source_tree):
+    """Resolve transitive header dependencies."""
+    scanner = dep.DependencyScanner()
+    include_dir = os.path.join(source_tree, 'include')
+    source = os.path.join(source_tree, 'src', 'main.cpp')
+
+    dependencies = scanner.get_dependencies(source, (), (include_dir,))
+    expected = sorted([os.path.join(include_dir, 'a.h'),
+                       os.path.join(include_dir, 'b.h'),
+                       os.path.join(source_tree, 'src', 'local.h')])
+    assert dependencies == expected, 'Wrong dependencies.'
+
+
+def test_unresolved_include(source_tree):
+    """Headers outside include directories are ignored."""
+    scanner = dep.DependencyScanner()
+    source = os.path.join(source_tree, 'src', 'main.cpp')
+
+    dependencies = scanner.get_dependencies(source)
+    assert dependencies == [os.path.join(source_tree, 'src', 'local.h')], \
+        'Only local header must be found.'
@@ -0,0 +1,111 @@
+"""Test cases for diagnostic parsing, merging and reports."""
+import json
+import random
+import cpp_static_analyzer.diagnostics as diag
+
+_HEADER_WARNING = '''/src/common.h:3:5: warning: variable 'x' is not \
+initialized [cppcoreguidelines-init-variables]
+    int x;
+    ^
+/src/common.h:1:1: note: declared here
+'''
+
+
+def _make_output(source: str):
+    return (f'2 warnings generated.\n{_HEADER_WARNING}'
+            f'{source}:7:1: warning: unused function [misc-unused]\n'
+            '    void f();\n'
+            '    ^\n')
+
+
+def test_parse_diagnostics():
+    """Parse diagnostics with notes and excerpts."""
+    diagnostics = list(diag.parse_diagnostics(_make_output('/src/a.cpp')))
+    assert len(diagnostics) == 2, 'Must parse two diagnostics.'
+
+    first = diagnostics[0]
+    assert first.get_file() == '/src/common.h', 'Wrong file.'
+    assert (first.get_line(), first.get_column()) == (3, 5), \
+        'Wrong position.'
+    assert first.get_check() == 'cppcoreguidelines-init-variables', \
+        'Wrong check.'
+    assert first.get_text() == _HEADER_WARNING.rstrip('\n'), \
+        'Note and excerpt must belong to the diagnostic.'
+    assert diagnostics[1].get_message() == 'unused function', \
+        'Wrong message.'
+
+    record = first.to_record()
+    assert record['notes'] == [{'file': '/src/common.h', 'line': 1,
+                                'column': 1, 'message': 'declared here'}], \
+        'Wrong notes.'
+
+
+def test_compact_hash_set():
+    """Compact hash set behaves like a set while growing."""
+    rng = random.Random(7)
+    values = [rng.getrandbits(64) for _ in range(5000)] + [0, 1]
+    seen = diag.CompactHashSet()
+    expected = set()
+
+    for value in values + values[:100]:
+        added = seen.add(value)
+        # Zero and one share a slot value.
+        assert added == ((value or 1) not in expected), \
+            f'Wrong result adding {value}.'
+        expected.add(value or 1)
+
+    assert len(seen) == len(expected), 'Wrong element count.'
+    assert all(value in seen for value in values), 'Value must be present.'
+    assert 12345 not in seen, 'Value must not be present.'
+
+
+def test_diagnostic_merger(tmp_path):
+    """Header diagnostic reported by two units is written once."""
+    path = tmp_path / 'merged.txt'
+    merger = diag.DiagnosticMerger(str(path))
+    assert merger.add(_make_output('/src/a.cpp')) == 2, \
+        'Both diagnostics must be new.'
+    assert merger.add(_make_output('/src/b.cpp')) == 1, \
+        'Header diagnostic must be merged.'
+    assert merger.add('') == 0, 'Empty output has no diagnostics.'
+    merger.close()
+
+    assert merger.get_total_count() == 4, 'Wrong total count.'
+    assert merger.get_unique_count() == 3, 'Wrong unique count.'
+    report = path.read_text(encoding='utf-8')
+    assert report.count('common.h:3:5') == 1, \
+        'Header diagnostic must be written once.'
+    assert 'generated' not in report, 'Summary lines must be skipped.'
+
+
+def test_structured_report(tmp_path):
+    """Diagnostics are written as JSON Lines and SARIF."""
+    jsonl_path = tmp_path / 'report.jsonl'
+    sarif_path = tmp_path / 'report.sarif'
+    report = diag.StructuredReport(str(jsonl_path), str(sarif_path))
+    assert report.add(_make_output('/src/a.cpp'), '/src/a.cpp') == 2, \
+        'Must write two diagnostics.'
+    report.add(_make_output('src/b.cpp'), 'src/b.cpp')
+    report.close()
+    assert report.get_count() == 4, 'Wrong diagnostic count.'
+
+    records = [json.loads(line) for line in
+               jsonl_path.read_text(encoding='utf-8').splitlines()]
+    assert len(records) == 4, 'Must write one record per line.'
+    assert records[3]['unit'] == 'src/b.cpp', 'Wrong unit.'
+    assert records[3]['check'] == 'misc-unused', 'Wrong check.'
+
+    sarif = json.loads(sarif_path.read_text(encoding='utf-8'))
+    results = sarif['runs'][0]['results']
+    assert len(results) == 4, 'Must write one result per diagnostic.'
+    assert results[0]['ruleId'] == 'cppcoreguidelines-init-variables', \
+        'Wrong rule.'
+    location = results[0]['locations'][0]['physicalLocation']
+    assert location['artifactLocation']['uri'] == 'file:///src/common.h', \
+        'Absolute path must be a file URI.'
+    assert location['region'] == {'startLine': 3, 'startColumn': 5}, \
+        'Wrong region.'
+    assert len(results[0]['relatedLocations']) == 1, 'Note must be related.'
+    assert results[3]['locations'][0]['physicalLocation'][
+        'artifactLocation']['uri'] == 'src/b.cpp', \
+        'Relative path must be kept.'
@@ -0,0 +1,110 @@
+"""Test cases for coordinator and workers."""
+import json
+import os
+import socket
+import threading
+import pytest
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.config as cfg
+import cpp_static_analyzer.distributed as dist
+
+
+def test_parse_address():
+    """Split host and port."""
+    assert dist.parse_address('build-1:4000') == ('build-1', 4000), \
+        'Wrong address.'
+    assert dist.parse_address(':4000') == ('localhost', 4000), \
+        'Host must default to localhost.'
+
+
+def test_coordinator(tmp_path, fake_clang_tidy, compile_commands):
+    """Localhost workers finish entries abandoned by a dead worker."""
+    config = cfg.Config({'ClangTidy': fake_clang_tidy})
+    cmd_mgr = cm.CommandManager(compile_commands)
+    out_dir = tmp_path / 'out'
+    err_dir = out_dir / 'errors'
+    err_dir.mkdir(parents=True)
+
+    coordinator = dist.Coordinator(cmd_mgr, config, str(out_dir),
+                                   str(err_dir))
+    host, port = coordinator.start('localhost', 0)
+
+    # A worker taking an entry and leaving without a result.
+    with socket.create_connection((host, port)) as sock:
+        stream = sock.makefile('rw', encoding='utf-8', newline='\n')
+        stream.write('{"type":"request"}\n')
+        stream.flush()
+        assert json.loads(stream.readline())['type'] == 'job', \
+            'Dead worker must get an entry.'
+        stream.close()
+
+    counts = []
+    workers = [threading.Thread(
+        target=lambda: counts.append(dist.run_worker(host, port, config)))
+        for _ in range(3)]
+    for worker in workers:
+        worker.start()
+
+    assert coordinator.wait() == 0, 'No job must fail.'
+    for worker in workers:
+        worker.join()
+
+    assert sum(counts) == 5, 'Every entry must be analyzed once.'
+    assert coordinator.get_completed_count() == 5, 'Wrong completions.'
+    outputs = [name for name in os.listdir(out_dir) if name != 'errors']
+    assert len(outputs) == 5, 'Must write one output per file.'
+
+
+def test_coordinator_lease(tmp_path, fake_clang_tidy, compile_commands):
+    """Entries of a connected but silent worker are requeued."""
+    config = cfg.Config({'ClangTidy': fake_clang_tidy})
+    cmd_mgr = cm.CommandManager(compile_commands)
+    out_dir = tmp_path / 'out'
+    err_dir = out_dir / 'errors'
+    err_dir.mkdir(parents=True)
+
+    coordinator = dist.Coordinator(cmd_mgr, config, str(out_dir),
+                                   str(err_dir), lease=0.5)
+    host, port = coordinator.start('localhost', 0)
+
+    # A hung worker taking an entry and keeping the connection open.
+    with socket.create_connection((host, port)) as sock:
+        stream = sock.makefile('rw', encoding='utf-8', newline='\n')
+        stream.write('{"type":"request"}\n')
+        stream.flush()
+        assert json.loads(stream.readline())['type'] == 'job', \
+            'Hung worker must get an entry.'
+
+        counts = []
+        worker = threading.Thread(
+            target=lambda: counts.append(dist.run_worker(host, port,
+                                                         config)))
+        worker.start()
+        assert coordinator.wait() == 0, 'No job must fail.'
+        worker.join()
+        stream.close()
+
+    assert counts == [5], 'Expired entry must be analyzed again.'
+    assert coordinator.get_completed_count() == 5, 'Wrong completions.'
+
+
+@pytest.mark.parametrize('compile_commands', [1], indirect=True)
+def test_worker_heartbeat(tmp_path, monkeypatch, compile_commands):
+    """Heartbeats keep the lease of an entry running longer than it."""
+    slow_clang_tidy = tmp_path / 'slow-clang-tidy'
+    slow_clang_tidy.write_text('#!/bin/sh\nsleep 1\n')
+    os.chmod(slow_clang_tidy, 0o755)
+    monkeypatch.setattr(dist, '_HEARTBEAT_INTERVAL', 0.1)
+    config = cfg.Config({'ClangTidy': str(slow_clang_tidy)})
+    cmd_mgr = cm.CommandManager(compile_commands)
+    out_dir = tmp_path / 'out'
+    err_dir = out_dir / 'errors'
+    err_dir.mkdir(parents=True)
+
+    coordinator = dist.Coordinator(cmd_mgr, config, str(out_dir),
+                                   str(err_dir), lease=0.5)
+    host, port = coordinator.start('localhost', 0)
+    assert dist.run_worker(host, port, config) == 1, \
+        'Entry must be analyzed once.'
+    assert coordinator.wait() == 0, 'No job must fail.'
+    assert coordinator.get_completed_count() == 1, 'Wrong completions.'
@@ -0,0 +1,23 @@
+"""Test cases for failure records."""
+import signal
+import cpp_static_analyzer.failures as fl
+
+
+def test_make_failure():
+    """Describe exit codes, signals, timeouts and failed starts."""
+    failure = fl.make_failure(-signal.SIGSEGV, 1.0, 'a\nb\n')
+    assert failure['signal'] == 'SIGSEGV', 'Wrong signal.'
+    assert failure['stderr_tail'] == ['a', 'b'], 'Wrong stderr tail.'
+    assert fl.is_transient(failure), 'Signal must be transient.'
+    assert fl.describe(failure) == 'killed by SIGSEGV', 'Wrong description.'
+
+    failure = fl.make_failure(1, 1.0, '\n'.join(map(str, range(100))))
+    assert failure['signal'] is None, 'Exit must have no signal.'
+    assert len(failure['stderr_tail']) == 20, 'Tail must be bounded.'
+    assert not fl.is_transient(failure), 'Exit code must not be transient.'
+    assert fl.describe(failure) == 'exited with 1', 'Wrong description.'
+
+    failure = fl.make_failure(None, 5.0, '', timed_out=True, attempts=2)
+    assert fl.is_transient(failure), 'Timeout must be transient.'
+    assert fl.describe(failure) == 'timed out after 5.0s (2 attempts)', \
+        'Wrong description.'
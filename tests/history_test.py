@@ -0,0 +1,53 @@
+"""Test cases for duration history."""
+import pytest
+import cpp_static_analyzer.history as hist
+
+
+def test_duration_history(tmp_path):
+    """Record, smooth and persist durations."""
+    path = str(tmp_path / 'durations.json')
+    history = hist.DurationHistory(path)
+    history.record('a', 10.0)
+    history.record('a', 20.0)
+    history.record('b', 2.0)
+    history.record('c', 4.0)
+    assert history.get('a') == pytest.approx(15.0), 'Must be smoothed.'
+    history.save()
+
+    reloaded = hist.DurationHistory(path)
+    assert len(reloaded) == 3, 'Must reload three durations.'
+    assert reloaded.get_default_estimate() == pytest.approx(4.0), \
+        'Default estimate must be the median.'
+    assert reloaded.estimate(['b', 'unknown']) == \
+        pytest.approx([2.0, 4.0]), 'Unknown entry must use the median.'
+
+
+def test_empty_history():
+    """Empty history estimates every entry equally."""
+    history = hist.DurationHistory()
+    estimates = history.estimate(['a', 'b'])
+    assert estimates[0] == estimates[1], 'Estimates must be equal.'
+    assert hist.order_longest_first(estimates) == [0, 1], \
+        'Order must be kept for equal estimates.'
+
+
+def test_longest_first_makespan():
+    """Longest-first order shrinks the tail."""
+    durations = [1.0, 1.0, 1.0, 1.0, 4.0]
+    order = hist.order_longest_first(durations)
+    assert order[0] == 4, 'Longest entry must be first.'
+
+    original = hist.simulate_makespan(durations, 2)
+    ordered = hist.simulate_makespan([durations[idx] for idx in order], 2)
+    assert original == pytest.approx(6.0), 'Wrong original makespan.'
+    assert ordered == pytest.approx(4.0), 'Wrong ordered makespan.'
+
+
+def test_memory_history():
+    """Peak RSS rises at once and decays smoothly."""
+    history = hist.MemoryHistory()
+    history.record('a', 100)
+    history.record('a', 300)
+    assert history.get('a') == 300, 'Increase must be taken at once.'
+    history.record('a', 100)
+    assert history.get('a') == 200, 'Decrease must be smoothed.'
@@ -0,0 +1,103 @@
+"""Test cases for reverse include index."""
+import os
+import pytest
+import cpp_static_analyzer.compile_db as cdb
+import cpp_static_analyzer.include_index as ii
+
+
+@pytest.fixture(name='project')
+def fixture_project(tmp_path):
+    """Two translation units sharing one header."""
+    (tmp_path / 'common.h').write_text('int common;\n')
+    (tmp_path / 'only_a.h').write_text('int only_a;\n')
+    (tmp_path / 'a.cpp').write_text(
+        '#include "common.h"\n#include "only_a.h"\n')
+    (tmp_path / 'b.cpp').write_text('#include "common.h"\n')
+    return tmp_path
+
+
+def make_entries(directory):
+    """Compile database entries of the project."""
+    return [cdb.Entry({'directory': str(directory),
+                       'arguments': ['c++', '-c', name],
+                       'file': name}) for name in ('a.cpp', 'b.cpp')]
+
+
+def test_affected_units(project):
+    """Header changes select including units only."""
+    entries = make_entries(project)
+    index = ii.IncludeIndex()
+    assert index.update(entries, {}) == 2, 'Both sources must be resolved.'
+
+    key_a = entries[0].get_key()
+    key_b = entries[1].get_key()
+    common = os.path.join(project, 'common.h')
+    only_a = os.path.join(project, 'only_a.h')
+    source_b = os.path.join(project, 'b.cpp')
+
+    assert index.get_affected([common]) == {key_a, key_b}, \
+        'Common header affects both units.'
+    assert index.get_affected([only_a]) == {key_a}, \
+        'Header affects unit a only.'
+    assert index.get_affected([source_b]) == {key_b}, \
+        'Source affects its own unit.'
+
+
+def test_incremental_update(project):
+    """Persisted index only re-resolves units depending on changes."""
+    entries = make_entries(project)
+    index_path = str(project / 'index.json')
+    index = ii.IncludeIndex(index_path)
+    index.update(entries, {})
+    index.save()
+
+    reloaded = ii.IncludeIndex(index_path)
+    assert len(reloaded) == 2, 'Index must be reloaded.'
+    assert reloaded.update(entries, {}) == 0, 'Nothing must be resolved.'
+
+    only_a = project / 'only_a.h'
+    only_a.write_text('#include "new.h"\n')
+    (project / 'new.h').write_text('int new_header;\n')
+    stat = os.stat(only_a)
+    os.utime(only_a, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert reloaded.update(entries, {}) == 1, 'Changed header must be resolved.'
+    assert reloaded.get_affected([str(project / 'new.h')]) == \
+        {entries[0].get_key()}, 'New header must be indexed.'
+
+
+def test_update_commands(project, monkeypatch):
+    """Unchanged raw entries are neither parsed nor saved again."""
+    commands = [{'directory': str(project),
+                 'arguments': ['c++', '-c', name],
+                 'file': name} for name in ('a.cpp', 'b.cpp')]
+    index_path = project / 'index.json'
+    index = ii.IncludeIndex(str(index_path))
+    keys, resolved = index.update_commands(commands, {})
+    assert keys == [cdb.Entry(command).get_key() for command in commands], \
+        'Wrong keys.'
+    assert resolved == 2, 'Both sources must be resolved.'
+    index.save()
+    saved = os.stat(index_path).st_mtime_ns
+
+    parsed = []
+    entry_class = cdb.Entry
+    monkeypatch.setattr(cdb, 'Entry',
+                        lambda command: parsed.append(command['file']) or
+                        entry_class(command))
+    reloaded = ii.IncludeIndex(str(index_path))
+    assert reloaded.update_commands(commands, {}) == (keys, 0), \
+        'Nothing must be resolved.'
+    assert parsed == [], 'Unchanged entries must not be parsed.'
+    os.utime(index_path, ns=(saved, saved - 10**9))
+    reloaded.save()
+    assert os.stat(index_path).st_mtime_ns == saved - 10**9, \
+        'Unmodified index must not be saved.'
+
+    commands[1]['arguments'] = ['c++', '-O2', '-c', 'b.cpp']
+    assert reloaded.update_commands(commands, {})[0] == keys, \
+        'Keys must not change.'
+    assert parsed == ['b.cpp'], 'Changed entry must be parsed.'
+    reloaded.update_commands(commands, {'/x': '/y'})
+    assert parsed == ['b.cpp', 'a.cpp', 'b.cpp'], \
+        'Path converter change must parse every entry.'
@@ -0,0 +1,50 @@
+"""Test cases for the run journal."""
+import json
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.compile_db as cdb
+import cpp_static_analyzer.failures as fl
+import cpp_static_analyzer.journal as jr
+
+
+def _job(name: str, failed: bool = False):
+    """Completed job of name.cpp."""
+    entry = cdb.Entry({'directory': '/s', 'command': f'c++ -c {name}.cpp',
+                       'file': f'{name}.cpp'})
+    job = cm.Job(0, entry, [])
+    job.set_result(f'{name}.cpp:1:1: warning: x [y]\n', '')
+    if failed:
+        job.set_failure(fl.make_failure(1, 1.0, 'error'))
+    return job
+
+
+def test_journal(tmp_path):
+    """Resume entries journaled as done, ignoring a torn record."""
+    path = str(tmp_path / jr.JOURNAL_FILE)
+    header = {'database': '/s/compile_commands.json', 'fingerprint': 'f'}
+    journal = jr.Journal(path, header, '/out', '/out/errors')
+    for job in (_job('a'), _job('b', failed=True), _job('c', failed=True)):
+        journal.add_job(job)
+    journal.close()
+    assert journal.get_count() == 3, 'Every job must be journaled.'
+
+    journal = jr.Journal(path, header, '/out', '/out/errors', resume=True)
+    journal.add_job(_job('b'))
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write('{"key": "torn')
+
+    records = [json.loads(line) for line in
+               (tmp_path / jr.JOURNAL_FILE).read_text().splitlines()[:-1]]
+    assert records[0] == header, 'Journal must start with its header.'
+    assert records[1]['output'] == \
+        f'/out/{cm.get_output_name("a.cpp")}', 'Wrong output location.'
+    assert records[1]['error'] is None, 'Empty error must not be named.'
+
+    done = jr.load(path, header)
+    assert done == {_job('a').get_entry().get_key(),
+                    _job('b').get_entry().get_key()}, \
+        'Only succeeded entries must be done.'
+    assert jr.load(path, dict(header, fingerprint='g')) is None, \
+        'Other settings must not resume.'
+    assert jr.load(str(tmp_path / 'missing'), header) is None, \
+        'Missing journal must not resume.'
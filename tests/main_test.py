@@ -0,0 +1,45 @@
+"""Test cases for command line entry point."""
+import os
+import sys
+import pytest
+import cpp_static_analyzer.main as mn
+
+
+def test_execute_defaults(tmp_path, monkeypatch, fake_clang_tidy,
+                          compile_commands):
+    """Analyze a database with every other option left at its default."""
+    config_file = tmp_path / 'config.yml'
+    config_file.write_text(f'ClangTidy: {fake_clang_tidy}\n'
+                           f'Checks:\n  - fake-*\n')
+    out_dir = tmp_path / 'out'
+    monkeypatch.setattr(sys, 'argv',
+                        ['cpp-static-analyzer', '-cfg', str(config_file),
+                         '-o', str(out_dir), compile_commands])
+
+    with pytest.raises(SystemExit) as exit_info:
+        mn.execute()
+
+    assert exit_info.value.code == 0, 'Default run must succeed.'
+    outputs = [name for name in os.listdir(out_dir)
+               if not name.startswith('.') and name != 'errors']
+    assert len(outputs) == 5, 'Must write one output per file.'
+
+
+def test_execute_stream_truncated(tmp_path, monkeypatch, fake_clang_tidy,
+                                  compile_commands):
+    """A truncated streamed database fails the run."""
+    config_file = tmp_path / 'config.yml'
+    config_file.write_text(f'ClangTidy: {fake_clang_tidy}\n')
+    with open(compile_commands, 'r', encoding='utf-8') as file:
+        text = file.read()
+    with open(compile_commands, 'w', encoding='utf-8') as file:
+        file.write(text[:len(text) // 2])
+    monkeypatch.setattr(sys, 'argv',
+                        ['cpp-static-analyzer', '-cfg', str(config_file),
+                         '-o', str(tmp_path / 'out'), '--stream',
+                         compile_commands])
+
+    with pytest.raises(SystemExit) as exit_info:
+        mn.execute()
+
+    assert exit_info.value.code == 1, 'Truncated database must fail.'
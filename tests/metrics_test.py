@@ -0,0 +1,49 @@
+"""Test cases for run metrics."""
+import json
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.compile_db as cdb
+import cpp_static_analyzer.metrics as mt
+import cpp_static_analyzer.process as pr
+
+
+def _job(index: int, wall_time: float = None, cached: bool = False):
+    """Completed job of a.cpp, b.cpp, ..."""
+    name = chr(ord('a') + index)
+    entry = cdb.Entry({'directory': '/s', 'command': f'c++ -c {name}.cpp',
+                       'file': f'{name}.cpp'})
+    job = cm.Job(index, entry, [])
+    job.set_result('warning\n', '', cached)
+    if wall_time is not None:
+        job.set_usage(pr.ResourceUsage(wall_time, wall_time / 2, 0.1,
+                                       1000 * (index + 1)))
+    return job
+
+
+def test_run_metrics(tmp_path):
+    """Aggregate usage of analyzed jobs only."""
+    metrics = mt.RunMetrics(2, slowest=2)
+    for job in (_job(0, 1.0), _job(1, 3.0), _job(2, 2.0),
+                _job(3, cached=True), _job(4)):
+        metrics.add_job(job)
+
+    record = metrics.to_record(4.0)
+    assert (record['units'], record['analyzed'], record['cached']) == \
+        (5, 3, 1), 'Wrong counts.'
+    assert record['throughput'] == 75.0, 'Wrong throughput.'
+    assert record['utilization'] == 0.75, 'Wrong utilization.'
+    assert record['user_time'] == 3.0, 'Wrong CPU time.'
+    assert record['max_rss'] == 3000, 'Wrong peak RSS.'
+    assert record['output_bytes'] == 24, 'Wrong output size.'
+    assert [item['file'] for item in record['slowest']] == \
+        ['b.cpp', 'c.cpp'], 'Slowest units must come first.'
+
+    path = tmp_path / 'metrics.json'
+    mt.write_json(str(path), record)
+    assert json.loads(path.read_text()) == record, 'Wrong JSON.'
+
+    path = tmp_path / 'metrics.prom'
+    mt.write_prometheus(str(path), record)
+    lines = path.read_text().splitlines()
+    assert 'cpp_static_analyzer_units 5' in lines, 'Missing metric.'
+    assert 'cpp_static_analyzer_slowest_unit_wall_seconds' \
+        '{file="b.cpp"} 3.0' in lines, 'Missing slowest unit.'
@@ -0,0 +1,60 @@
+"""Test cases for child process execution."""
+import os
+import subprocess
+import sys
+import pytest
+import cpp_static_analyzer.process as pr
+
+
+def test_run_process():
+    """Outputs, exit code and resource usage of the child are captured."""
+    returncode, stdout, stderr, usage = pr.run_process(
+        [sys.executable, '-c',
+         'import sys; data = bytearray(64 << 20); '
+         'sys.stderr.write("e" * 100000); print("out"); sys.exit(3)'])
+    assert returncode == 3, 'Wrong exit code.'
+    assert stdout == 'out\n', 'Wrong stdout.'
+    assert stderr == 'e' * 100000, 'Wrong stderr.'
+    assert usage.get_wall_time() > 0.0, 'Wall time must be measured.'
+    if hasattr(os, 'wait4'):
+        assert usage.get_user_time() is not None, 'CPU time must be known.'
+        assert usage.get_max_rss() >= 64 << 20, 'Peak RSS must be known.'
+
+
+def test_resource_usage():
+    """Usage of a shared process is split between its units."""
+    usage = pr.ResourceUsage(4.0, 2.0, None, 100)
+    share = usage.split(4)
+    assert share.to_record() == {'wall_time': 1.0, 'user_time': 0.5,
+                                 'system_time': None, 'max_rss': 100}, \
+        'Wrong split.'
+    assert pr.ResourceUsage(**usage.to_record()).to_record() == \
+        usage.to_record(), 'Record must round trip.'
+
+
+def test_run_missing_process():
+    """Missing executable raises like subprocess."""
+    with pytest.raises(OSError):
+        pr.run_process(['/nonexistent/clang-tidy'])
+
+
+def test_run_process_timeout():
+    """Process group is killed when the timeout expires."""
+    with pytest.raises(subprocess.TimeoutExpired):
+        pr.run_process(
+            [sys.executable, '-c',
+             'import os; print("started", flush=True); os.system("sleep 30")'],
+            timeout=0.5)
+
+
+@pytest.mark.skipif(not hasattr(pr.resource, 'prlimit'),
+                    reason='prlimit is not available.')
+def test_memory_limit():
+    """Process exceeding its memory limit fails."""
+    code = 'import time; time.sleep(0.2); data = bytearray(1 << 30)'
+    returncode, _, stderr, _ = pr.run_process(
+        [sys.executable, '-c', code], 512 << 20)
+    assert returncode != 0 and 'MemoryError' in stderr, \
+        'Allocation over the limit must fail.'
+    returncode, _, _, _ = pr.run_process([sys.executable, '-c', code])
+    assert returncode == 0, 'Allocation must succeed without a limit.'
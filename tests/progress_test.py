@@ -0,0 +1,65 @@
+"""Test cases for progress reporting."""
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.compile_db as cdb
+import cpp_static_analyzer.failures as fl
+import cpp_static_analyzer.history as hist
+import cpp_static_analyzer.progress as pg
+
+
+class _Clock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _complete(cmd_mgr, index, failed=False, duplicate=False):
+    """Completed job of an entry."""
+    job = cm.Job(index, cdb.Entry(cmd_mgr[index]), [])
+    job.set_result('', '')
+    if failed:
+        job.set_failure(fl.make_failure(1, 1.0, ''))
+    job.set_duplicate(duplicate)
+    return job
+
+
+def test_format_duration():
+    """Format short and long durations."""
+    assert pg.format_duration(65.4) == '1:05', 'Wrong minutes.'
+    assert pg.format_duration(3725) == '1:02:05', 'Wrong hours.'
+
+
+def test_progress(capsys):
+    """Progress counts completions and weights ETA by history."""
+    cmd_mgr = cm.CommandManager('tests/compile_commands.json')
+    keys = [cdb.get_entry_key(command) for command in cmd_mgr.get_commands()]
+    history = hist.DurationHistory()
+    for key, duration in zip(keys, (1.0, 1.0, 8.0)):
+        history.record(key, duration)
+
+    clock = _Clock()
+    progress = pg.ProgressReporter(cmd_mgr, history, interactive=False,
+                                   clock=clock)
+    for _ in range(3):
+        cmd_mgr.next_index()
+
+    clock.now = 2.0
+    progress.add_job(_complete(cmd_mgr, 0))
+    assert capsys.readouterr().err == \
+        'Processing files: 1/3 (33.3%), 2 running, 0 failed, ' \
+        '0.5 files/s, ETA 0:18\n', 'Wrong first log.'
+
+    clock.now = 3.0
+    progress.add_job(_complete(cmd_mgr, 1, failed=True))
+    progress.add_job(_complete(cmd_mgr, 1, duplicate=True))
+    assert capsys.readouterr().err == '', 'Logs must be periodic.'
+    assert progress.get_message() == \
+        'Processing files: 2/3 (66.7%), 1 running, 1 failed, ' \
+        '0.7 files/s, ETA 0:12', 'Duplicate must not count.'
+
+    progress.close()
+    assert capsys.readouterr().err.startswith('Processing files: 2/3'), \
+        'Must log final progress.'
@@ -0,0 +1,59 @@
+"""Test cases for result cache."""
+import os
+import pytest
+import cpp_static_analyzer.result_cache as rc
+
+
+@pytest.fixture(name='source_file')
+def fixture_source_file(tmp_path):
+    """Source file to be hashed."""
+    path = tmp_path / 'test.cpp'
+    path.write_text('int main() { return 0; }\n')
+    return str(path)
+
+
+def test_cache_hit_and_miss(tmp_path, source_file):
+    """Store and replay a result."""
+    cache = rc.ResultCache(str(tmp_path / 'cache'), 1024 * 1024)
+    key = cache.make_key('v1', 'config', source_file, ['-O2'], [])
+
+    assert cache.get(key) is None, 'Must be a miss.'
+    cache.put(key, 'warning', 'error')
+    assert cache.get(key) == ('warning', 'error'), 'Must be a hit.'
+    assert cache.get_hits() == 1, 'Must have one hit.'
+    assert cache.get_misses() == 1, 'Must have one miss.'
+
+
+def test_cache_key(tmp_path, source_file):
+    """Key changes with content, arguments and version."""
+    cache = rc.ResultCache(str(tmp_path / 'cache'), 1024 * 1024)
+    key = cache.make_key('v1', 'config', source_file, ['-O2'], [])
+
+    assert key != cache.make_key('v2', 'config', source_file, ['-O2'], []), \
+        'Version must change key.'
+    assert key != cache.make_key('v1', 'config', source_file, ['-O3'], []), \
+        'Arguments must change key.'
+    assert key != cache.make_key('v1', 'other', source_file, ['-O2'], []), \
+        'Config must change key.'
+
+    with open(source_file, 'a', encoding='utf-8') as file:
+        file.write('// changed\n')
+    fresh_cache = rc.ResultCache(str(tmp_path / 'cache'), 1024 * 1024)
+    assert key != fresh_cache.make_key('v1', 'config', source_file,
+                                       ['-O2'], []), \
+        'Content must change key.'
+
+
+def test_cache_eviction(tmp_path):
+    """Least recently used entries are evicted first."""
+    cache = rc.ResultCache(str(tmp_path / 'cache'), 1024 * 1024)
+    cache.put('aa' + '0' * 62, 'x' * 1000, '')
+    cache.put('bb' + '0' * 62, 'y' * 1000, '')
+    old_path = tmp_path / 'cache' / 'aa' / ('aa' + '0' * 62 + '.json')
+    os.utime(old_path, (0, 0))
+
+    small_cache = rc.ResultCache(str(tmp_path / 'cache'), 1500)
+    small_cache.evict()
+    assert small_cache.get('aa' + '0' * 62) is None, 'Oldest must be evicted.'
+    assert small_cache.get('bb' + '0' * 62) is not None, \
+        'Newest must be kept.'
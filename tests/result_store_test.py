@@ -0,0 +1,87 @@
+"""Test cases for result store."""
+import sqlite3
+import cpp_static_analyzer.command_manager as cm
+import cpp_static_analyzer.compile_db as cdb
+import cpp_static_analyzer.failures as fl
+import cpp_static_analyzer.result_store as rs
+
+
+def _make_job(index: int, source: str, output: str, cached: bool = False):
+    entry = cdb.Entry({'directory': '/src',
+                       'file': source,
+                       'command': f'clang++ -c {source}'})
+    job = cm.Job(index, entry, [])
+    job.set_result(output, '', cached)
+    job.set_duration(1.5)
+    return job
+
+
+def _make_output(source: str):
+    return ('/src/net/socket.h:3:1: warning: narrowing '
+            '[bugprone-narrowing-conversions]\n'
+            f'{source}:7:1: warning: unused [misc-unused]\n'
+            f'{source}:8:1: note: here\n')
+
+
+def test_result_store(tmp_path):
+    """Record two runs and count diagnostics of the latest."""
+    path = str(tmp_path / 'results.db')
+    store = rs.ResultStore(path)
+    store.add_job(_make_job(0, '/src/a.cpp', _make_output('/src/a.cpp')))
+    store.close()
+
+    store = rs.ResultStore(path)
+    assert store.get_run_id() == 2, 'Must start a second run.'
+    for idx, source in enumerate(['/src/net/b.cpp', '/src/c.cpp']):
+        store.add_job(_make_job(idx, source, _make_output(source)))
+    store.add_job(_make_job(2, '/src/d.cpp', '', cached=True))
+    store.close()
+
+    run_id, rows = rs.query(path)
+    assert run_id == 2, 'Must query the latest run.'
+    assert rows == [('bugprone-narrowing-conversions', 2),
+                    ('misc-unused', 2)], 'Wrong counts by check.'
+
+    _, rows = rs.query(path, check='bugprone-*', file='/src/net/*',
+                       group_by='unit')
+    assert rows == [('/src/c.cpp', 1), ('/src/net/b.cpp', 1)], \
+        'Wrong filtered counts by unit.'
+
+    _, rows = rs.query(path, run_id=1)
+    assert sum(count for _, count in rows) == 2, 'Wrong first run count.'
+
+    with sqlite3.connect(path) as connection:
+        units = connection.execute(
+            'SELECT unit, status, diagnostics FROM units WHERE run_id = 2 '
+            'ORDER BY unit').fetchall()
+        finished = connection.execute(
+            'SELECT COUNT(*) FROM runs WHERE finished IS NULL').fetchone()
+    connection.close()
+    assert units == [('/src/c.cpp', 'analyzed', 2),
+                     ('/src/d.cpp', 'cached', 0),
+                     ('/src/net/b.cpp', 'analyzed', 2)], 'Wrong units.'
+    assert finished == (0,), 'Runs must be finished.'
+
+
+def test_failed_units(tmp_path):
+    """Failed units keep their exit code and timeout."""
+    path = str(tmp_path / 'results.db')
+    store = rs.ResultStore(path)
+    failed = _make_job(0, '/src/a.cpp', '')
+    failed.set_failure(fl.make_failure(2, 1.5, 'error'))
+    store.add_job(failed)
+    timed_out = _make_job(1, '/src/b.cpp', '')
+    timed_out.set_failure(fl.make_failure(None, 1.5, '', timed_out=True))
+    store.add_job(timed_out)
+    store.add_job(_make_job(2, '/src/c.cpp', ''))
+    store.close()
+
+    with sqlite3.connect(path) as connection:
+        units = connection.execute(
+            'SELECT unit, status, returncode, timed_out FROM units '
+            'ORDER BY unit').fetchall()
+    connection.close()
+    assert units == [('/src/a.cpp', 'failed', 2, 0),
+                     ('/src/b.cpp', 'failed', None, 1),
+                     ('/src/c.cpp', 'analyzed', 0, 0)], \
+        'Wrong unit status.'
@@ -0,0 +1,71 @@
+"""Test cases for sharding."""
+import json
+import pytest
+import cpp_static_analyzer.compile_db as cdb
+import cpp_static_analyzer.shard as sh
+
+
+def test_parse_shard():
+    """Parse one based shard specification."""
+    assert sh.parse_shard('1/4') == (0, 4), 'Wrong first shard.'
+    assert sh.parse_shard('4/4') == (3, 4), 'Wrong last shard.'
+    for text in ('0/4', '5/4', '1', 'a/b', '1/0'):
+        with pytest.raises(ValueError):
+            sh.parse_shard(text)
+
+
+def test_partition():
+    """Shards are balanced by cost and cover every item once."""
+    costs = [10.0, 1.0, 1.0, 1.0, 1.0, 1.0, 5.0, 5.0]
+    assignment = sh.partition(costs, 3)
+    assert assignment == sh.partition(list(costs), 3), \
+        'Assignment must be deterministic.'
+
+    loads = [0.0] * 3
+    for cost, shard_id in zip(costs, assignment):
+        loads[shard_id] += cost
+    assert sorted(loads) == [7.0, 8.0, 10.0], 'Shards must be balanced.'
+    assert sh.partition([1.0, 1.0], 4) == [0, 1], \
+        'Ties must go to the first shards.'
+    assert sh.partition([0, 0, 0, 0], 2) == [0, 1, 0, 1], \
+        'Items without cost must be balanced by count.'
+
+
+def test_estimate_size_costs(tmp_path):
+    """Cost is size of source plus included headers."""
+    (tmp_path / 'common.h').write_text('int x;\n')
+    (tmp_path / 'a.cpp').write_text('#include "common.h"\n')
+    (tmp_path / 'b.cpp').write_text('int y;\n')
+    entries = [cdb.Entry({'directory': str(tmp_path),
+                          'command': f'c++ -c {name}',
+                          'file': name}) for name in ('a.cpp', 'b.cpp')]
+    assert sh.estimate_size_costs(entries, {}) == [27, 7], 'Wrong costs.'
+
+
+def test_merge_shards(tmp_path):
+    """Merge outputs, durations and summaries of two shards."""
+    shard_dirs = []
+    for shard_id in range(2):
+        shard_dir = tmp_path / f'shard{shard_id}'
+        (shard_dir / 'errors').mkdir(parents=True)
+        (shard_dir / f'f{shard_id}.cpp.hash').write_text('warning\n')
+        (shard_dir / 'errors' / f'f{shard_id}.cpp.hash').write_text('err\n')
+        (shard_dir / sh.DURATIONS_FILE).write_text(
+            json.dumps({f'key{shard_id}': 2.0 + shard_id}))
+        sh.write_summary(str(shard_dir), {'shard': f'{shard_id + 1}/2',
+                                          'entries': 3,
+                                          'failed': shard_id,
+                                          'elapsed': 4.0 + shard_id})
+        shard_dirs.append(str(shard_dir))
+
+    out_dir = tmp_path / 'merged'
+    summary = sh.merge_shards(shard_dirs, str(out_dir))
+    assert summary['shards'] == 2, 'Wrong shard count.'
+    assert summary['entries'] == 6, 'Wrong entry count.'
+    assert summary['failed'] == 1, 'Wrong failed count.'
+    assert summary['makespan'] == 5.0, 'Wrong makespan.'
+    assert (out_dir / 'f1.cpp.hash').exists(), 'Output must be copied.'
+    assert (out_dir / 'errors' / 'f0.cpp.hash').exists(), \
+        'Error must be copied.'
+    durations = json.loads((out_dir / sh.DURATIONS_FILE).read_text())
+    assert durations == {'key0': 2.0, 'key1': 3.0}, 'Wrong durations.'
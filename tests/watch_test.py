@@ -0,0 +1,65 @@
+"""Test cases for file watchers."""
+import os
+import sys
+import pytest
+import cpp_static_analyzer.watch as wt
+
+
+def _touch(path, text):
+    """Write text and move mtime forward, as a later save would."""
+    path.write_text(text)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_stat_watcher(tmp_path):
+    """Stat watcher reports changed and removed watched files."""
+    header = tmp_path / 'a.h'
+    source = tmp_path / 'a.cpp'
+    header.write_text('int a;\n')
+    source.write_text('#include "a.h"\n')
+    watcher = wt.StatWatcher([str(header), str(source)], interval=0.01)
+
+    assert watcher.wait(0.05) == set(), 'Nothing changed.'
+    _touch(header, 'int b;\n')
+    assert watcher.wait(1.0) == {str(header)}, 'Header changed.'
+    source.unlink()
+    assert watcher.wait(1.0) == {str(source)}, 'Source removed.'
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'),
+                    reason='inotify is available on Linux only.')
+def test_inotify_watcher(tmp_path):
+    """Inotify watcher reports watched files replaced by a rename."""
+    header = tmp_path / 'a.h'
+    header.write_text('int a;\n')
+    watcher = wt.InotifyWatcher([str(header)])
+    try:
+        (tmp_path / 'unwatched.h').write_text('int u;\n')
+        assert watcher.wait(0.05) == set(), 'Unwatched file changed.'
+
+        (tmp_path / 'a.h.tmp').write_text('int b;\n')
+        os.replace(tmp_path / 'a.h.tmp', header)
+        assert watcher.wait(1.0) == {str(header)}, 'Header replaced.'
+    finally:
+        watcher.close()
+
+
+class _Watcher:
+    """Watcher replaying a sequence of changes."""
+
+    def __init__(self, changes):
+        self.changes = list(changes)
+
+    def wait(self, timeout=None):
+        return self.changes.pop(0) if self.changes else set()
+
+
+def test_wait_for_changes():
+    """A burst of changes is reported once it settles."""
+    watcher = _Watcher([{'a.h'}, {'a.h', 'b.h'}, {'c.cpp'}, set(),
+                        {'d.h'}])
+    assert wt.wait_for_changes(watcher, 0.1) == {'a.h', 'b.h', 'c.cpp'}, \
+        'Burst must be merged.'
+    assert wt.wait_for_changes(watcher, 0.1) == {'d.h'}, \
+        'Next change must be reported alone.'